@@ -1,17 +1,58 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, send_from_directory, current_app
-from flask.helpers import send_file
+import shutil
+import tempfile
+from flask import Flask, Request, Response, render_template, request, redirect, url_for, send_from_directory, current_app, \
+	stream_with_context, jsonify, send_file
 from werkzeug.datastructures import FileStorage
 
 from audioStegano import AudioStegano
-from rc4 import encrypt, encryptByte, decrypt, decryptByte
+from coverCache import contentHash, CoverCache, CoverStore
+from fileSource import sourceExtension
+from rc4 import encrypt, decrypt, encryptStream, ksa_cache
 from imageStegano import ImageStegano
+from jobs import JobManager, Job, embedJob, extractJob, JOB_DONE
+from resultCache import ResultCache
+from stegoFormat import checkLSBBits
+from stageMetrics import isTracingMemory, registry, renderCounter, setTraceMemory, timed
 
 # Flask Configuration.
+class SpooledRequest(Request):
+	"""
+	Request keeping uploaded file in memory up to UPLOAD_SPOOL_SIZE bytes, bigger file is moved to
+	temporary file. Stegano class read the upload directly, so nothing is saved under its file name.
+	"""
+	def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+		return tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_SIZE'])
+
 app = Flask(__name__)
+app.request_class = SpooledRequest
 UPLOAD_FOLDER = './static/uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['SECRET_KEY'] = 'mysecret'
+# Block size for streaming file through RC4.
+app.config['STREAM_CHUNK_SIZE'] = 64 * 1024
+# Uploaded file and extracted message bigger than this are spooled to temporary file.
+app.config['UPLOAD_SPOOL_SIZE'] = 16 * 1024 * 1024
+# PNG decoding to more bytes than this is embedded and extracted strip by strip of this size.
+app.config['STRIP_BUDGET'] = 256 * 1024 * 1024
+# Number of bytes of decoded cover kept in memory for later request with the same cover.
+app.config['COVER_CACHE_BUDGET'] = 256 * 1024 * 1024
+# Stored uploaded cover: number of second it is kept after its last use, and maximum number of bytes
+# of every stored cover.
+app.config['COVER_STORE_TTL'] = 24 * 3600
+app.config['COVER_STORE_SIZE'] = 1024 * 1024 * 1024
+# Stored result of embed request: number of second it is kept after its last use, and maximum
+# number of bytes of every stored stego file.
+app.config['RESULT_CACHE_TTL'] = 24 * 3600
+app.config['RESULT_CACHE_SIZE'] = 1024 * 1024 * 1024
+# Peak memory of every operation is traced with tracemalloc, it make every allocation slower. Applied
+# when the app start, default from STEGANO_TRACE_MEMORY environment variable (also used by flask run).
+app.config['TRACE_MEMORY'] = isTracingMemory()
+# Background job: number of worker process (none for number of CPU), number of job waiting for a
+# worker before new job is refused, and number of second finished job is kept.
+app.config['JOB_WORKERS'] = None
+app.config['JOB_QUEUE_DEPTH'] = 16
+app.config['JOB_RESULT_TTL'] = 3600
 
 """
 --------------------------------------------------------------
@@ -37,6 +78,21 @@ def download(filename):
 # Route for RC4 Cipher
 --------------------------------------------------------------
 """
+# RC4 call of the route is recorded in the metrics registry.
+encryptText = timed("rc4", "encrypt")(encrypt)
+decryptText = timed("rc4", "decrypt")(decrypt)
+encryptFileStream = timed("rc4", "encryptStream")(encryptStream)
+
+def streamCipherFile(file:FileStorage, key:str, filename:str) -> Response:
+	"""
+	Stream uploaded file through RC4 block by block, so first byte is sent right away and memory
+	per request does not depend on file size.
+	"""
+	chunks = encryptFileStream(file.stream, key, app.config['STREAM_CHUNK_SIZE'])
+	response = Response(stream_with_context(chunks), mimetype='application/octet-stream')
+	response.headers.set('Content-Disposition', 'attachment', filename=filename)
+	return response
+
 # Index route.
 @app.route('/rc4-cipher')
 def rc4():
@@ -49,15 +105,15 @@ def rc4Encrypt():
 		if(request.form["encrypt"]=="file"):
 			plaintext = request.form['plaintext']
 			key = request.form['key']
-			ciphertext = encrypt(plaintext, key)
+			try:
+				ciphertext = encryptText(plaintext, key)
+			except (Exception) as e:
+				return render_template('pages/rc4-cipher.html', encrypt=True, plaintext=plaintext, key=key, error=e)
 			return render_template('pages/rc4-cipher.html', encrypt=True, plaintext=plaintext, key=key, result_ciphertext=ciphertext)
 		else:
 			key = request.form['key']
 			file = request.files['file-plaintext']
-			file_contents = file.read()
-			filename = file.filename
-			cipher_file = encryptByte(file_contents, key)
-			return send_file(cipher_file, as_attachment=True, attachment_filename="encrypted-"+filename)
+			return streamCipherFile(file, key, "encrypted-"+file.filename)
 	else:
 		return redirect(url_for('rc4'))
 
@@ -68,23 +124,156 @@ def rc4Decrypt():
 		if(request.form["decrypt"]=="file"):
 			ciphertext = request.form['ciphertext']
 			key = request.form['key']
-			plaintext = decrypt(ciphertext, key)
+			try:
+				plaintext = decryptText(ciphertext, key)
+			except (Exception) as e:
+				return render_template('pages/rc4-cipher.html', encrypt=False, key=key, ciphertext=ciphertext, error=e)
 			return render_template('pages/rc4-cipher.html', encrypt=False, result_plaintext=plaintext, key=key, ciphertext=ciphertext)
 		else:
 			key = request.form['key']
 			file = request.files['file-ciphertext']
-			file_contents = file.read()
-			filename = file.filename
-			decipher_file = decryptByte(file_contents, key)
-			return send_file(decipher_file, as_attachment=True, attachment_filename="decrypted-"+filename)
+			return streamCipherFile(file, key, "decrypted-"+file.filename)
 	else:
 		return redirect(url_for('rc4'))
 
+"""
+--------------------------------------------------------------
+# Cover Cache
+--------------------------------------------------------------
+"""
+def steganoOptions(carrier_type:str) -> dict:
+	"""
+	Keyword argument from app config for the stegano class of the carrier type.
+	"""
+	if carrier_type == 'image':
+		return {'strip_budget': app.config['STRIP_BUDGET']}
+	return {}
+
+cover_cache:CoverCache = None
+cover_store:CoverStore = None
+
+def getCoverCache() -> CoverCache:
+	"""
+	Get cache of decoded cover shared by every request, created with app config on first use.
+	"""
+	global cover_cache
+	if cover_cache is None:
+		cover_cache = CoverCache(app.config['COVER_CACHE_BUDGET'])
+	return cover_cache
+
+def getCoverStore() -> CoverStore:
+	"""
+	Get store of uploaded cover by content hash, created on first use.
+	"""
+	global cover_store
+	if cover_store is None:
+		cover_store = CoverStore(os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], 'covers'),
+			app.config['COVER_STORE_TTL'], app.config['COVER_STORE_SIZE'])
+	return cover_store
+
+def storeCover(file:FileStorage, cover_hash:str, extensions:tuple):
+	"""
+	Store uploaded cover by its content hash, or find cover uploaded before when only its hash is sent.
+	Cover already stored is not written again.
+	Return tuple of the cover (stored path, or the upload itself if it is bigger than the store) and its hash.
+	"""
+	if file is not None and file.filename:
+		extension = sourceExtension(file)
+		if extension not in extensions:
+			raise Exception("Can only process " + " or ".join(item[1:] for item in extensions) + " file for cover")
+		cover_hash, path = getCoverStore().save(file, extension)
+		return (path or file, cover_hash)
+	path = getCoverStore().find(cover_hash) if cover_hash else None
+	if path is None or os.path.splitext(path)[1] not in extensions:
+		raise Exception("Cover not found, upload the cover file again")
+	return (path, cover_hash)
+
+@app.route('/covers/stats')
+def coverStats():
+	return jsonify(dict(getCoverCache().stats(), store=getCoverStore().stats()))
+
+"""
+--------------------------------------------------------------
+# Result Cache
+--------------------------------------------------------------
+"""
+result_cache:ResultCache = None
+
+def getResultCache() -> ResultCache:
+	"""
+	Get store of finished embed result, created with app config on first use.
+	"""
+	global result_cache
+	if result_cache is None:
+		result_cache = ResultCache(os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], 'results'),
+			app.config['RESULT_CACHE_TTL'], app.config['RESULT_CACHE_SIZE'])
+	return result_cache
+
+def embedCached(carrier_type:str, stegano_class, cover, cover_hash:str, file_message:FileStorage,
+	output_filename:str, enc_key:str, key:str, is_random:bool, is_encrypt:bool, lsb_bits:int):
+	"""
+	Embed message, or copy stored stego file of the same request (like retried request) without
+	embedding again.
+	Return tuple of output path, quality metrics and psnr estimate.
+	"""
+	cover_extension = sourceExtension(cover)
+	message_extension = os.path.splitext(file_message.filename or '')[1].lower().lstrip('.')
+	entry_key = getResultCache().key(carrier_type, cover_hash, contentHash(file_message), message_extension,
+		is_random, is_encrypt, enc_key, key, lsb_bits, cover_extension)
+	cached = getResultCache().get(entry_key)
+	if cached is not None:
+		stego_path, meta = cached
+		output_filepath = output_filename + cover_extension
+		try:
+			shutil.copyfile(stego_path, output_filepath)
+			psnr_estimate = {int(n): value for n, value in meta['psnr_estimate'].items()}
+			return (output_filepath, meta['metrics'], psnr_estimate)
+		except (OSError):
+			# Entry is removed after lookup, embed again.
+			pass
+
+	stegano = stegano_class(cover, file_message, cover_cache=getCoverCache(), cover_hash=cover_hash,
+		**steganoOptions(carrier_type))
+	psnr_estimate = stegano.estimatePSNR()
+	output_filepath, metrics = stegano.embed(enc_key=enc_key, key=key, is_random=is_random,
+		is_encrypt=is_encrypt, output_file_name=output_filename, lsb_bits=lsb_bits, with_metrics=True)
+	getResultCache().put(entry_key, output_filepath, {'metrics': metrics, 'psnr_estimate': psnr_estimate})
+	return (output_filepath, metrics, psnr_estimate)
+
+@app.route('/results/stats')
+def resultStats():
+	return jsonify(getResultCache().stats())
+
 """
 --------------------------------------------------------------
 # Route for Image Steganography
 --------------------------------------------------------------
 """
+def formLSBBits() -> int:
+	"""
+	Number of LSB per carrier item from request form, 1 if not sent.
+	"""
+	try:
+		lsb_bits = int(request.form.get('lsb-bits', 1))
+	except (ValueError):
+		raise Exception("Number of LSB must be a number")
+	checkLSBBits(lsb_bits)
+	return lsb_bits
+
+def sendMessage(extract, stegano, filename:str) -> Response:
+	"""
+	Extract message into spooled temporary file and send it, named with its own extension.
+	"""
+	output_file = tempfile.SpooledTemporaryFile(max_size=app.config['UPLOAD_SPOOL_SIZE'])
+	try:
+		extract(output_file)
+	except (Exception):
+		output_file.close()
+		raise
+	output_file.seek(0)
+	return send_file(output_file, as_attachment=True,
+		download_name=os.path.basename(filename) + '.' + stegano.msg_extension)
+
 # Index route.
 @app.route('/image-steganography')
 def imageStegano():
@@ -99,31 +288,26 @@ def imageSteganoEmbed():
 		is_encrypt = request.form['message-rc4'] == "encrypt" or False 
 		key_random = request.form['key-random']  or None
 		key_encrypt = request.form['key-encrypt'] or None
-		print(key_random, key_encrypt, is_random, is_encrypt)
 		output_filename = request.form['output-name']
 		output_filename = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], output_filename)
 		
 		# Catch exception when embedding message.
 		try:
-			# Save the uploaded file to local.
-			# Save image file.
-			file_image = request.files['file-image']
-			file_image.stream.seek(0)
-			file_image_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_image.filename)
-			file_image.save(file_image_path)
-			# Save message file.
+			lsb_bits = formLSBBits()
+
+			# Uploaded file is read directly, only the stego image is written for download. Cover is
+			# stored once by content hash, later request can send the hash instead of the file.
+			cover_image, cover_hash = storeCover(request.files.get('file-image'),
+				request.form.get('cover-hash'), ('.png', '.bmp'))
 			file_message = request.files['file-message']
-			file_message.stream.seek(0)
-			file_message_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_message.filename)
-			file_message.save(file_message_path)
 	
-			# Embed the message.
-			image_stegano:ImageStegano = ImageStegano(file_image_path, file_message_path)
-			output_filepath = image_stegano.embed(enc_key=key_encrypt, key=key_random, is_random=is_random, 
-				is_encrypt=is_encrypt, output_file_name=output_filename)
-			# Calculate psnr 
-			PSNR = ImageStegano.calculatePSNR(file_image_path,output_filepath)
-			return render_template('pages/image-steganography.html', embed=True, psnr=PSNR, output_filename = os.path.basename(output_filepath))
+			# Embed the message, retried request get the stored result.
+			output_filepath, metrics, psnr_estimate = embedCached('image', ImageStegano, cover_image,
+				cover_hash, file_message, output_filename, key_encrypt, key_random, is_random, is_encrypt,
+				lsb_bits)
+			# Psnr and other quality metrics are counted while embedding.
+			PSNR = metrics['psnr']
+			return render_template('pages/image-steganography.html', embed=True, psnr=PSNR, psnr_estimate=psnr_estimate, metrics=metrics, output_filename = os.path.basename(output_filepath), cover_hash=cover_hash)
 		
 		except (Exception) as e:
 			# Render error webpage.
@@ -141,24 +325,19 @@ def imageSteganoExtract():
 		# Get request payload.
 		key_random = request.form['key-random']  or None
 		key_encrypt = request.form['key-encrypt'] or None
+		legacy_random = request.form.get('legacy-random') == 'on'
 		output_filename = request.form['output-name']
-		output_filename = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], output_filename)
 		
 		# Catch exception when embedding message.
 		try:
-			# Save the uploaded file to local.
-			# Save image file.
+			# Uploaded file is read directly, extracted message is sent from memory.
 			file_stego_image = request.files['file-stego-image']
-			file_stego_image.stream.seek(0)
-			file_stego_image_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_stego_image.filename)
-			file_stego_image.save(file_stego_image_path)
 		
 			# Extract the message.
-			image_stegano:ImageStegano = ImageStegano(file_stego_image_path)
-			output_filepath = image_stegano.extract(output_filename, enc_key=key_encrypt, key=key_random)
-			extension = os.path.splitext(output_filepath)[1].lower()
-
-			return send_from_directory(os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER']), request.form['output-name'] + extension, as_attachment=True)
+			image_stegano:ImageStegano = ImageStegano(file_stego_image, **steganoOptions('image'))
+			return sendMessage(lambda output_file: image_stegano.extract(output_filename,
+				enc_key=key_encrypt, key=key_random, output_file=output_file, legacy_random=legacy_random),
+				image_stegano, output_filename)
 		except (Exception) as e:
 			# Render error webpage.
 			return render_template('pages/image-steganography.html', embed=False,
@@ -192,25 +371,21 @@ def audioSteganoEmbed():
 		
 		# Catch exception when embedding message.
 		try:
-			# Save the uploaded file to local.
-			# Save audio file.
-			file_audio = request.files['file-audio']
-			file_audio.stream.seek(0)
-			file_audio_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_audio.filename)
-			file_audio.save(file_audio_path)
-			# Save message file.
+			lsb_bits = formLSBBits()
+
+			# Uploaded file is read directly, only the stego audio is written for download. Cover is
+			# stored once by content hash, later request can send the hash instead of the file.
+			cover_audio, cover_hash = storeCover(request.files.get('file-audio'),
+				request.form.get('cover-hash'), ('.wav',))
 			file_message = request.files['file-message']
-			file_message.stream.seek(0)
-			file_message_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_message.filename)
-			file_message.save(file_message_path)
 	
-			# Embed the message.
-			audio_stegano:AudioStegano = AudioStegano(file_audio_path, file_message_path)
-			output_filepath = audio_stegano.embed(enc_key=key_encrypt, key=key_random, is_random=is_random, 
-				is_encrypt=is_encrypt, output_file_name=output_filename)
-			# Calculate psnr 
-			PSNR = AudioStegano.calculatePSNR(file_audio_path,output_filepath)
-			return render_template('pages/audio-steganography.html', embed=True, psnr=PSNR, output_filename = request.form['output-name']+".wav")
+			# Embed the message, retried request get the stored result.
+			output_filepath, metrics, psnr_estimate = embedCached('audio', AudioStegano, cover_audio,
+				cover_hash, file_message, output_filename, key_encrypt, key_random, is_random, is_encrypt,
+				lsb_bits)
+			# Psnr and other quality metrics are counted while embedding.
+			PSNR = metrics['psnr']
+			return render_template('pages/audio-steganography.html', embed=True, psnr=PSNR, psnr_estimate=psnr_estimate, metrics=metrics, output_filename = request.form['output-name']+".wav", cover_hash=cover_hash)
 		
 		except (Exception) as e:
 			# Render error webpage.
@@ -227,24 +402,19 @@ def audioSteganoExtract():
 		# Get request payload.
 		key_random = request.form['key-random']  or None
 		key_encrypt = request.form['key-encrypt'] or None
+		legacy_random = request.form.get('legacy-random') == 'on'
 		output_filename = request.form['output-name']
-		output_filename = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], output_filename)
 		
 		# Catch exception when embedding message.
 		try:
-			# Save the uploaded file to local.
-			# Save audio file.
+			# Uploaded file is read directly, extracted message is sent from memory.
 			file_stego_audio = request.files['file-stego-audio']
-			file_stego_audio.stream.seek(0)
-			file_stego_audio_path = os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], file_stego_audio.filename)
-			file_stego_audio.save(file_stego_audio_path)
 		
 			# Extrac the message.
-			audio_stegano:AudioStegano = AudioStegano(file_stego_audio_path)
-			output_filepath = audio_stegano.extract(output_filename, enc_key=key_encrypt, key= key_random)
-			extension = os.path.splitext(output_filepath)[1].lower()
-			print(request.form['output-name'] + "." + extension)
-			return send_from_directory(os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER']), request.form['output-name'] + extension, as_attachment=True)
+			audio_stegano:AudioStegano = AudioStegano(file_stego_audio)
+			return sendMessage(lambda output_file: audio_stegano.extract(output_filename,
+				enc_key=key_encrypt, key=key_random, output_file=output_file, legacy_random=legacy_random),
+				audio_stegano, output_filename)
 
 		
 		except (Exception) as e:
@@ -256,10 +426,142 @@ def audioSteganoExtract():
 		return redirect(url_for('audioStegano'))
 
 
+"""
+--------------------------------------------------------------
+# Route for Background Job
+--------------------------------------------------------------
+"""
+job_manager:JobManager = None
+
+def getJobManager() -> JobManager:
+	"""
+	Get job manager, created with app config on first use. Worker process is started on first job.
+	"""
+	global job_manager
+	if job_manager is None:
+		job_manager = JobManager(os.path.join(current_app.root_path, app.config['UPLOAD_FOLDER'], 'jobs'),
+			app.config['JOB_WORKERS'], app.config['JOB_QUEUE_DEPTH'], app.config['JOB_RESULT_TTL'])
+	return job_manager
+
+def jobStatus(job:Job) -> dict:
+	"""
+	Job status with queue position and url of status and result.
+	"""
+	status = job.status()
+	status['position'] = getJobManager().queuePosition(job)
+	status['status_url'] = url_for('jobStatusRoute', job_id=job.job_id)
+	if job.state == JOB_DONE:
+		status['result_url'] = url_for('jobResult', job_id=job.job_id)
+	return status
+
+def submitJob(kind:str, file_fields:list, function, make_args) -> Response:
+	"""
+	Save uploaded file to new job directory, then run the job in worker process. Job argument is built
+	from the form with make_args(job, paths), bad form value discard the job.
+	Return 202 response with job status, 400 if the request is not valid, or 503 if the queue is full.
+	"""
+	try:
+		job = getJobManager().createJob(kind)
+	except (Exception) as e:
+		return jsonify(error=str(e)), 503
+	try:
+		paths = []
+		for field in file_fields:
+			file = request.files[field]
+			path = job.path(field + os.path.splitext(file.filename)[1].lower())
+			file.save(path)
+			paths.append(path)
+		getJobManager().submit(job, function, *make_args(job, paths))
+	except (Exception) as e:
+		getJobManager().discard(job)
+		return jsonify(error=str(e)), 400
+	return jsonify(jobStatus(job)), 202
+
+def embedArgs(carrier_type:str, job:Job, paths:list) -> tuple:
+	"""
+	Build embedJob argument from request form and saved cover and message path.
+	"""
+	is_random = request.form['embed-method'] == "random"
+	is_encrypt = request.form['message-rc4'] == "encrypt"
+	key_random = request.form['key-random'] or None
+	key_encrypt = request.form['key-encrypt'] or None
+	lsb_bits = formLSBBits()
+	output_name = request.form['output-name']
+	return (carrier_type, paths[0], paths[1], job.path(output_name), key_encrypt, key_random, is_random,
+		is_encrypt, lsb_bits, steganoOptions(carrier_type))
+
+def extractArgs(carrier_type:str, job:Job, paths:list) -> tuple:
+	"""
+	Build extractJob argument from request form and saved stego file path.
+	"""
+	key_random = request.form['key-random'] or None
+	key_encrypt = request.form['key-encrypt'] or None
+	legacy_random = request.form.get('legacy-random') == 'on'
+	output_name = request.form['output-name']
+	return (carrier_type, paths[0], job.path(output_name), key_encrypt, key_random, legacy_random,
+		steganoOptions(carrier_type))
+
+# Submit route.
+@app.route('/jobs/image-steganography/embed', methods=['POST'])
+def imageSteganoEmbedJob():
+	return submitJob('image-embed', ['file-image', 'file-message'], embedJob, lambda job, paths: embedArgs('image', job, paths))
+
+@app.route('/jobs/image-steganography/extract', methods=['POST'])
+def imageSteganoExtractJob():
+	return submitJob('image-extract', ['file-stego-image'], extractJob, lambda job, paths: extractArgs('image', job, paths))
+
+@app.route('/jobs/audio-steganography/embed', methods=['POST'])
+def audioSteganoEmbedJob():
+	return submitJob('audio-embed', ['file-audio', 'file-message'], embedJob, lambda job, paths: embedArgs('audio', job, paths))
+
+@app.route('/jobs/audio-steganography/extract', methods=['POST'])
+def audioSteganoExtractJob():
+	return submitJob('audio-extract', ['file-stego-audio'], extractJob, lambda job, paths: extractArgs('audio', job, paths))
+
+# Status and cancel route.
+@app.route('/jobs/<job_id>', methods=['GET', 'DELETE'])
+def jobStatusRoute(job_id):
+	job = getJobManager().get(job_id)
+	if job is None:
+		return jsonify(error="Job not found"), 404
+	if request.method == 'DELETE' and not(getJobManager().cancel(job_id)):
+		return jsonify(error="Job already ended", **jobStatus(job)), 409
+	return jsonify(jobStatus(job))
+
+# Result route.
+@app.route('/jobs/<job_id>/result')
+def jobResult(job_id):
+	job = getJobManager().get(job_id)
+	if job is None:
+		return jsonify(error="Job not found"), 404
+	if job.state != JOB_DONE:
+		return jsonify(error="Job is not done", **jobStatus(job)), 409
+	return send_from_directory(job.directory, os.path.basename(job.result['output_path']), as_attachment=True)
+
+"""
+--------------------------------------------------------------
+# Route for Metrics
+--------------------------------------------------------------
+"""
+@app.route('/metrics')
+def metricsRoute():
+	"""
+	Stage time, processed bytes and peak memory of every operation, job run in worker process included
+	once it is done, with cache counter, in Prometheus text format.
+	"""
+	lines = []
+	caches = {('cover',): getCoverCache().stats(), ('cover_store',): getCoverStore().stats(),
+		('result',): getResultCache().stats(), ('rc4_ksa',): ksa_cache.stats()}
+	for name in ('hits', 'misses', 'evictions'):
+		renderCounter(lines, 'stegano_cache_' + name + '_total', 'Number of cache ' + name + '.',
+			{cache: stats[name] for cache, stats in caches.items() if name in stats}, ('cache',))
+	return Response(registry.render() + "\n".join(lines) + "\n", mimetype='text/plain; version=0.0.4')
+
 """
 --------------------------------------------------------------
 # Flask Main Program
 --------------------------------------------------------------
 """
 if __name__ == '__main__':
+	setTraceMemory(app.config['TRACE_MEMORY'])
 	app.run(debug=True,threaded=True)
\ No newline at end of file
@@ -1,7 +1,7 @@
 # Python module.
 import os
 import math
-from typing import List
+from typing import BinaryIO, Dict
 import wave
 import ntpath
 import numpy as np
@@ -11,8 +11,14 @@ from pathlib import Path
 from rc4 import encryptByte2, decryptByte2
 
 # Own module.
-from helper import ByteToBinary, binarytoArrayBynary, generate_random_access_table, modifyBit, \
-	stringToBinary, arrayByteToBinary
+from coverCache import contentHash, CoverCache, ENTRY_OVERHEAD
+from fileSource import openSource, readSource, Source, sourceExtension, sourceName
+from lsbKernel import TrackedCarrier
+from qualityMetrics import AudioMetrics, psnrFromMSE
+from stageMetrics import StageTimer
+from waveCarrier import BLOCK_FRAMES, WaveCarrier, sampleView
+from stegoFormat import (embedMessage, estimatePSNR, extractHeaderMessage, extractMessage,
+	frameMessage, messageCapacity, MIN_LSB_BITS, MAX_LSB_BITS)
 
 class AudioStegano:
 	"""
@@ -22,72 +28,114 @@ class AudioStegano:
 	----------
 	audio : WavAudio
 		Audio is basic wav audio readed by wave. Audio can be container object or stego object.
-	audio_path : str
-		Absolute path to audio file.
-	audio_bytes : bytesarray
-		Audio in list of byte representation.
+	audio_path : Source
+		Absolute path to audio file, or audio content or binary file object.
 	payload : int
-		Number of maximum bit you can insert to audio.
+		Number of audio sample, each sample can hide LSB.
+	sample_width : int
+		Number of bytes of one audio sample.
+	squared_error : int
+		Sum of squared sample difference made by the last embed.
 	message : bytesarray
 		Message in list of byte representation.
 	msg_extension : str
 		File extension of the message.
-	modified_message : str
-		Message in binary string representantion.
+	modified_message : np.ndarray
+		Message in array of bit (uint8 0 or 1) representantion.
+	cover_cache : CoverCache
+		Cache of cover shared by every request, none if not used.
+	cover_hash : str
+		Content hash of the audio, none if cover cache is not used.
+	timer : StageTimer
+		Timer of the current operation, stage is sent to the metrics registry after embed or extract.
 	"""
 
-	def __init__(self, audio_path:str, input_message_path:str=None) -> None:
+	def __init__(self, audio_path:Source, input_message_path:Source=None,
+		message_extension:str=None, cover_cache:CoverCache=None, cover_hash:str=None) -> None:
 		"""
 		Constructor for AudioStegano class. Read input audio file and input message file.
-		Format for audio must be WAV, input message can be any file.
+		Format for audio must be WAV, input message can be any file. Both can be path, content in
+		memory (bytes, bytearray, memoryview) or seekable binary file object like uploaded stream.
 
 		Parameter.
 		----------
-		audio_path : str
-			Absolute path to audio file.
-		input_message_path : str
-			Absolute path to message file.
+		audio_path : Source
+			Absolute path to audio file, or audio content or binary file object.
+		input_message_path : Source
+			Absolute path to message file, or message content or binary file object.
+		message_extension : str, default none
+			File extension of the message, taken from message file name if none.
+		cover_cache : CoverCache, default none
+			Cache of cover shared by every request, audio with same content is checked once.
+		cover_hash : str, default none
+			Content hash of the audio if already known, counted from the audio if none.
 		"""
 
 		try:
 
-			# Check audio file validity for processing.
-			# Check extension.
-			if (os.path.splitext(audio_path)[1].lower() != ".wav"):
-				raise Exception("Can only process wav file for audio")
-			# Check if file exist.
-			audio = wave.open(audio_path, "r")
-			if (not(audio)):
-				raise Exception("Input audio not exist")
-		
+			# Header of audio with the same content is taken from cache. Frame is never cached,
+			# embed and extract read it block by block from file.
+			self.timer:StageTimer = StageTimer()
+			self.cover_cache:CoverCache = cover_cache
+			self.cover_hash:str = None
+			cached:Dict = None
+			if (cover_cache is not None):
+				self.cover_hash = cover_hash or contentHash(audio_path)
+				cached = cover_cache.get(self.cover_hash)
+				self.timer.lap("hash")
+
+			if (cached is not None):
+				audio = None
+				self.sample_width:int = cached["sample_width"]
+				self.payload:int = cached["payload"]
+			else:
+				# Check audio file validity for processing.
+				# Check extension, audio without file name is checked by its leading bytes.
+				if (sourceExtension(audio_path) != ".wav"):
+					raise Exception("Can only process wav file for audio")
+				# Check if file exist.
+				audio_file:BinaryIO = openSource(audio_path)
+				audio = wave.open(audio_file, "r")
+				if (not(audio)):
+					raise Exception("Input audio not exist")
+				self.sample_width:int = audio.getsampwidth()
+				self.payload:int = audio.getnframes() * audio.getnchannels()
+				if (cover_cache is not None):
+					cover_cache.put(self.cover_hash, {"sample_width": self.sample_width,
+						"payload": self.payload}, ENTRY_OVERHEAD)
 
 			# Process audio input.
 			self.audio = audio
-			self.audio_path:str = audio_path
-			# Get audio bytes representation.
-			audio_frames = self.audio.readframes(self.audio.getnframes())
-			self.audio_bytes:bytearray = bytearray(list(audio_frames))
-			self.payload:int = len(audio_frames)
+			self.audio_path:Source = audio_path
+			self.squared_error:int = 0
+			self.timer.lap("header")
 
 			# Process input messages.
-			if (input_message_path):
+			if (input_message_path is not None):
 				# Check if file exist.
-				messages:bytes = open(input_message_path, "rb").read()
+				messages:bytes = readSource(input_message_path)
 				if (not(messages)):
 					raise Exception("Input message not exist")
 				self.message:bytes = messages
-				self.msg_extension:str = os.path.splitext(input_message_path)[1].lower()[1:]
-				# Check if current audio file is big enough to hide text.
-				# For each bytes(8 bit) you can only hide one bit from message. You also need to keep space 
-				# for input file extension and randomized, encrypt, start and endfile flag. 
-				if len(self.message) > self.payload//8 - len(self.msg_extension) - 7:
+				if (message_extension is None):
+					message_extension = os.path.splitext(sourceName(input_message_path))[1]
+				self.msg_extension:str = message_extension.lower().lstrip(".")
+				self.timer.lap("read_message")
+				# Check if current audio file is big enough to hide message.
+				# For each sample you can hide up to MAX_LSB_BITS bit from message. You also need to keep space 
+				# for header, input file extension and randomized, encrypt, start and endfile flag. 
+				if len(self.message) > messageCapacity(self.payload, self.msg_extension,
+					MAX_LSB_BITS):
 					raise Exception("Input message is to big")
 			
-			audio.close()
+			if (audio is not None):
+				audio.close()
+				audio_file.close()
 		except Exception as e:
 			raise Exception("Cannot process input file!")
 
-	def normalizeMessage(self, enc_key:str, is_random:bool, is_encrypt:bool) -> str:
+	def normalizeMessage(self, enc_key:str, is_random:bool, is_encrypt:bool,
+		lsb_bits:int=1) -> np.ndarray:
 		"""
 		Function to normalize message you want to encrypt by inserting specific flag and turn the 
 		string to binary. 
@@ -101,36 +149,49 @@ class AudioStegano:
 			Boolean indicating lsb randomized or not.
 		is_encrypt : bool, default false
 			Boolean indicating message encrypted or not.
+		lsb_bits : int, default 1
+			Number of LSB used in one audio byte for the message.
 		"""
-		# Random and encrypt flag.
-		flag_random:str = "0"
-		if (is_random):
-			flag_random ="1"
-		flag_encrypt:str ="0"
+		# Encrypt the message first if needed.
+		self.timer.mark()
 		if (is_encrypt):
-			flag_encrypt = "1"
 			self.message = encryptByte2(self.message, enc_key)
+			self.timer.lap("encrypt")
 
-		# Start and End messages flag. 
-		flag_start_message:str = stringToBinary("<<?")
-		flag_end_message:str = stringToBinary("?>>")
+		# Put flag and header around the message, then turn it to bit.
+		modified_message:np.ndarray = frameMessage(self.msg_extension, self.message, is_random,
+			is_encrypt, lsb_bits)
+		self.modified_message:np.ndarray = modified_message
+		self.timer.lap("frame")
+		return modified_message
 
-		# File extension flag.
-		flag_file_extension:str = stringToBinary(self.msg_extension)
+	def finishOperation(self, operation:str, is_random:bool, is_encrypt:bool, message_size:int) -> None:
+		"""
+		Function to send stage time of finished embed or extract to the metrics registry, labeled by
+		audio size and mode.
 
-		# Save modified message and return it.
-		modified_message:str = arrayByteToBinary(self.message)
-		modified_message = flag_random + flag_encrypt + flag_file_extension + flag_start_message \
-			+ modified_message + flag_end_message
-		self.modified_message:str = modified_message
-		return modified_message
+		Parameter.
+		----------
+		operation : str
+			"embed" or "extract".
+		is_random : bool
+			Boolean indicating lsb randomized or not.
+		is_encrypt : bool
+			Boolean indicating message encrypted or not.
+		message_size : int
+			Number of message bytes.
+		"""
+		mode:str = ("random" if is_random else "sequential") + ("+rc4" if is_encrypt else "")
+		size:int = self.payload * self.sample_width
+		self.timer.finish("wav", operation, size, mode, {"cover": size, "message": message_size})
 
 
 	def embed(self,enc_key:str=None, key:str=None, is_random:bool=False, is_encrypt:bool=False, 
-		output_file_name:str="") -> str:
+		output_file_name:str="", lsb_bits:int=1, with_metrics:bool=False, output_file:BinaryIO=None):
 		"""
 		Function to hide user message on audio. 
-		Return output file path.
+		Return output file path (output_file if given), or tuple of it and quality metrics (mse, psnr,
+		snr and segmental_snr) if with_metrics.
 
 		Parameter.
 		----------
@@ -142,49 +203,79 @@ class AudioStegano:
 			Boolean indicating lsb randomized or not.
 		is_encrypt : bool, default false
 			Boolean indicating message encrypted or not.
+		lsb_bits : int, default 1
+			Number of LSB used in one audio byte, more LSB hide more message with lower psnr.
+		with_metrics : bool, default false
+			Boolean indicating quality metrics is counted while writing the output and returned.
+		output_file : BinaryIO, default none
+			Writable binary file object for the stego audio instead of output_file_name, kept open.
 		"""
 
 		# Input validation.
 		if (key and not(is_random)):
 			raise Exception("Key inserted but message embedding not randomized")
+		elif (is_random and not key):
+			raise Exception("You must provide a key for randomized method")
+		
+		if (len(self.message) > messageCapacity(self.payload, self.msg_extension, lsb_bits)):
+			raise Exception("Input message is too big for %d LSB" % lsb_bits)
 		
 		# Normalize message first.
-		self.normalizeMessage(enc_key, is_random, is_encrypt)
-
-		# Generate access table.
-		access_table:List[int] = list(range(1, self.payload)) 
-		if is_random and key:
-			access_table = generate_random_access_table(key,self.payload)
+		self.normalizeMessage(enc_key, is_random, is_encrypt, lsb_bits)
 
-		# Make sure you not randomize flag randomize position.
-		self.audio_bytes[0]= modifyBit(self.audio_bytes[0],0,int(self.modified_message[0]))
-
-		# Hide the message in audio_bytes using ordering from access_table.
-		for messageIndex, audioIndex in enumerate(access_table, 1):
-			if (messageIndex >= len(self.modified_message)):
-				break
-			self.audio_bytes[audioIndex] = modifyBit(self.audio_bytes[audioIndex], 0,
-				int(self.modified_message[messageIndex]))
-		
-		# Write file output.
+		# Get output file path.
 		output_file_path:str = output_file_name
 		if output_file_path == "":
-			old_filename:str = ntpath.basename(self.audio_path).split('.')
-			output_file_path = str(Path(self.audio_path).parent) + '/' + old_filename[0] + \
+			audio_name:str = sourceName(self.audio_path) or "audio.wav"
+			old_filename:str = ntpath.basename(audio_name).split('.')
+			output_file_path = str(Path(audio_name).parent) + '/' + old_filename[0] + \
 				'_embedded.' + old_filename[1]
 		else:
 			output_file_path = output_file_path + '.wav'
-		with wave.open(output_file_path, 'wb') as wav_file:
-			wav_file.setparams(self.audio.getparams())
-			wav_file.writeframes(self.audio_bytes)
-			wav_file.close()
-
-		return output_file_path
-
-	def extract(self,output_file_name:str, enc_key:str=None, key:str=None)->str:
+		output = output_file if output_file is not None else output_file_path
+
+		# Hide the message in LSB of audio sample, randomized with key or sequential. Sequential
+		# message slide over the frame one block at a time, every block is written as soon as the
+		# message pass it, then the rest is copied block by block. Randomized message read frame
+		# until its highest position. Stego file that replace the audio file is made from the content.
+		audio_source:Source = self.audio_path
+		if (isinstance(self.audio_path, str) and output_file is None and
+			os.path.exists(output_file_path) and os.path.samefile(self.audio_path, output_file_path)):
+			audio_source = readSource(self.audio_path)
+
+		# Metrics compare every written block with the cover block, rebuilt from change recorded while
+		# embedding.
+		metrics:AudioMetrics = AudioMetrics(self.sample_width) if with_metrics else None
+		def compareBlock(offset:int, data:bytes) -> None:
+			cover:bytearray = bytearray(data)
+			cover_samples:np.ndarray = sampleView(cover, self.sample_width)
+			cover_samples[:] = tracked_carrier.original(offset // self.sample_width, cover_samples)
+			tracked_carrier.dropBefore(offset // self.sample_width + len(cover_samples))
+			metrics.update(cover, data)
+		with openSource(audio_source) as audio_file, wave.open(audio_file, 'rb') as audio, \
+			wave.open(output, 'wb') as wav_file:
+			wav_file.setparams(audio.getparams())
+			carrier:WaveCarrier = WaveCarrier(audio, sample_items=True, sliding=not(is_random),
+				writer=wav_file, observer=compareBlock if with_metrics else None)
+			tracked_carrier:TrackedCarrier = TrackedCarrier(carrier)
+			embedMessage(tracked_carrier, self.modified_message, key if is_random else None, lsb_bits,
+				self.timer)
+			self.squared_error = tracked_carrier.squared_error
+			carrier.flush()
+		# Copy of the rest of the frame and metrics of every block are one stage.
+		self.timer.lap("write")
+		self.finishOperation("embed", is_random, is_encrypt, len(self.message))
+
+		if (with_metrics):
+			return (output, metrics.result())
+		return output
+
+	def extract(self,output_file_name:str, enc_key:str=None, key:str=None,
+		output_file:BinaryIO=None, legacy_random:bool=False)->str:
 		"""
 		Function to extract user message from stego audio.
-		Return path to extracted message file.
+		Return path to extracted message file, or output_file if given. Message extension is kept in
+		msg_extension.
 
 		Parameter.
 		----------
@@ -194,76 +285,89 @@ class AudioStegano:
 			Key for generating random table.
 		output_file_path : str
 			File name for output message.
+		output_file : BinaryIO, default none
+			Writable binary file object for the message instead of output_file_name, kept open.
+		legacy_random : bool, default false
+			Boolean indicating randomized audio made by older version (without header) is read with
+			the full random table, it is slow for big audio.
 		"""
-		# Check if stego audio lsb is randomized.
-		is_random:bool = False
-		if (ByteToBinary(self.audio_bytes[0])[-1]=="1"):
-			is_random = True
-		if ((is_random and not(key)) or (not(is_random) and key)):
-			raise Exception("You must provide key for this stego-audio file")
-		
-		# Generate access table based on randomized or not.
-		access_table:List[int] = list(range(1, self.payload)) 
-		if is_random:
-			access_table = generate_random_access_table(key,self.payload)
-
-		# Get all LSB from audio_bytes.
-		bit_message:str = ""
-		for audioIndex in access_table :
-			bit_message += (str(ByteToBinary(self.audio_bytes[audioIndex]))[-1])
-		# Check flag encrypted.
-		is_encrypted:bool = False
-		if (bit_message[0]=="1"):
-			is_encrypted = True
-		bit_message = bit_message[1:]
-
-		# Transform binary string to bytearray like list.
-		bytes_message:List[int] = binarytoArrayBynary(bit_message)
-
-		# Search for file extension.
-		file_extension:str = ""
-		for index, object in enumerate (bytes_message):
-			file_extension += chr(int(object,2))
-			if (chr(int(bytes_message[index+1],2)) == "<" and chr(int(bytes_message[index+2],2)) \
-				== "<" and chr(int(bytes_message[index+3],2)) == "?"):
-				break
-		
-		# Search for real message content.
-		start_message_index = index + 4
-		message = []
-
-		for i in range(start_message_index, self.payload):
-			message.append(int(bytes_message[i],2))
-			if (chr(int(bytes_message[i+1],2)) == "?" and chr(int(bytes_message[i+2],2)) == ">" and chr(int(bytes_message[i+3],2)) == ">"):
-				break
-		message:bytes = bytes(message)
+		self.timer.mark()
+		with openSource(self.audio_path) as audio_file, wave.open(audio_file, 'rb') as audio:
+			# Check if stego audio lsb is randomized.
+			carrier:WaveCarrier = WaveCarrier(audio, sample_items=True)
+			is_random:bool = (carrier[0] & 1) == 1
+			if ((is_random and not(key)) or (not(is_random) and key)):
+				raise Exception("You must provide key for this stego-audio file")
+			carrier.sliding = not(is_random)
+			
+			# Read the message in access order, randomized or not. Sequential message slide over the
+			# frame one block at a time until the end of the message.
+			result = extractHeaderMessage(carrier, key if is_random else None)
+			if (result is None):
+				# Older stego file use every frame byte as carrier item.
+				carrier.sample_items = False
+				result = extractMessage(carrier, key if is_random else None, legacy_random)
+			is_encrypted, file_extension, message = result
+		self.timer.lap("extract")
 
 		# Check if ecnrypted but user doesn't provide key.
 		if (is_encrypted and not(enc_key)):
 			raise Exception("You must provide decription key for extractting this message. ")
 		if (is_encrypted):
 			message = decryptByte2(message, enc_key)
+			self.timer.lap("decrypt")
 
 		# Write file output.
-		output_file_path:str = output_file_name + '.' + file_extension    
-		new_file:FileIO = open(output_file_path, "wb")
-		new_file.write(message)
-		new_file.close()
+		self.msg_extension = file_extension
+		if (output_file is not None):
+			output_file.write(message)
+			output_file_path = output_file
+		else:
+			output_file_path:str = output_file_name + '.' + file_extension    
+			new_file:FileIO = open(output_file_path, "wb")
+			new_file.write(message)
+			new_file.close()
+		self.timer.lap("write")
+		self.finishOperation("extract", is_random, is_encrypted, len(message))
 
 		return output_file_path
 	
+	def estimatePSNR(self) -> Dict[int, float]:
+		"""
+		Function to estimate psnr of the stego audio for every number of LSB, before embedding. Use it
+		to choose lsb_bits, number of LSB that can not hold the message is left out.
+		Return dictionary of number of LSB and psnr.
+		"""
+		self.timer.mark()
+		psnr:Dict[int, float] = {}
+		for lsb_bits in range(MIN_LSB_BITS, MAX_LSB_BITS + 1):
+			if (len(self.message) <= messageCapacity(self.payload, self.msg_extension, lsb_bits)):
+				# Psnr is counted per byte like calculatePSNR, only low byte of sample is changed.
+				psnr[lsb_bits] = estimatePSNR(self.payload * self.sample_width, self.msg_extension,
+					len(self.message), lsb_bits)
+		self.timer.lap("estimate")
+		return psnr
+
+	def embedPSNR(self) -> float:
+		"""
+		Function to calculate psnr of the last embed from the change counted while embedding, without
+		reading the original and stego audio again.
+		Return float representing the psnr, same as calculatePSNR of the cover and stego audio.
+		"""
+		return psnrFromMSE(self.squared_error / (self.payload * self.sample_width))
+
 	@staticmethod
-	def calculatePSNR(audio_path:str, stego_audio_path:str) -> float:
+	def calculateMetrics(audio_path:str, stego_audio_path:str) -> Dict[str, float]:
 		"""
-		Function to calculate psnr of two audio file. The original and the embedded audio.
-		Return float representing the psnr.
+		Function to calculate quality metrics of two audio file. The original and the embedded audio.
+		Return dictionary of mse, psnr, snr and segmental_snr.
 
 		Parameter.
 		----------
 		audio_path : str
 			Absolute path to audio file.
 		stego_audio_path : str
-		 Absolute path to stego audio file.
+			Absolute path to stego audio file.
 		"""
 		# Validate if file exist.
 		try:
@@ -272,28 +376,34 @@ class AudioStegano:
 		except:
 			raise Exception("File not exist")
 		
-		# Read both file frame and store the data in bytearray.
-		# Read audio data.
-		audio_frames = audio.readframes(audio.getnframes())
-		audio_bytes: bytearray = bytearray(list(audio_frames))
-		audio_bytes_length = len(audio_frames)
+		# Read both file frame block by block.
+		metrics:AudioMetrics = AudioMetrics(audio.getsampwidth())
+		while (True):
+			audio_frames = audio.readframes(BLOCK_FRAMES)
+			stego_audio_frames = stego_audio.readframes(BLOCK_FRAMES)
+			if (not(audio_frames)):
+				break
+			if (len(audio_frames) != len(stego_audio_frames)):
+				raise Exception("Audio and stego audio length is different")
+			metrics.update(audio_frames, stego_audio_frames)
 		audio.close()
-		# Read stego audio data.
-		stego_audio_frames = stego_audio.readframes(stego_audio.getnframes())
-		stego_audio_bytes: bytearray = bytearray(list(stego_audio_frames))
 		stego_audio.close()
+		return metrics.result()
 
-		# Calculate the rms.
-		audio_bytes_2 = np.array(audio_bytes)
-		stego_audio_bytes_2 = np.array(stego_audio_bytes)
-		difference_array = np.subtract(audio_bytes_2, stego_audio_bytes_2)
-		squared_array = np.square(difference_array)
-		sum_squared_array = np.sum(squared_array)
-		rms = sum_squared_array / audio_bytes_length
-		
-		# Calculate the psnr. 
-		psnr = 20 * math.log10(255 / math.sqrt(rms))
-		return psnr
+	@staticmethod
+	def calculatePSNR(audio_path:str, stego_audio_path:str) -> float:
+		"""
+		Function to calculate psnr of two audio file. The original and the embedded audio.
+		Return float representing the psnr.
+
+		Parameter.
+		----------
+		audio_path : str
+			Absolute path to audio file.
+		stego_audio_path : str
+		 Absolute path to stego audio file.
+		"""
+		return AudioStegano.calculateMetrics(audio_path, stego_audio_path)["psnr"]
 		
 
 def main():
@@ -0,0 +1,533 @@
+# Python module.
+import os
+import sys
+import time
+import tracemalloc
+import wave
+import tempfile
+import numpy as np
+from typing import Callable, Dict, Iterable, Tuple
+
+# Own module.
+from rc4 import encrypt, decrypt, encryptByte2, decryptByte2, encryptBlock
+from rc4Segmented import encryptSegmented
+from helper import modifyBit
+from lsbKernel import accessPositions, embedBits, extractBits
+from stegoFormat import embedMessage, frameMessage, MIN_LSB_BITS, MAX_LSB_BITS
+from coverCache import CoverCache
+from imageStegano import ImageStegano
+from audioStegano import AudioStegano
+from PIL import Image
+
+def measure(function:Callable, *args, repeat:int=3) -> float:
+    """
+    Function to measure fastest running time of a function from several repetition.
+    Return time in seconds.
+
+    Parameter.
+    ----------
+    function : Callable
+        Function you want to measure.
+    args : any
+        Argument for the function.
+    repeat : int, default 3
+        Number of repetition.
+    """
+    best:float = float("inf")
+    for _ in range(repeat):
+        start:float = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def throughput(size:int, seconds:float) -> float:
+    """
+    Function to convert processed size and time to MB/s.
+    Return throughput in MB/s.
+
+    Parameter.
+    ----------
+    size : int
+        Number of processed bytes.
+    seconds : float
+        Time needed to process the bytes.
+    """
+    return size / (1 << 20) / seconds
+
+def benchmarkRC4TextMode(size:int=1 << 20) -> None:
+    """
+    Benchmark rc4 text mode (hex string) against byte mode with same input size.
+
+    Parameter.
+    ----------
+    size : int, default 1 MB
+        Number of plaintext bytes.
+    """
+    key:str = "benchmark"
+    data:bytes = os.urandom(size)
+    text:str = data.decode("latin-1")
+    ciphertext:str = encrypt(text, key)
+    cipher_bytes:bytearray = encryptByte2(data, key)
+
+    results:Dict[str, float] = {
+        "encrypt": throughput(size, measure(encrypt, text, key)),
+        "decrypt": throughput(size, measure(decrypt, ciphertext, key)),
+        "encryptByte2": throughput(size, measure(encryptByte2, data, key)),
+        "decryptByte2": throughput(size, measure(decryptByte2, cipher_bytes, key)),
+    }
+    print("RC4 text vs byte mode, input", size, "bytes")
+    for name, value in results.items():
+        print("  {:<14}{:>10.2f} MB/s".format(name, value))
+    print("  byte/text ratio encrypt {:.2f}x, decrypt {:.2f}x".format(
+        results["encryptByte2"] / results["encrypt"], results["decryptByte2"] / results["decrypt"]))
+
+def benchmarkRC4BlockMode(sizes:Iterable[int]=(1 << 20, 64 << 20, 512 << 20)) -> None:
+    """
+    Benchmark rc4 block mode (keystream and numpy XOR) against per-byte encryptByte2.
+
+    Parameter.
+    ----------
+    sizes : Iterable[int], default 1 MB, 64 MB and 512 MB
+        Input size in bytes for each run.
+    """
+    key:str = "benchmark"
+    print("RC4 encryptByte2 vs encryptBlock")
+    for size in sizes:
+        data:bytes = os.urandom(size)
+        # Big input only measured once, it already take a while.
+        repeat:int = 3 if size <= (1 << 20) else 1
+        before:float = throughput(size, measure(encryptByte2, data, key, repeat=repeat))
+        after:float = throughput(size, measure(encryptBlock, data, key, repeat=repeat))
+        print("  {:>6} MB  before {:>8.2f} MB/s  after {:>8.2f} MB/s  speedup {:.2f}x".format(
+            size >> 20, before, after, after / before))
+
+def benchmarkRC4Segmented(size:int=64 << 20, segment_size:int=4 << 20) -> None:
+    """
+    Benchmark segmented container encryption scaling from one worker up to number of cpu.
+
+    Parameter.
+    ----------
+    size : int, default 64 MB
+        Input size in bytes.
+    segment_size : int, default 4 MB
+        Number of bytes in each segment.
+    """
+    key:str = "benchmark"
+    data:bytes = os.urandom(size)
+    print("RC4 segmented container,", size >> 20, "MB input,", segment_size >> 20, "MB segment")
+    single:float = 0
+    for workers in range(1, (os.cpu_count() or 1) + 1):
+        result:float = throughput(size, measure(encryptSegmented, data, key, segment_size, workers,
+            repeat=1))
+        single = single or result
+        print("  {:>3} worker  {:>8.2f} MB/s  scaling {:.2f}x".format(workers, result, result / single))
+
+def createImageCover(path:str, width:int=6000, height:int=4000) -> None:
+    """
+    Create smooth RGB cover for benchmark, default is 24 megapixel. Format follow path extension.
+
+    Parameter.
+    ----------
+    path : str
+        Output PNG or BMP path.
+    width : int, default 6000
+        Image width.
+    height : int, default 4000
+        Image height.
+    """
+    x = np.arange(width, dtype=np.uint32)
+    y = np.arange(height, dtype=np.uint32)[:, None]
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = (x + y) & 255
+    pixels[..., 1] = (x * 3) & 255
+    pixels[..., 2] = (y * 5) & 255
+    Image.fromarray(pixels, "RGB").save(path, compress_level=1)
+
+def createAudioCover(path:str, seconds:int=600, rate:int=44100) -> None:
+    """
+    Create 16-bit stereo WAV cover for benchmark, default is 10 minutes.
+
+    Parameter.
+    ----------
+    path : str
+        Output WAV path.
+    seconds : int, default 600
+        Audio duration.
+    rate : int, default 44100
+        Sample rate.
+    """
+    t = np.arange(seconds * rate) / rate
+    tone = (np.sin(2 * np.pi * 440 * t) * 8000).astype("<i2")
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(np.repeat(tone, 2).tobytes())
+
+def loopEmbed(carrier:bytearray, positions:np.ndarray, bits:np.ndarray) -> None:
+    """
+    Old per-byte modifyBit embedding loop, used as baseline.
+    """
+    for index, bit in zip(positions.tolist(), bits.tolist()):
+        carrier[index] = modifyBit(carrier[index], 0, bit)
+
+def loopExtract(carrier:bytearray, positions:np.ndarray) -> np.ndarray:
+    """
+    Old per-byte LSB reading loop, used as baseline.
+    """
+    bits = np.empty(len(positions), dtype=np.uint8)
+    for bitIndex, index in enumerate(positions.tolist()):
+        bits[bitIndex] = carrier[index] & 1
+    return bits
+
+def benchmarkLSBKernel(message_size:int=1 << 20) -> None:
+    """
+    Benchmark vectorized LSB kernel against per-byte loop on 24 megapixel PNG and 10 minutes
+    stereo WAV, then full embed and extract with both stegano class.
+
+    Parameter.
+    ----------
+    message_size : int, default 1 MB
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        audio_path = os.path.join(directory, "cover.wav")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        createAudioCover(audio_path)
+        with open(message_path, "wb") as message_file:
+            message_file.write(os.urandom(message_size))
+
+        print("LSB kernel,", message_size, "bytes message")
+        covers = (("png 24MP", ImageStegano, image_path), ("wav 10min", AudioStegano, audio_path))
+        for name, cls, cover in covers:
+            stegano = cls(cover, message_path)
+            if (cls is ImageStegano):
+                carrier = stegano.image_bytes
+            else:
+                with wave.open(cover, "rb") as audio:
+                    carrier = bytearray(audio.readframes(audio.getnframes()))
+            bits = np.unpackbits(np.frombuffer(stegano.message, dtype=np.uint8))
+            positions = accessPositions(len(carrier), len(bits))
+            view = np.frombuffer(carrier, dtype=np.uint8)
+            loop_embed = measure(loopEmbed, carrier, positions, bits, repeat=1)
+            kernel_embed = measure(embedBits, view, positions, bits)
+            loop_extract = measure(loopExtract, carrier, positions, repeat=1)
+            kernel_extract = measure(extractBits, view, positions)
+            print(("  {:<10} embed loop {:.3f}s kernel {:.3f}s ({:.0f}x), "
+                "extract loop {:.3f}s kernel {:.3f}s ({:.0f}x)").format(name, loop_embed, kernel_embed, loop_embed / kernel_embed, loop_extract, kernel_extract,
+                loop_extract / kernel_extract))
+
+            start = time.perf_counter()
+            output_path = cls(cover, message_path).embed(
+                output_file_name=os.path.join(directory, "stego"))
+            embed_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cls(output_path).extract(os.path.join(directory, "extracted"))
+            print("  {:<10} full embed {:.3f}s, full extract {:.3f}s".format(name, embed_time,
+                time.perf_counter() - start))
+
+def benchmarkMultiBitLSB(message_size:int=1 << 20) -> None:
+    """
+    Benchmark embed and extract with 1 until 4 LSB per carrier byte on 24 megapixel PNG, with
+    estimated and measured psnr of every number of LSB.
+
+    Parameter.
+    ----------
+    message_size : int, default 1 MB
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        with open(message_path, "wb") as message_file:
+            message_file.write(os.urandom(message_size))
+
+        print("Multi-bit LSB on png 24MP,", message_size, "bytes message")
+        estimate = ImageStegano(image_path, message_path).estimatePSNR()
+        for lsb_bits in range(MIN_LSB_BITS, MAX_LSB_BITS + 1):
+            stegano = ImageStegano(image_path, message_path)
+            start = time.perf_counter()
+            output_path = stegano.embed(output_file_name=os.path.join(directory, "stego"),
+                lsb_bits=lsb_bits)
+            embed_time = time.perf_counter() - start
+            start = time.perf_counter()
+            ImageStegano(output_path).extract(os.path.join(directory, "extracted"))
+            extract_time = time.perf_counter() - start
+            psnr = ImageStegano.calculatePSNR(image_path, output_path)
+            print("  {} LSB embed {:.3f}s, extract {:.3f}s, psnr {:.2f} (estimate {:.2f})".format(
+                lsb_bits, embed_time, extract_time, psnr, estimate[lsb_bits]))
+
+def pillowEmbed(image_path:str, output_path:str, message:bytes) -> None:
+    """
+    Embed message through Pillow decode and encode, like ImageStegano did for every BMP.
+
+    Parameter.
+    ----------
+    image_path : str
+        Cover path.
+    output_path : str
+        Stego image path.
+    message : bytes
+        Message to hide.
+    """
+    with Image.open(image_path) as image:
+        image_bytes = bytearray(image.tobytes())
+        embedMessage(np.frombuffer(image_bytes, dtype=np.uint8), frameMessage("bin", message, False,
+            False))
+        with Image.frombytes(image.mode, image.size, bytes(image_bytes)) as new_image:
+            new_image.save(output_path, image.format)
+
+def measureMemory(function:Callable, *args) -> Tuple[float, int]:
+    """
+    Function to run a function once while tracing python memory allocation.
+    Return tuple of running time in seconds and peak allocation in bytes.
+
+    Parameter.
+    ----------
+    function : Callable
+        Function you want to measure.
+    args : Any
+        Argument for the function.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (elapsed, peak)
+
+def benchmarkBMPMemoryMap(message_size:int=64 << 10) -> None:
+    """
+    Benchmark embed and extract on 24 megapixel BMP with memory mapped pixel array against Pillow
+    decode and encode.
+
+    Parameter.
+    ----------
+    message_size : int, default 64 KB
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.bmp")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        message = os.urandom(message_size)
+        with open(message_path, "wb") as message_file:
+            message_file.write(message)
+
+        print("BMP 24MP,", message_size, "bytes message")
+        pillow_time, pillow_peak = measureMemory(pillowEmbed, image_path,
+            os.path.join(directory, "pillow.bmp"), message)
+        embed_time, embed_peak = measureMemory(
+            lambda: ImageStegano(image_path, message_path).embed(
+                output_file_name=os.path.join(directory, "mapped")))
+        extract_time, extract_peak = measureMemory(
+            lambda: ImageStegano(os.path.join(directory, "mapped.bmp")).extract(
+                os.path.join(directory, "extracted")))
+        print("  pillow embed {:.3f}s peak {:.1f} MB".format(pillow_time, pillow_peak / 2**20))
+        print("  mapped embed {:.3f}s peak {:.1f} MB, extract {:.3f}s peak {:.1f} MB".format(
+            embed_time, embed_peak / 2**20, extract_time, extract_peak / 2**20))
+
+def benchmarkWaveStream(message_size:int=64 << 10) -> None:
+    """
+    Benchmark sequential and randomized embed and extract on 10 minutes stereo WAV, with peak
+    python memory allocation.
+
+    Parameter.
+    ----------
+    message_size : int, default 64 KB
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        audio_path = os.path.join(directory, "cover.wav")
+        message_path = os.path.join(directory, "message.bin")
+        createAudioCover(audio_path)
+        with open(message_path, "wb") as message_file:
+            message_file.write(os.urandom(message_size))
+
+        print("WAV 10min ({:.0f} MB),".format(os.path.getsize(audio_path) / 2**20), message_size,
+            "bytes message")
+        for is_random, key in ((False, None), (True, "benchmark")):
+            stego_path = os.path.join(directory, "stego")
+            embed_time, embed_peak = measureMemory(
+                lambda: AudioStegano(audio_path, message_path).embed(key=key, is_random=is_random,
+                    output_file_name=stego_path))
+            extract_time, extract_peak = measureMemory(
+                lambda: AudioStegano(stego_path + ".wav").extract(
+                    os.path.join(directory, "extracted"), key=key))
+            print("  {:<10} embed {:.3f}s peak {:.1f} MB, extract {:.3f}s peak {:.1f} MB".format(
+                "random" if is_random else "sequential", embed_time, embed_peak / 2**20,
+                extract_time, extract_peak / 2**20))
+
+def fullDecodeExtract(image_path:str, output_path:str) -> None:
+    """
+    Extract sequential message after decoding the whole PNG, like before the scanline decoder.
+
+    Parameter.
+    ----------
+    image_path : str
+        Stego image path.
+    output_path : str
+        Extracted message file name.
+    """
+    image_stegano = ImageStegano(image_path)
+    image_stegano.loadPixels()
+    image_stegano.extract(output_path)
+
+def benchmarkPNGStream(message_sizes:Iterable[int]=(1 << 10, 64 << 10, 1 << 20)) -> None:
+    """
+    Benchmark sequential extract on 24 megapixel PNG, decoding scanline until the message end
+    against decoding the whole image.
+
+    Parameter.
+    ----------
+    message_sizes : Iterable[int], default (1 KB, 64 KB, 1 MB)
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        print("PNG 24MP sequential extract")
+        for size in message_sizes:
+            with open(message_path, "wb") as message_file:
+                message_file.write(os.urandom(size))
+            stego_path = ImageStegano(image_path, message_path).embed(
+                output_file_name=os.path.join(directory, "stego"))
+            output_path = os.path.join(directory, "extracted")
+            full_time = measure(fullDecodeExtract, stego_path, output_path, repeat=1)
+            stream_time = measure(lambda: ImageStegano(stego_path).extract(output_path))
+            print("  {:>8} bytes  full decode {:.3f}s, scanline {:.3f}s".format(size, full_time,
+                stream_time))
+
+def benchmarkPNGStrips(message_size:int=64 << 10, strip_budget:int=8 << 20) -> None:
+    """
+    Benchmark randomized embed and extract on 24 megapixel PNG strip by strip against decoding the
+    whole image, with peak python memory allocation.
+
+    Parameter.
+    ----------
+    message_size : int, default 64 KB
+        Message size in bytes.
+    strip_budget : int, default 8 MB
+        Maximum number of decoded bytes of one strip, smaller than the cover so it is handled strip
+        by strip.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        with open(message_path, "wb") as message_file:
+            message_file.write(os.urandom(message_size))
+
+        print("PNG 24MP randomized,", message_size, "bytes message")
+        for name, budget in (("whole", 1 << 40), ("strips", strip_budget)):
+            stego_path = os.path.join(directory, name)
+            embed_time, embed_peak = measureMemory(
+                lambda: ImageStegano(image_path, message_path, budget).embed(key="benchmark",
+                    is_random=True, output_file_name=stego_path))
+            extract_time, extract_peak = measureMemory(
+                lambda: ImageStegano(stego_path + ".png", strip_budget=budget).extract(
+                    os.path.join(directory, "extracted"), key="benchmark"))
+            print("  {:<7} embed {:.3f}s peak {:.1f} MB, extract {:.3f}s peak {:.1f} MB, file {:.1f} MB".format(
+                name, embed_time, embed_peak / 2**20, extract_time, extract_peak / 2**20,
+                os.path.getsize(stego_path + ".png") / 2**20))
+
+def benchmarkCoverCache(message_size:int=64 << 10, width:int=1600, height:int=1200) -> None:
+    """
+    Benchmark repeated embed into the same PNG cover, decoding the cover every time against taking
+    the decoded cover from cover cache.
+
+    Parameter.
+    ----------
+    message_size : int, default 64 KB
+        Message size in bytes.
+    width : int, default 1600
+        Cover width in pixel, the cover must be smaller than the strip budget to be cached.
+    height : int, default 1200
+        Cover height in pixel.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        createImageCover(image_path, width, height)
+        message:bytes = os.urandom(message_size)
+        output_path = os.path.join(directory, "stego")
+        cover_cache:CoverCache = CoverCache()
+        ImageStegano(image_path, message, message_extension="bin", cover_cache=cover_cache)
+        results:Dict[str, float] = {
+            "decode": measure(lambda: ImageStegano(image_path, message, message_extension="bin")),
+            "cached": measure(lambda: ImageStegano(image_path, message, message_extension="bin",
+                cover_cache=cover_cache)),
+            "decode+embed": measure(lambda: ImageStegano(image_path, message,
+                message_extension="bin").embed(output_file_name=output_path)),
+            "cached+embed": measure(lambda: ImageStegano(image_path, message, message_extension="bin",
+                cover_cache=cover_cache).embed(output_file_name=output_path)),
+        }
+        print("PNG {}x{} cover, {} bytes message".format(width, height, message_size))
+        for name, value in results.items():
+            print("  {:<14}{:>8.3f}s".format(name, value))
+        print("  cache", cover_cache.stats())
+
+def benchmarkQualityMetrics(message_size:int=1 << 20) -> None:
+    """
+    Benchmark quality metrics counted from carrier in memory while embedding against decoding
+    cover and stego file again, on 24 megapixel PNG and 10 minutes stereo WAV.
+
+    Parameter.
+    ----------
+    message_size : int, default 1 MB
+        Message size in bytes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        image_path = os.path.join(directory, "cover.png")
+        audio_path = os.path.join(directory, "cover.wav")
+        message_path = os.path.join(directory, "message.bin")
+        createImageCover(image_path)
+        createAudioCover(audio_path)
+        with open(message_path, "wb") as message_file:
+            message_file.write(os.urandom(message_size))
+
+        print("Quality metrics,", message_size, "bytes message")
+        covers = (("png 24MP", ImageStegano, image_path), ("wav 10min", AudioStegano, audio_path))
+        for name, cls, cover in covers:
+            stego_path = os.path.join(directory, "stego")
+            start = time.perf_counter()
+            cls(cover, message_path).embed(output_file_name=stego_path)
+            embed_time = time.perf_counter() - start
+            start = time.perf_counter()
+            output_path, _ = cls(cover, message_path).embed(output_file_name=stego_path,
+                with_metrics=True)
+            metrics_time = time.perf_counter() - start - embed_time
+            start = time.perf_counter()
+            cls.calculateMetrics(cover, output_path)
+            file_time = time.perf_counter() - start
+            print("  {:<10} in memory {:.3f}s, from file {:.3f}s".format(name, metrics_time,
+                file_time))
+
+# Available benchmark, run with "python benchmark.py [name ...]".
+BENCHMARKS:Dict[str, Callable] = {
+    "rc4-text": benchmarkRC4TextMode,
+    "rc4-block": benchmarkRC4BlockMode,
+    "rc4-segmented": benchmarkRC4Segmented,
+    "lsb-kernel": benchmarkLSBKernel,
+    "lsb-multibit": benchmarkMultiBitLSB,
+    "bmp-mmap": benchmarkBMPMemoryMap,
+    "wav-stream": benchmarkWaveStream,
+    "quality-metrics": benchmarkQualityMetrics,
+    "png-stream": benchmarkPNGStream,
+    "png-strips": benchmarkPNGStrips,
+    "cover-cache": benchmarkCoverCache,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if (name not in BENCHMARKS):
+            raise Exception("Unknown benchmark " + name)
+        BENCHMARKS[name]()
+
+if __name__=="__main__":
+    main()
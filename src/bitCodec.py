@@ -0,0 +1,39 @@
+# Python module.
+import numpy as np
+
+def bytesToBits(data:bytes) -> np.ndarray:
+    """
+    Converting bytes to array of bit, most significant bit first (same order as format(byte, "08b")).
+    Return uint8 array with 8 item (0 or 1) for each byte.
+
+    Parameter.
+    ----------
+    data : bytes
+        Bytes you want to convert to bit.
+    """
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+
+def bitsToBytes(bits:np.ndarray) -> bytes:
+    """
+    Converting array of bit back to bytes, most significant bit first. Remaining bit that can not
+    make full byte is dropped.
+    Return bytes.
+
+    Parameter.
+    ----------
+    bits : np.ndarray
+        uint8 array of bit (0 or 1).
+    """
+    return np.packbits(bits[:len(bits) - len(bits) % 8]).tobytes()
+
+def concatenateBits(*parts) -> np.ndarray:
+    """
+    Concatenating several bit array or single bit into one array.
+    Return uint8 array of bit.
+
+    Parameter.
+    ----------
+    parts : np.ndarray or int
+        Bit array or single bit value.
+    """
+    return np.concatenate([np.atleast_1d(np.asarray(part, dtype=np.uint8)) for part in parts])
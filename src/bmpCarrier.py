@@ -0,0 +1,190 @@
+# Python module.
+import struct
+import numpy as np
+from typing import NamedTuple
+
+# Own module.
+from fileSource import openSource, Source
+
+# BMP file header and the part of BITMAPINFOHEADER (or bigger version) we need.
+FILE_HEADER_FORMAT:str = "<2sIHHI"
+FILE_HEADER_SIZE:int = struct.calcsize(FILE_HEADER_FORMAT)
+INFO_HEADER_FORMAT:str = "<IiiHHI"
+INFO_HEADER_SIZE:int = 40
+COMPRESSION_RGB:int = 0
+
+# Channel order of one pixel in Pillow bytes, as byte offset inside the pixel in file.
+# 24 and 32 bit file store BGR(X), Pillow give RGB. 8 bit file store palette index like Pillow.
+CHANNEL_OFFSETS = {
+    8: (0,),
+    24: (2, 1, 0),
+    32: (2, 1, 0),
+}
+
+class BMPLayout(NamedTuple):
+    """
+    A class used for representing pixel layout of uncompressed BMP file.
+
+    Attributes.
+    ----------
+    offset : int
+        Position of pixel array in file.
+    width : int
+        Image width in pixel.
+    height : int
+        Image height in pixel.
+    bytes_per_pixel : int
+        Number of bytes of one pixel in file.
+    row_size : int
+        Number of bytes of one row in file, including padding to 4 bytes.
+    bottom_up : bool
+        Boolean indicating first row in file is the last row of the image.
+    channel_offsets : tuple
+        Byte offset inside the pixel for every channel in Pillow bytes order.
+    """
+    offset:int
+    width:int
+    height:int
+    bytes_per_pixel:int
+    row_size:int
+    bottom_up:bool
+    channel_offsets:tuple
+
+    @property
+    def length(self) -> int:
+        """
+        Number of carrier item, same as length of Pillow tobytes.
+        """
+        return self.width * self.height * len(self.channel_offsets)
+
+def readBMPLayout(bmp_source:Source) -> BMPLayout:
+    """
+    Function to parse BMP header.
+    Return BMPLayout, or none if the file is not uncompressed 8, 24 or 32 bit BMP (use Pillow for it).
+
+    Parameter.
+    ----------
+    bmp_source : Source
+        Path to BMP file, BMP content or binary file object.
+    """
+    with openSource(bmp_source) as bmp_file:
+        header:bytes = bmp_file.read(FILE_HEADER_SIZE + INFO_HEADER_SIZE)
+        bmp_file.seek(0, 2)
+        file_size:int = bmp_file.tell()
+    if (len(header) < FILE_HEADER_SIZE + INFO_HEADER_SIZE):
+        return None
+    signature, _, _, _, offset = struct.unpack_from(FILE_HEADER_FORMAT, header, 0)
+    info_size, width, height, planes, bit_count, compression = struct.unpack_from(INFO_HEADER_FORMAT,
+        header, FILE_HEADER_SIZE)
+    if (signature != b"BM" or info_size < INFO_HEADER_SIZE or planes != 1 or width <= 0 or height == 0
+        or compression != COMPRESSION_RGB or bit_count not in CHANNEL_OFFSETS):
+        return None
+    bytes_per_pixel:int = bit_count // 8
+    row_size:int = (width * bytes_per_pixel + 3) & ~3
+    if (offset + row_size * abs(height) > file_size):
+        return None
+    return BMPLayout(offset, width, abs(height), bytes_per_pixel, row_size, height > 0,
+        CHANNEL_OFFSETS[bit_count])
+
+class BMPCarrier:
+    """
+    A class used for representing pixel array of BMP file mapped to memory, indexed like Pillow
+    tobytes (top-down rows, RGB channel, no padding). Only the indexed byte is read or written, so
+    the whole image is never decoded. BMP content already in memory is viewed the same way.
+
+    Attributes.
+    ----------
+    layout : BMPLayout
+        Pixel layout of the file.
+    pixels : np.ndarray
+        Mapped (np.memmap) or viewed pixel array, including row padding.
+    """
+
+    def __init__(self, bmp_source, layout:BMPLayout, mode:str="r") -> None:
+        """
+        Constructor for BMPCarrier class.
+
+        Parameter.
+        ----------
+        bmp_source : str or bytes-like
+            Path to BMP file, or BMP content (bytearray to write the LSB in place).
+        layout : BMPLayout
+            Pixel layout from readBMPLayout.
+        mode : str, default "r"
+            Memmap mode, "r+" to write the LSB back to the file.
+        """
+        self.layout:BMPLayout = layout
+        if (isinstance(bmp_source, str)):
+            self.pixels:np.ndarray = np.memmap(bmp_source, dtype=np.uint8, mode=mode,
+                offset=layout.offset, shape=(layout.row_size * layout.height,))
+        else:
+            self.pixels:np.ndarray = np.frombuffer(bmp_source, dtype=np.uint8,
+                count=layout.row_size * layout.height, offset=layout.offset)
+        self._channel_offsets:np.ndarray = np.array(layout.channel_offsets, dtype=np.int64)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Type of carrier item, always uint8.
+        """
+        return self.pixels.dtype
+
+    def __len__(self) -> int:
+        """
+        Number of carrier item.
+        """
+        return self.layout.length
+
+    def fileIndex(self, positions) -> np.ndarray:
+        """
+        Function to convert Pillow bytes position to position in mapped pixel array.
+        Return int64 array of position.
+
+        Parameter.
+        ----------
+        positions : np.ndarray or int
+            Position in Pillow bytes order.
+        """
+        layout:BMPLayout = self.layout
+        channels:int = len(layout.channel_offsets)
+        row, column = np.divmod(np.asarray(positions, dtype=np.int64), layout.width * channels)
+        pixel, channel = np.divmod(column, channels)
+        if (layout.bottom_up):
+            row = layout.height - 1 - row
+        return row * layout.row_size + pixel * layout.bytes_per_pixel + self._channel_offsets[channel]
+
+    def __getitem__(self, positions) -> np.ndarray:
+        return self.pixels[self.fileIndex(positions)]
+
+    def __setitem__(self, positions, values) -> None:
+        self.pixels[self.fileIndex(positions)] = values
+
+    def rows(self, start:int, stop:int) -> np.ndarray:
+        """
+        Function to read pixel of row start until stop, in Pillow order.
+        Return uint8 array with shape (rows, width, channel).
+
+        Parameter.
+        ----------
+        start : int
+            First row, counted from the top of the image.
+        stop : int
+            Row after the last row.
+        """
+        layout:BMPLayout = self.layout
+        rows:np.ndarray = self.pixels.reshape(layout.height, layout.row_size)
+        if (layout.bottom_up):
+            rows = rows[layout.height - stop:layout.height - start][::-1]
+        else:
+            rows = rows[start:stop]
+        pixels:np.ndarray = rows[:, :layout.width * layout.bytes_per_pixel].reshape(-1, layout.width,
+            layout.bytes_per_pixel)
+        return pixels[:, :, list(layout.channel_offsets)]
+
+    def close(self) -> None:
+        """
+        Function to write changed byte to the file and release the mapping.
+        """
+        if (isinstance(self.pixels, np.memmap) and self.pixels.mode != "r"):
+            self.pixels.flush()
+        self.pixels = None
@@ -0,0 +1,323 @@
+# Python module.
+import os
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+# Own module.
+from fileSource import openSource, Source
+
+# Default number of bytes of decoded cover kept in memory.
+COVER_CACHE_BUDGET:int = 256 << 20
+# Number of bytes counted for entry without pixel, like layout and capacity only.
+ENTRY_OVERHEAD:int = 1024
+# Number of bytes read at once while hashing or storing cover.
+HASH_BLOCK:int = 1 << 20
+# Cover extension kept by the store, the first one found is used.
+COVER_EXTENSIONS = (".png", ".bmp", ".wav")
+# Default number of second stored cover is kept after its last use.
+COVER_STORE_TTL:float = 24 * 3600
+# Default maximum number of bytes of every stored cover.
+COVER_STORE_BUDGET:int = 1 << 30
+
+def contentHash(source:Source) -> str:
+    """
+    Function to hash file content, same content always give same hash whatever its name.
+    Return lowercase hex SHA-256 digest.
+
+    Parameter.
+    ----------
+    source : Source
+        Path, content in memory, or seekable binary file object.
+    """
+    digest = hashlib.sha256()
+    if (isinstance(source, (bytes, bytearray, memoryview))):
+        digest.update(source)
+        return digest.hexdigest()
+    with openSource(source) as source_file:
+        for block in iter(lambda: source_file.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def isContentHash(value:str) -> bool:
+    """
+    Function to check value is hash from contentHash, so it is safe as file name.
+    Return true if value is 64 lowercase hex digit.
+
+    Parameter.
+    ----------
+    value : str
+        Value to check.
+    """
+    return (isinstance(value, str) and len(value) == 64 and
+        all(character in "0123456789abcdef" for character in value))
+
+class CoverCache:
+    """
+    A class used for keeping decoded cover (pixel array, layout and capacity) in memory by content
+    hash, shared by every request. Least recently used cover is evicted when the total size is over
+    budget. Cached value must not be changed, user copy the pixel array before writing to it.
+
+    Attributes.
+    ----------
+    budget : int
+        Maximum number of bytes of every cached value.
+    size : int
+        Number of bytes of every cached value.
+    hits : int
+        Number of lookup that found the cover.
+    misses : int
+        Number of lookup that did not find the cover.
+    evictions : int
+        Number of cover removed to keep the size under budget.
+    """
+
+    def __init__(self, budget:int=COVER_CACHE_BUDGET) -> None:
+        """
+        Constructor for CoverCache class.
+
+        Parameter.
+        ----------
+        budget : int, default COVER_CACHE_BUDGET
+            Maximum number of bytes of every cached value.
+        """
+        self.budget:int = budget
+        self.size:int = 0
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+        self._entries:OrderedDict = OrderedDict()
+        self._lock:threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Number of cached cover.
+        """
+        return len(self._entries)
+
+    def get(self, cover_hash:str) -> Dict:
+        """
+        Function to find cached cover and mark it as recently used.
+        Return cached value, or none if not cached.
+
+        Parameter.
+        ----------
+        cover_hash : str
+            Content hash of the cover.
+        """
+        with self._lock:
+            entry:Tuple[Dict, int] = self._entries.get(cover_hash)
+            if (entry is None):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(cover_hash)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, cover_hash:str, value:Dict, nbytes:int) -> bool:
+        """
+        Function to cache cover, replacing older value of the same hash.
+        Return true if cached, false if the value alone is bigger than the budget.
+
+        Parameter.
+        ----------
+        cover_hash : str
+            Content hash of the cover.
+        value : dict
+            Decoded cover, not changed after this.
+        nbytes : int
+            Number of bytes of the value.
+        """
+        with self._lock:
+            old:Tuple[Dict, int] = self._entries.pop(cover_hash, None)
+            if (old is not None):
+                self.size -= old[1]
+            if (nbytes > self.budget):
+                return False
+            self._entries[cover_hash] = (value, nbytes)
+            self.size += nbytes
+            while (self.size > self.budget):
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.size -= evicted_bytes
+                self.evictions += 1
+            return True
+
+    def clear(self) -> None:
+        """
+        Function to remove every cached cover, counter is kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Function to describe cache usage.
+        Return dictionary of entries, size, budget, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size": self.size,
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+class CoverStore:
+    """
+    A class used for keeping uploaded cover file by content hash, so client can use the hash instead
+    of sending the same cover again. Same content is stored once, cover already stored is not
+    written again. Cover is removed cover_ttl second after its last use, and least recently used
+    cover is removed when the total size is over budget.
+
+    Attributes.
+    ----------
+    directory : str
+        Directory of stored cover, file is named hash and extension.
+    cover_ttl : float
+        Number of second cover is kept after its last use.
+    budget : int
+        Maximum number of bytes of every stored cover.
+    hits : int
+        Number of lookup that found the cover.
+    misses : int
+        Number of lookup that did not find the cover.
+    evictions : int
+        Number of cover removed because it expired or the store is over budget.
+    """
+
+    def __init__(self, directory:str, cover_ttl:float=COVER_STORE_TTL,
+        budget:int=COVER_STORE_BUDGET) -> None:
+        """
+        Constructor for CoverStore class.
+
+        Parameter.
+        ----------
+        directory : str
+            Directory of stored cover, created if not exist.
+        cover_ttl : float, default COVER_STORE_TTL
+            Number of second cover is kept after its last use.
+        budget : int, default COVER_STORE_BUDGET
+            Maximum number of bytes of every stored cover.
+        """
+        self.directory:str = directory
+        self.cover_ttl:float = cover_ttl
+        self.budget:int = budget
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+        self._lock:threading.Lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def find(self, cover_hash:str) -> str:
+        """
+        Function to find stored cover and mark it as recently used.
+        Return path to the cover, or none if unknown, expired or hash is not valid.
+
+        Parameter.
+        ----------
+        cover_hash : str
+            Content hash of the cover.
+        """
+        if (isContentHash(cover_hash)):
+            limit:float = time.time() - self.cover_ttl
+            with self._lock:
+                for extension in COVER_EXTENSIONS:
+                    path:str = os.path.join(self.directory, cover_hash + extension)
+                    try:
+                        if (os.path.getmtime(path) < limit):
+                            continue
+                        os.utime(path)
+                    except OSError:
+                        continue
+                    self.hits += 1
+                    return path
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def save(self, source:Source, extension:str) -> Tuple[str, str]:
+        """
+        Function to store cover. Content is hashed first, so cover already stored is not written
+        again.
+        Return tuple of content hash and path to the stored cover, path is none if the cover alone
+        is bigger than the budget.
+
+        Parameter.
+        ----------
+        source : Source
+            Path, content in memory, or seekable binary file object.
+        extension : str
+            Cover extension with dot, one of COVER_EXTENSIONS.
+        """
+        if (extension not in COVER_EXTENSIONS):
+            raise Exception("Can only store png, bmp or wav cover")
+        cover_hash:str = contentHash(source)
+        path:str = self.find(cover_hash)
+        if (path is not None):
+            return (cover_hash, path)
+        with openSource(source) as source_file:
+            if (source_file.seek(0, os.SEEK_END) > self.budget):
+                return (cover_hash, None)
+            source_file.seek(0)
+            with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp",
+                delete=False) as temporary_file:
+                shutil.copyfileobj(source_file, temporary_file, HASH_BLOCK)
+        path = os.path.join(self.directory, cover_hash + extension)
+        os.replace(temporary_file.name, path)
+        self.prune(keep=path)
+        return (cover_hash, path)
+
+    def prune(self, keep:str=None) -> None:
+        """
+        Function to remove expired cover, then least recently used cover until the total size is
+        under budget.
+
+        Parameter.
+        ----------
+        keep : str, default none
+            Path to cover that is never removed, like the one just stored for running request.
+        """
+        limit:float = time.time() - self.cover_ttl
+        with self._lock:
+            entries:List[Tuple[float, int, str]] = []
+            for name in os.listdir(self.directory):
+                path:str = os.path.join(self.directory, name)
+                if (name.endswith(".tmp") or path == keep):
+                    continue
+                try:
+                    entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+                except OSError:
+                    continue
+            entries.sort()
+            total:int = sum(size for _, size, _ in entries)
+            if (keep is not None):
+                total += os.path.getsize(keep)
+            for used, size, path in entries:
+                if (used >= limit and total <= self.budget):
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Function to describe store usage.
+        Return dictionary of budget, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
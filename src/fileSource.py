@@ -0,0 +1,148 @@
+# Python module.
+import io
+import os
+from typing import BinaryIO, Union
+
+# Input file can be path, content in memory, or binary file object (uploaded stream, spooled file).
+Source = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# Leading bytes of supported carrier format.
+SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"BM", ".bmp"),
+)
+
+class SourceView(io.RawIOBase):
+    """
+    A class used for reading shared binary file object with its own position, so several reader can
+    use the same uploaded stream one after another. Closing the view keep the file object open.
+
+    Attributes.
+    ----------
+    file : BinaryIO
+        Shared seekable binary file object.
+    position : int
+        Read position of this view.
+    """
+
+    def __init__(self, file:BinaryIO) -> None:
+        """
+        Constructor for SourceView class.
+
+        Parameter.
+        ----------
+        file : BinaryIO
+            Shared seekable binary file object.
+        """
+        super().__init__()
+        self.file:BinaryIO = file
+        self.position:int = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        self.file.seek(self.position)
+        data:bytes = self.file.read(len(buffer))
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def seek(self, offset:int, whence:int=io.SEEK_SET) -> int:
+        if (whence == io.SEEK_CUR):
+            offset += self.position
+        elif (whence == io.SEEK_END):
+            offset += self.file.seek(0, io.SEEK_END)
+        self.position = max(offset, 0)
+        return self.position
+
+    def tell(self) -> int:
+        return self.position
+
+def openSource(source:Source) -> BinaryIO:
+    """
+    Function to open input for reading from the beginning.
+    Return new binary file object, closing it never close file object given as source.
+
+    Parameter.
+    ----------
+    source : Source
+        Path, content in memory, or seekable binary file object.
+    """
+    if (isinstance(source, str)):
+        return open(source, "rb")
+    if (isinstance(source, (bytes, bytearray, memoryview))):
+        return io.BytesIO(source)
+    return io.BufferedReader(SourceView(source))
+
+def readSource(source:Source) -> bytes:
+    """
+    Function to read the whole input.
+    Return content in bytes.
+
+    Parameter.
+    ----------
+    source : Source
+        Path, content in memory, or seekable binary file object.
+    """
+    if (isinstance(source, bytes)):
+        return source
+    with openSource(source) as source_file:
+        return source_file.read()
+
+def sourceName(source:Source) -> str:
+    """
+    Function to get file name of input, path or name of uploaded file.
+    Return file name, empty if unknown.
+
+    Parameter.
+    ----------
+    source : Source
+        Path, content in memory, or binary file object.
+    """
+    if (isinstance(source, str)):
+        return source
+    name = getattr(source, "filename", None) or getattr(source, "name", None)
+    return name if isinstance(name, str) else ""
+
+def sourceExtension(source:Source) -> str:
+    """
+    Function to get lowercase file extension of input, from its name or else from its leading bytes.
+    Return extension with dot, empty if unknown.
+
+    Parameter.
+    ----------
+    source : Source
+        Path, content in memory, or binary file object.
+    """
+    extension:str = os.path.splitext(sourceName(source))[1].lower()
+    if (extension or isinstance(source, str)):
+        return extension
+    with openSource(source) as source_file:
+        head:bytes = source_file.read(12)
+    for signature, signature_extension in SIGNATURES:
+        if (head.startswith(signature)):
+            return signature_extension
+    if (head[:4] == b"RIFF" and head[8:12] == b"WAVE"):
+        return ".wav"
+    return ""
+
+def writeOutput(output, data) -> None:
+    """
+    Function to write the whole output.
+
+    Parameter.
+    ----------
+    output : str or BinaryIO
+        Path to output file, or writable binary file object (kept open).
+    data : bytes-like
+        Output content.
+    """
+    if (isinstance(output, str)):
+        with open(output, "wb") as output_file:
+            output_file.write(data)
+    else:
+        output.write(data)
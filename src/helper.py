@@ -1,5 +1,7 @@
 from typing import List
 import random
+import hashlib
+import numpy as np
 
 
 def stringToBinary(string:str)->str:
@@ -98,3 +100,78 @@ def generate_random_access_table(key:str, length:int) -> List[int]:
     # Randomize and return the table.
     random.shuffle(random_access_table)
     return random_access_table
+
+class KeyedPermutation:
+    """
+    A class used for representing keyed pseudorandom permutation of [0, size) that compute the i-th
+    item on demand, so no table is needed. It is a small-domain Feistel network with cycle-walking.
+
+    Attributes.
+    ----------
+    size : int
+        Number of item in permutation domain.
+    """
+
+    ROUNDS:int = 6
+
+    def __init__(self, key:str, size:int) -> None:
+        """
+        Constructor for KeyedPermutation class.
+
+        Parameter.
+        ----------
+        key : str
+            Key for generating the permutation.
+        size : int
+            Number of item in permutation domain.
+        """
+        if (size <= 0):
+            raise Exception("Permutation size must be positive")
+        self.size:int = size
+        # Feistel work on 2*half_bits domain, cycle-walking bring the value back to [0, size).
+        self._half_bits:int = max(1, ((size - 1).bit_length() + 1) // 2)
+        self._mask:np.uint64 = np.uint64((1 << self._half_bits) - 1)
+        digest:bytes = hashlib.sha512(key.encode("utf-8")).digest()
+        self._round_keys:np.ndarray = np.frombuffer(digest, dtype="<u8")[:self.ROUNDS].copy()
+
+    @staticmethod
+    def _mix(value:np.ndarray) -> np.ndarray:
+        # splitmix64 finalizer, uint64 array arithmetic wrap around.
+        value = (value ^ (value >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        value = (value ^ (value >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return value ^ (value >> np.uint64(31))
+
+    def _encrypt(self, value:np.ndarray) -> np.ndarray:
+        half:np.uint64 = np.uint64(self._half_bits)
+        left:np.ndarray = value >> half
+        right:np.ndarray = value & self._mask
+        for round_key in self._round_keys:
+            left, right = right, left ^ (self._mix(right ^ round_key) & self._mask)
+        return (left << half) | right
+
+    def positions(self, indices:np.ndarray) -> np.ndarray:
+        """
+        Function to get permuted value of many index at once.
+        Return int64 array of permuted value.
+
+        Parameter.
+        ----------
+        indices : np.ndarray
+            Index in [0, size).
+        """
+        value:np.ndarray = np.asarray(indices, dtype=np.uint64)
+        value = self._encrypt(value)
+        outside:np.ndarray = np.flatnonzero(value >= np.uint64(self.size))
+        while (len(outside) > 0):
+            walked:np.ndarray = self._encrypt(value[outside])
+            value[outside] = walked
+            outside = outside[walked >= np.uint64(self.size)]
+        return value.astype(np.int64)
+
+    def __getitem__(self, index:int) -> int:
+        if (index < 0 or index >= self.size):
+            raise IndexError("Permutation index out of range")
+        return int(self.positions(np.array([index]))[0])
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,7 +1,8 @@
 # Python module.
 import os
+import shutil
 import math
-from typing import List
+from typing import BinaryIO, Dict, List, Tuple
 import ntpath
 import numpy as np
 
@@ -11,8 +12,16 @@ from pathlib import Path
 from rc4 import encryptByte2, decryptByte2
 
 # Own module.
-from helper import ByteToBinary, binarytoArrayBynary, generate_random_access_table, modifyBit, \
-    stringToBinary, arrayByteToBinary
+from bmpCarrier import BMPCarrier, BMPLayout, readBMPLayout
+from coverCache import contentHash, CoverCache, ENTRY_OVERHEAD
+from fileSource import openSource, readSource, Source, sourceExtension, sourceName, writeOutput
+from lsbKernel import TrackedCarrier
+from pngCarrier import PNGCarrier, PNGLayout, PNGStripWriter, readPNGLayout, readStrips
+from qualityMetrics import ImageMetrics, imageMetrics, psnrFromMSE
+from stageMetrics import StageTimer
+from stegoFormat import (embedMessage, estimatePSNR, extractMessage, frameMessage, messageCapacity,
+    planMessage, MIN_LSB_BITS, MAX_LSB_BITS)
+from stripCarrier import embedStrips, StripCarrier, stripRows, STRIP_BUDGET
 
 class ImageStegano:
     """
@@ -22,10 +31,24 @@ class ImageStegano:
     ----------
     image : Image
         image is basic image file readed by Pillow library. Image can be container object or stego object.
-    image_path : str
-        Absolute path to image file.
-    image_bytes : bytesarray
-        Image in list of byte representation.
+    image_path : Source
+        Absolute path to image file, or image content or binary file object.
+    pixels : np.ndarray
+        Writable pixel array decoded once by Pillow, none for BMP read directly from file and for
+        PNG not decoded yet. Read only pixel from cover cache when there is no message.
+    image_bytes : np.ndarray
+        Flat uint8 view of pixels in Pillow tobytes order, none like pixels.
+    bmp_layout : BMPLayout
+        Pixel layout of uncompressed BMP file, none for other image (decoded by Pillow).
+    png_layout : PNGLayout
+        Scanline layout of non interlaced PNG, none for other image.
+    strip_rows : int
+        Number of row of one strip when the image is bigger than the strip budget and is handled
+        strip by strip (8 bit PNG), 0 for image decoded at once.
+    carrier_path : Source
+        BMP file (or content) the pixel is mapped from, the stego image after embed.
+    squared_error : int
+        Sum of squared pixel difference made by the last embed.
     image_extension: str
         Extension of the cover image
     max_payload_size : int
@@ -34,60 +57,172 @@ class ImageStegano:
         Message in list of byte representation.
     msg_extension : str
         File extension of the message.
-    modified_message : str
-        Message in binary string representantion.
+    modified_message : np.ndarray
+        Message in array of bit (uint8 0 or 1) representantion.
+    cover_cache : CoverCache
+        Cache of decoded cover shared by every request, none if not used.
+    cover_hash : str
+        Content hash of the image, none if cover cache is not used.
+    timer : StageTimer
+        Timer of the current operation, stage is sent to the metrics registry after embed or extract.
     """
 
-    def __init__(self, image_path:str, input_message_path:str=None) -> None:
+    def __init__(self, image_path:Source, input_message_path:Source=None,
+        strip_budget:int=STRIP_BUDGET, message_extension:str=None, cover_cache:CoverCache=None,
+        cover_hash:str=None) -> None:
         """
         Constructor for ImageStegano class. Read input image file and input message file.
-        Format for image must be BMP or PNG, input message can be any file.
+        Format for image must be BMP or PNG, input message can be any file. Both can be path,
+        content in memory (bytes, bytearray, memoryview) or seekable binary file object like
+        uploaded stream, so nothing need to be saved first.
 
         Parameter.
         ----------
-        image_path : str
-            Absolute path to image file.
-        input_message_path : str
-            Absolute path to message file.
+        image_path : Source
+            Absolute path to image file, or image content or binary file object.
+        input_message_path : Source
+            Absolute path to message file, or message content or binary file object.
+        strip_budget : int, default STRIP_BUDGET
+            Maximum number of decoded bytes in memory at once for big PNG.
+        message_extension : str, default none
+            File extension of the message, taken from message file name if none.
+        cover_cache : CoverCache, default none
+            Cache of decoded cover shared by every request, image with same content is decoded once.
+        cover_hash : str, default none
+            Content hash of the image if already known, counted from the image if none.
         """
 
-        # Check image file validity for processing.
-        # Check extension.
-        file_extension = os.path.splitext(image_path)[1].lower()
-        if (file_extension != ".bmp" and file_extension != ".png"):
-            raise Exception("Can only process bmp or png file for image")
-        # Check if file exist.
-        image = Image.open(image_path, "r")
-        if (not(image)):
-            raise Exception("Input image not exist")
-       
+        # Decoded image of the same content is taken from cache.
+        self.timer:StageTimer = StageTimer()
+        self.cover_cache:CoverCache = cover_cache
+        self.cover_hash:str = None
+        cached:Dict = None
+        if (cover_cache is not None):
+            self.cover_hash = cover_hash or contentHash(image_path)
+            cached = cover_cache.get(self.cover_hash)
+            self.timer.lap("hash")
+
+        image = None
+        cached_pixels:np.ndarray = None
+        if (cached is not None):
+            file_extension = cached["image_extension"]
+            self.bmp_layout:BMPLayout = cached["bmp_layout"]
+            self.png_layout:PNGLayout = cached["png_layout"]
+            self.palette:List[int] = cached["palette"]
+            self.image = cached["image"]
+            cached_pixels = cached["pixels"]
+        else:
+            # Check image file validity for processing.
+            # Check extension, image without file name is checked by its leading bytes.
+            file_extension = sourceExtension(image_path)
+            if (file_extension != ".bmp" and file_extension != ".png"):
+                raise Exception("Can only process bmp or png file for image")
+            # Uncompressed BMP pixel is mapped from file when needed, no need to decode it.
+            self.bmp_layout:BMPLayout = readBMPLayout(image_path) if file_extension == ".bmp" else None
+            if (self.bmp_layout is None):
+                # Check if file exist.
+                image = Image.open(openSource(image_path), "r")
+                if (not(image)):
+                    raise Exception("Input image not exist")
+            self.png_layout:PNGLayout = readPNGLayout(image_path) if file_extension == ".png" else None
+            self.palette:List[int] = None
+            self.image = image
 
         # Process image input.
-        self.image = image
-        self.image_path:str = image_path
+        self.image_path:Source = image_path
         self.image_extension = file_extension
 
-        # Get image bytes representation.
-        self.image_bytes = bytearray(self.image.tobytes())
-        self.max_payload_size:int = len(self.image_bytes)
+        self.carrier_path:Source = image_path
+        self.squared_error:int = 0
+
+        # Get image bytes representation. Image is decoded once into writable array, the carrier
+        # is byte view of it. PNG opened only for extraction is decoded later, only as far as needed.
+        # 8 bit PNG bigger than the strip budget is never decoded at once.
+        self.pixels:np.ndarray = None
+        self.image_bytes:np.ndarray = None
+        self.strip_rows:int = 0
+        if (self.png_layout is not None and self.png_layout.strip_decodable and
+            self.png_layout.row_items * self.png_layout.height > strip_budget):
+            self.strip_rows = stripRows(self.png_layout.row_items, strip_budget)
+        if (self.bmp_layout is not None):
+            self.max_payload_size:int = self.bmp_layout.length
+        elif (self.strip_rows):
+            self.max_payload_size:int = self.png_layout.row_items * self.png_layout.height
+        elif (cached_pixels is not None):
+            # Cached pixel is read only, it is copied only when the message is embedded.
+            self.pixels = cached_pixels.copy() if input_message_path is not None else cached_pixels
+            self.image_bytes = self.pixels.reshape(-1).view(np.uint8)
+            self.max_payload_size:int = len(self.image_bytes)
+        elif (self.png_layout is None or input_message_path is not None):
+            self.loadPixels(image)
+        if (cover_cache is not None and (cached is None or (cached_pixels is None and
+            self.pixels is not None and not(self.strip_rows)))):
+            self.cacheCover()
+        self.timer.lap("decode")
 
         # Process input messages.
-        if (input_message_path):
+        if (input_message_path is not None):
             # Check if file exist.
-            messages:bytes = open(input_message_path, "rb").read()
+            messages:bytes = readSource(input_message_path)
             if (not(messages)):
                 raise Exception("Input message not exist")
             self.message:bytes = messages
-            self.msg_extension:str = os.path.splitext(input_message_path)[1].lower()[1:]
+            if (message_extension is None):
+                message_extension = os.path.splitext(sourceName(input_message_path))[1]
+            self.msg_extension:str = message_extension.lower().lstrip(".")
+            self.timer.lap("read_message")
             # Check if current image file is big enough to hide message.
-            # For each bytes(8 bit) you can only hide one bit from message. You also need to keep space 
-            # for input file extension and randomized, encrypt, start and endfile flag. 
-            if len(self.message) > self.max_payload_size//8 - len(self.msg_extension) - 7:
+            # For each bytes(8 bit) you can hide up to MAX_LSB_BITS bit from message. You also need to keep space 
+            # for header, input file extension and randomized, encrypt, start and endfile flag. 
+            if len(self.message) > messageCapacity(self.max_payload_size, self.msg_extension,
+                MAX_LSB_BITS):
                 raise Exception("Input message is too big")
         
-        image.close()
+        if (image):
+            image.close()
 
-    def normalizeMessage(self, enc_key:str, is_random:bool, is_encrypt:bool) -> str:
+    def cacheCover(self) -> None:
+        """
+        Function to put decoded image in cover cache, before the message change it. Pixel of image
+        handled strip by strip is never cached.
+        """
+        pixels:np.ndarray = None
+        if (self.pixels is not None and not(self.strip_rows)):
+            pixels = self.pixels.copy()
+            pixels.setflags(write=False)
+        self.cover_cache.put(self.cover_hash, {
+            "image": self.image,
+            "image_extension": self.image_extension,
+            "bmp_layout": self.bmp_layout,
+            "png_layout": self.png_layout,
+            "palette": self.palette,
+            "pixels": pixels,
+        }, ENTRY_OVERHEAD + (pixels.nbytes if pixels is not None else 0))
+
+    def loadPixels(self, image:Image.Image=None) -> None:
+        """
+        Function to decode the whole image into writable pixel array. Bilevel image keep packed bit
+        like tobytes.
+
+        Parameter.
+        ----------
+        image : Image, default none
+            Opened image, the image file is opened again if none.
+        """
+        if (image is None):
+            with Image.open(openSource(self.image_path), "r") as image:
+                self.loadPixels(image)
+            return
+        if (image.mode == "1"):
+            self.pixels = np.frombuffer(bytearray(image.tobytes()), dtype=np.uint8)
+        else:
+            self.pixels = np.array(image)
+        self.image_bytes = self.pixels.reshape(-1).view(np.uint8)
+        self.palette:List[int] = image.getpalette() if image.mode in ("P", "PA") else None
+        self.max_payload_size:int = len(self.image_bytes)
+
+    def normalizeMessage(self, enc_key:str, is_random:bool, is_encrypt:bool,
+        lsb_bits:int=1) -> np.ndarray:
         """
         Function to normalize message you want to encrypt by inserting specific flag and turn the 
         string to binary. 
@@ -99,36 +234,49 @@ class ImageStegano:
             Boolean indicating lsb randomized or not.
         is_encrypt : bool, default false
             Boolean indicating message encrypted or not.
+        lsb_bits : int, default 1
+            Number of LSB used in one image byte for the message.
         """
-        # Random and encrypt flag.
-        flag_random:str = "0"
-        if (is_random):
-            flag_random ="1"
-        flag_encrypt:str ="0"
+        # Encrypt the message first if needed.
+        self.timer.mark()
         if (is_encrypt):
-            flag_encrypt = "1"
             self.message = encryptByte2(self.message, enc_key)
+            self.timer.lap("encrypt")
 
-        # Start and End messages flag. 
-        flag_start_message:str = stringToBinary("<<?")
-        flag_end_message:str = stringToBinary("?>>")
+        # Put flag and header around the message, then turn it to bit.
+        modified_message:np.ndarray = frameMessage(self.msg_extension, self.message, is_random,
+            is_encrypt, lsb_bits)
+        self.modified_message:np.ndarray = modified_message
+        self.timer.lap("frame")
+        return modified_message
 
-        # File extension flag.
-        flag_file_extension:str = stringToBinary(self.msg_extension)
+    def finishOperation(self, operation:str, is_random:bool, is_encrypt:bool, message_size:int) -> None:
+        """
+        Function to send stage time of finished embed or extract to the metrics registry, labeled by
+        image format, image size and mode.
 
-        # Save modified message and return it.
-        modified_message:str = arrayByteToBinary(self.message)
-        modified_message = flag_random + flag_encrypt + flag_file_extension + flag_start_message \
-            + modified_message + flag_end_message
-        self.modified_message:str = modified_message
-        return modified_message
+        Parameter.
+        ----------
+        operation : str
+            "embed" or "extract".
+        is_random : bool
+            Boolean indicating lsb randomized or not.
+        is_encrypt : bool
+            Boolean indicating message encrypted or not.
+        message_size : int
+            Number of message bytes.
+        """
+        mode:str = ("random" if is_random else "sequential") + ("+rc4" if is_encrypt else "")
+        self.timer.finish(self.image_extension.lstrip("."), operation, self.max_payload_size, mode,
+            {"cover": self.max_payload_size, "message": message_size})
 
 
     def embed(self,enc_key:str=None, key:str=None, is_random:bool=False, is_encrypt:bool=False, 
-        output_file_name:str="") -> str:
+        output_file_name:str="", lsb_bits:int=1, with_metrics:bool=False, output_file:BinaryIO=None):
         """
         Function to hide user message on image. 
-        Return output file path.
+        Return output file path (output_file if given), or tuple of it and quality metrics (mse, psnr
+        and ssim) if with_metrics.
 
         Parameter.
         ----------
@@ -140,6 +288,12 @@ class ImageStegano:
             Boolean indicating lsb randomized or not.
         is_encrypt : bool, default false
             Boolean indicating message encrypted or not.
+        lsb_bits : int, default 1
+            Number of LSB used in one image byte, more LSB hide more message with lower psnr.
+        with_metrics : bool, default false
+            Boolean indicating quality metrics is counted from the image in memory and returned.
+        output_file : BinaryIO, default none
+            Writable binary file object for the stego image instead of output_file_name, kept open.
         """
 
         # Input validation.
@@ -150,43 +304,135 @@ class ImageStegano:
         elif (is_encrypt and not enc_key):
             raise Exception("You must provide a key for encryption")
         
-        # Normalize message first.
-        self.normalizeMessage(enc_key, is_random, is_encrypt)
-
-        # Generate access table.
-        access_table:List[int] = list(range(1, self.max_payload_size)) 
-        if is_random and key:
-            access_table = generate_random_access_table(key,self.max_payload_size)
-
-        # Make sure you not randomize flag randomize position.
-        self.image_bytes[0]= modifyBit(self.image_bytes[0],0,int(self.modified_message[0]))
-
-        # Hide the message in image_bytes using ordering from access_table.
-        for messageIndex, imageIndex in enumerate(access_table, 1):
-            if (messageIndex >= len(self.modified_message)):
-                break
-            self.image_bytes[imageIndex] = modifyBit(self.image_bytes[imageIndex], 0,
-                int(self.modified_message[messageIndex]))
+        if (len(self.message) > messageCapacity(self.max_payload_size, self.msg_extension, lsb_bits)):
+            raise Exception("Input message is too big for %d LSB" % lsb_bits)
         
-        # Write file output.
+        # Normalize message first.
+        self.normalizeMessage(enc_key, is_random, is_encrypt, lsb_bits)
+
+        # Get output file path.
         output_file_path:str = output_file_name
         if ntpath.basename(output_file_path).split('.')[0] == "":
-            old_filename:str = ntpath.basename(self.image_path).split('.')
-            output_file_path = str(Path(self.image_path).parent) + '/' + old_filename[0] + \
+            image_name:str = sourceName(self.image_path) or "image" + self.image_extension
+            old_filename:str = ntpath.basename(image_name).split('.')
+            output_file_path = str(Path(image_name).parent) + '/' + old_filename[0] + \
                 '_embedded.' + old_filename[1]
         else:
             output_file_path = output_file_path + self.image_extension
-
-        with Image.frombytes(self.image.mode, self.image.size, bytes(self.image_bytes)) as new_image:
-            new_image.save(output_file_path, self.image.format)
+        output = output_file if output_file is not None else output_file_path
+
+        # Uncompressed BMP: copy the file, then flip only the needed LSB in the mapped pixel array.
+        # BMP not from file or to file object is copied in memory and written at once.
+        if (self.bmp_layout is not None):
+            if (isinstance(self.image_path, str) and output_file is None):
+                if (not(os.path.exists(output_file_path) and os.path.samefile(self.image_path,
+                    output_file_path))):
+                    shutil.copyfile(self.image_path, output_file_path)
+                bmp_source = output_file_path
+            else:
+                bmp_source = bytearray(readSource(self.image_path))
+            self.timer.lap("copy")
+            bmp_carrier:BMPCarrier = BMPCarrier(bmp_source, self.bmp_layout, "r+")
+            carrier:TrackedCarrier = TrackedCarrier(bmp_carrier)
+            embedMessage(carrier, self.modified_message, key if is_random else None, lsb_bits,
+                self.timer)
+            metrics:Dict[str, float] = None
+            if (with_metrics):
+                metrics = self.qualityMetrics(carrier)
+                self.timer.lap("metrics")
+            bmp_carrier.close()
+            if (not(isinstance(bmp_source, str))):
+                writeOutput(output, bmp_source)
+            self.timer.lap("encode")
+            self.carrier_path = bmp_source
+            self.squared_error = carrier.squared_error
+            self.finishOperation("embed", is_random, is_encrypt, len(self.message))
+            return (output, metrics) if with_metrics else output
+
+        # Big PNG: read, change and write strip by strip.
+        if (self.strip_rows):
+            result = self.embedStrips(output, key if is_random else None, lsb_bits, with_metrics)
+            self.finishOperation("embed", is_random, is_encrypt, len(self.message))
+            return result
+
+        # Hide the message in image_bytes, randomized with key or sequential.
+        carrier:TrackedCarrier = TrackedCarrier(self.image_bytes)
+        embedMessage(carrier, self.modified_message, key if is_random else None, lsb_bits, self.timer)
+        self.squared_error = carrier.squared_error
+        
+        # Write file output, the image share memory with image_bytes.
+        with Image.frombuffer(self.image.mode, self.image.size, self.image_bytes, "raw",
+            self.image.mode, 0, 1) as new_image:
+            if (self.palette):
+                new_image.putpalette(self.palette)
+            new_image.save(output, self.image.format)
             new_image.close()
+        self.timer.lap("encode")
 
-        return output_file_path
+        if (with_metrics):
+            metrics:Dict[str, float] = self.qualityMetrics(carrier)
+            self.timer.lap("metrics")
+            self.finishOperation("embed", is_random, is_encrypt, len(self.message))
+            return (output, metrics)
+        self.finishOperation("embed", is_random, is_encrypt, len(self.message))
+        return output
+
+    def embedStrips(self, output, key:str, lsb_bits:int, with_metrics:bool):
+        """
+        Function to hide normalized message in PNG strip by strip, so only one strip of the image
+        is in memory. Output file is written to temporary file first, so output can be the cover
+        itself.
+        Return output, or tuple of output and quality metrics if with_metrics.
 
-    def extract(self,output_file_name:str, enc_key:str=None, key:str=None)->str:
+        Parameter.
+        ----------
+        output : str or BinaryIO
+            Path to output PNG file, or writable binary file object.
+        key : str
+            Key for randomized method, none for sequential.
+        lsb_bits : int
+            Number of LSB used in one image byte.
+        with_metrics : bool
+            Boolean indicating quality metrics is counted from the strip in memory and returned.
+        """
+        layout:PNGLayout = self.png_layout
+        segments = planMessage(self.max_payload_size, self.modified_message, key, lsb_bits)
+        self.timer.lap("plan")
+        metrics:ImageMetrics = ImageMetrics() if with_metrics else None
+        shape:tuple = (-1, layout.width, layout.row_items // layout.width)
+        observer = (lambda _, cover, stego: metrics.update(cover.reshape(shape), stego.reshape(shape))
+            ) if with_metrics else None
+
+        if (not(isinstance(output, str))):
+            writer:PNGStripWriter = PNGStripWriter(output, layout)
+            self.squared_error = embedStrips(segments, readStrips(self.image_path, layout,
+                self.strip_rows), writer.write, observer)
+            writer.close()
+        else:
+            temporary_path:str = output + ".tmp"
+            writer:PNGStripWriter = PNGStripWriter(temporary_path, layout)
+            try:
+                self.squared_error = embedStrips(segments, readStrips(self.image_path, layout,
+                    self.strip_rows), writer.write, observer)
+                writer.close()
+            except Exception:
+                writer.png_file.close()
+                os.remove(temporary_path)
+                raise
+            os.replace(temporary_path, output)
+        # Decode, change, metrics and encode of every strip are one stage.
+        self.timer.lap("strips")
+
+        if (with_metrics):
+            return (output, metrics.result())
+        return output
+
+    def extract(self,output_file_name:str, enc_key:str=None, key:str=None,
+        output_file:BinaryIO=None, legacy_random:bool=False)->str:
         """
         Function to extract user message from stego image.
-        Return path to extracted message file.
+        Return path to extracted message file, or output_file if given. Message extension is kept in
+        msg_extension.
 
         Parameter.
         ----------
@@ -196,49 +442,45 @@ class ImageStegano:
             Key for generating random table.
         output_file_path : str
             File name for output message.
+        output_file : BinaryIO, default none
+            Writable binary file object for the message instead of output_file_name, kept open.
+        legacy_random : bool, default false
+            Boolean indicating randomized image made by older version (without header) is read with
+            the full random table, it is slow for big image.
         """
         # Check if stego image lsb is randomized.
-        is_random:bool = False
-        if (ByteToBinary(self.image_bytes[0])[-1]=="1"):
-            is_random = True
+        self.timer.mark()
+        if (self.bmp_layout is not None):
+            bmp_source = self.carrier_path
+            if (not(isinstance(bmp_source, (str, bytes, bytearray, memoryview)))):
+                bmp_source = readSource(bmp_source)
+            carrier:BMPCarrier = BMPCarrier(bmp_source, self.bmp_layout)
+        elif (self.strip_rows):
+            carrier:StripCarrier = StripCarrier(lambda: readStrips(self.image_path, self.png_layout,
+                self.strip_rows), self.max_payload_size, self.png_layout.row_items)
+        elif (self.image_bytes is None):
+            # Sequential message sit in the first rows, decode PNG only until the message end.
+            carrier:PNGCarrier = PNGCarrier(self.image_path, self.png_layout)
+            self.max_payload_size = len(carrier)
+        else:
+            carrier:np.ndarray = self.image_bytes
+        is_random:bool = (carrier[0] & 1) == 1
         if ((is_random and not(key)) or (not(is_random) and key)):
             raise Exception("You must provide key for this stego-image file")
+        if (is_random and isinstance(carrier, PNGCarrier)):
+            carrier.close()
+            self.loadPixels()
+            carrier = self.image_bytes
+            self.timer.lap("decode")
         
-        # Generate access table based on randomized or not.
-        access_table:List[int] = list(range(1, self.max_payload_size)) 
-        if is_random:
-            access_table = generate_random_access_table(key,self.max_payload_size)
-
-        # Get all LSB from image_bytes.
-        bit_message:str = ""
-        for imageIndex in access_table :
-            bit_message += (str(ByteToBinary(self.image_bytes[imageIndex]))[-1])
-        # Check flag encrypted.
-        is_encrypted:bool = False
-        if (bit_message[0]=="1"):
-            is_encrypted = True
-        bit_message = bit_message[1:]
-
-        # Transform binary string to bytearray like list.
-        bytes_message:List[int] = binarytoArrayBynary(bit_message)
-
-        # Search for file extension.
-        file_extension:str = ""
-        for index, object in enumerate (bytes_message):
-            file_extension += chr(int(object,2))
-            if (chr(int(bytes_message[index+1],2)) == "<" and chr(int(bytes_message[index+2],2)) \
-                == "<" and chr(int(bytes_message[index+3],2)) == "?"):
-                break
-        
-        # Search for real message content.
-        start_message_index = index + 4
-        message = []
-
-        for i in range(start_message_index, self.max_payload_size):
-            message.append(int(bytes_message[i],2))
-            if (chr(int(bytes_message[i+1],2)) == "?" and chr(int(bytes_message[i+2],2)) == ">" and chr(int(bytes_message[i+3],2)) == ">"):
-                break
-        message:bytes = bytes(message)
+        # Read the message in access order, randomized or not.
+        try:
+            is_encrypted, file_extension, message = extractMessage(carrier, key if is_random else None,
+                legacy_random)
+        finally:
+            if (carrier is not self.image_bytes):
+                carrier.close()
+        self.timer.lap("extract")
 
         # Check if ecnrypted but user doesn't provide key.
         if (is_encrypted and not(enc_key)):
@@ -246,20 +488,77 @@ class ImageStegano:
 
         if (is_encrypted):
             message = decryptByte2(message, enc_key)
+            self.timer.lap("decrypt")
 
         # Write file output.
-        output_file_path:str = output_file_name + '.' + file_extension    
-        new_file:FileIO = open(output_file_path, "wb")
-        new_file.write(message)
-        new_file.close()
+        self.msg_extension = file_extension
+        if (output_file is not None):
+            output_file.write(message)
+            output_file_path = output_file
+        else:
+            output_file_path:str = output_file_name + '.' + file_extension    
+            new_file:FileIO = open(output_file_path, "wb")
+            new_file.write(message)
+            new_file.close()
+        self.timer.lap("write")
+        self.finishOperation("extract", is_random, is_encrypted, len(message))
 
         return output_file_path
     
+    def estimatePSNR(self) -> Dict[int, float]:
+        """
+        Function to estimate psnr of the stego image for every number of LSB, before embedding. Use it
+        to choose lsb_bits, number of LSB that can not hold the message is left out.
+        Return dictionary of number of LSB and psnr.
+        """
+        self.timer.mark()
+        psnr:Dict[int, float] = {}
+        for lsb_bits in range(MIN_LSB_BITS, MAX_LSB_BITS + 1):
+            if (len(self.message) <= messageCapacity(self.max_payload_size, self.msg_extension, lsb_bits)):
+                psnr[lsb_bits] = estimatePSNR(self.max_payload_size, self.msg_extension, len(self.message),
+                    lsb_bits)
+        self.timer.lap("estimate")
+        return psnr
+
+    def embedPSNR(self) -> float:
+        """
+        Function to calculate psnr of the last embed from the change counted while embedding, without
+        reading the original and stego image again.
+        Return float representing the psnr, same as calculatePSNR of the cover and stego image.
+        """
+        return psnrFromMSE(self.squared_error / self.max_payload_size)
+
+    def qualityMetrics(self, carrier:TrackedCarrier) -> Dict[str, float]:
+        """
+        Function to count quality metrics of the stego image in memory against the cover, rebuilt
+        band by band from change recorded while embedding. Nothing is decoded again.
+        Return dictionary of mse, psnr and ssim.
+
+        Parameter.
+        ----------
+        carrier : TrackedCarrier
+            Carrier used for the last embed.
+        """
+        if (self.bmp_layout is not None):
+            width, height = self.bmp_layout.width, self.bmp_layout.height
+        else:
+            width, height = self.image.size
+        row_items:int = self.max_payload_size // height
+
+        def readRows(start:int, stop:int) -> Tuple[np.ndarray, np.ndarray]:
+            if (self.bmp_layout is not None):
+                stego:np.ndarray = carrier.carrier.rows(start, stop).reshape(-1)
+            else:
+                stego = self.image_bytes[start * row_items:stop * row_items]
+            return (carrier.original(start * row_items, stego), stego)
+
+        return imageMetrics(height, width, row_items, readRows)
+
     @staticmethod
-    def calculatePSNR(image_path:str, stego_image_path:str) -> float:
+    def calculateMetrics(image_path:str, stego_image_path:str) -> Dict[str, float]:
         """
-        Function to calculate psnr of two image file. The original and the embedded image.
-        Return float representing the psnr.
+        Function to calculate quality metrics of two image file. The original and the embedded image.
+        Return dictionary of mse, psnr and ssim.
 
         Parameter.
         ----------
@@ -274,27 +573,35 @@ class ImageStegano:
             stego_image = Image.open(stego_image_path, 'r')    
         except:
             raise Exception("File not exist")
-        
-        # Read both file frame and store the data in bytearray.
-        # Read image data.
-        image_bytes = bytearray(image.tobytes())
-        image_bytes_length = len(image_bytes)
+
+        # Read both file frame as uint8 array without copying.
+        width, height = image.size
+        image_bytes = np.frombuffer(image.tobytes(), dtype=np.uint8)
         image.close()
-        # Read stego image data.
-        stego_image_bytes = bytearray(stego_image.tobytes())
+        stego_image_bytes = np.frombuffer(stego_image.tobytes(), dtype=np.uint8)
         stego_image.close()
+        if (len(image_bytes) != len(stego_image_bytes)):
+            raise Exception("Image and stego image size is different")
+        row_items:int = len(image_bytes) // height
 
-        # Calculate the rms.
-        image_bytes_2 = np.array(image_bytes)
-        stego_image_bytes_2 = np.array(stego_image_bytes)
-        difference_array = np.subtract(image_bytes_2, stego_image_bytes_2)
-        squared_array = np.square(difference_array)
-        sum_squared_array = np.sum(squared_array)
-        rms = sum_squared_array / image_bytes_length
-        
-        # Calculate the psnr. 
-        psnr = 20 * math.log10(255 / math.sqrt(rms))
-        return psnr       
+        return imageMetrics(height, width, row_items, lambda start, stop: (
+            image_bytes[start * row_items:stop * row_items],
+            stego_image_bytes[start * row_items:stop * row_items]))
+
+    @staticmethod
+    def calculatePSNR(image_path:str, stego_image_path:str) -> float:
+        """
+        Function to calculate psnr of two image file. The original and the embedded image.
+        Return float representing the psnr.
+
+        Parameter.
+        ----------
+        image_path : str
+            Absolute path to image file.
+        stego_image_path : str
+            Absolute path to stego image file.
+        """
+        return ImageStegano.calculateMetrics(image_path, stego_image_path)["psnr"]
 
 
 def main():
@@ -0,0 +1,455 @@
+# Python module.
+import os
+import math
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Tuple
+
+# Own module.
+from audioStegano import AudioStegano
+from imageStegano import ImageStegano
+from stageMetrics import registry
+
+# Job state.
+JOB_QUEUED:str = "queued"
+JOB_RUNNING:str = "running"
+JOB_DONE:str = "done"
+JOB_FAILED:str = "failed"
+JOB_CANCELLED:str = "cancelled"
+
+# File in job directory holding the time the worker start the job.
+STARTED_NAME:str = ".started"
+
+STEGANO_CLASSES = {
+    "image": ImageStegano,
+    "audio": AudioStegano,
+}
+
+def embedJob(carrier_type:str, cover_path:str, message_path:str, output_path:str, enc_key:str,
+    key:str, is_random:bool, is_encrypt:bool, lsb_bits:int, options:Dict=None) -> Dict:
+    """
+    Function to hide message in cover, run in worker process.
+    Return dictionary of output path, quality metrics and psnr estimate.
+
+    Parameter.
+    ----------
+    carrier_type : str
+        "image" or "audio".
+    cover_path : str
+        Path to cover file.
+    message_path : str
+        Path to message file.
+    output_path : str
+        Output file path without extension.
+    enc_key : str
+        Key for encrypting message in RC4.
+    key : str
+        Key for randomized method.
+    is_random : bool
+        Boolean indicating lsb randomized or not.
+    is_encrypt : bool
+        Boolean indicating message encrypted or not.
+    lsb_bits : int
+        Number of LSB used in one carrier item.
+    options : dict, default none
+        Other keyword argument for the stegano class, like strip_budget.
+    """
+    stegano = STEGANO_CLASSES[carrier_type](cover_path, message_path, **(options or {}))
+    psnr_estimate:Dict[int, float] = stegano.estimatePSNR()
+    output_path, metrics = stegano.embed(enc_key=enc_key, key=key, is_random=is_random,
+        is_encrypt=is_encrypt, output_file_name=output_path, lsb_bits=lsb_bits, with_metrics=True)
+    return {"output_path": output_path, "metrics": metrics, "psnr_estimate": psnr_estimate}
+
+def extractJob(carrier_type:str, stego_path:str, output_path:str, enc_key:str, key:str,
+    legacy_random:bool=False, options:Dict=None) -> Dict:
+    """
+    Function to extract message from stego file, run in worker process.
+    Return dictionary of output path.
+
+    Parameter.
+    ----------
+    carrier_type : str
+        "image" or "audio".
+    stego_path : str
+        Path to stego file.
+    output_path : str
+        Output file path without extension.
+    enc_key : str
+        Key for decrypting message in RC4.
+    key : str
+        Key for randomized method.
+    legacy_random : bool, default false
+        Boolean indicating randomized file made by older version is read with the full random table.
+    options : dict, default none
+        Other keyword argument for the stegano class, like strip_budget.
+    """
+    stegano = STEGANO_CLASSES[carrier_type](stego_path, **(options or {}))
+    return {"output_path": stegano.extract(output_path, enc_key=enc_key, key=key,
+        legacy_random=legacy_random)}
+
+def runJob(function:Callable, args:tuple, started_path:str=None) -> Tuple[float, Dict, Dict]:
+    """
+    Function to run job function in worker process. Worker has its own metrics registry, stage
+    collected while the job run is sent back with the result.
+    Return tuple of start time, job result and collected metrics from MetricsRegistry.drain.
+
+    Parameter.
+    ----------
+    function : Callable
+        Job function, must be picklable (module level).
+    args : tuple
+        Argument for the function.
+    started_path : str, default none
+        Path to file the start time is written to before the job function run, so status of
+        running job can tell when it started.
+    """
+    started:float = time.time()
+    if (started_path is not None):
+        with open(started_path, "w") as started_file:
+            started_file.write(repr(started))
+    # Drop value left by failed job before this one.
+    registry.clear()
+    result:Dict = function(*args)
+    return (started, result, registry.drain())
+
+def jsonNumber(value):
+    """
+    Function to make metric value JSON safe, infinity is not valid JSON number.
+    Return value itself, or its string for infinity and nan.
+
+    Parameter.
+    ----------
+    value : any
+        Metric value, dictionary of metric is converted item by item.
+    """
+    if (isinstance(value, dict)):
+        return {str(name): jsonNumber(item) for name, item in value.items()}
+    if (isinstance(value, float) and not(math.isfinite(value))):
+        return str(value)
+    return value
+
+class Job:
+    """
+    A class used for representing one embed or extract job.
+
+    Attributes.
+    ----------
+    job_id : str
+        Random job id.
+    kind : str
+        Job kind, like "image-embed".
+    directory : str
+        Directory for input and output file of the job.
+    state : str
+        JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED or JOB_CANCELLED.
+    created : float
+        Time the job is created.
+    started : float
+        Time the worker start the job, none before.
+    finished : float
+        Time the job end, none before.
+    result : dict
+        Job function result, none until done.
+    error : str
+        Error message if failed.
+    future : Future
+        Future of the job in executor, none until submitted.
+    cancel_requested : bool
+        Boolean indicating job is cancelled while running, its result is discarded.
+    """
+
+    def __init__(self, job_id:str, kind:str, directory:str) -> None:
+        """
+        Constructor for Job class.
+
+        Parameter.
+        ----------
+        job_id : str
+            Random job id.
+        kind : str
+            Job kind, like "image-embed".
+        directory : str
+            Directory for input and output file of the job.
+        """
+        self.job_id:str = job_id
+        self.kind:str = kind
+        self.directory:str = directory
+        self.state:str = JOB_QUEUED
+        self.created:float = time.time()
+        self.started:float = None
+        self.finished:float = None
+        self.result:Dict = None
+        self.error:str = None
+        self.future:Future = None
+        self.cancel_requested:bool = False
+
+    @property
+    def pending(self) -> bool:
+        """
+        Boolean indicating job is not finished yet.
+        """
+        return self.state in (JOB_QUEUED, JOB_RUNNING)
+
+    def path(self, filename:str) -> str:
+        """
+        Function to get path of file in job directory, only the base name of filename is used.
+        Return absolute path.
+
+        Parameter.
+        ----------
+        filename : str
+            File name.
+        """
+        return os.path.join(self.directory, os.path.basename(filename))
+
+    def checkStarted(self) -> float:
+        """
+        Function to read the start time written by the worker, for job not finished yet.
+        Return time the worker start the job, none if not started yet.
+        """
+        if (self.started is None and self.pending):
+            try:
+                with open(self.path(STARTED_NAME), "r") as started_file:
+                    self.started = float(started_file.read())
+            except (OSError, ValueError):
+                pass
+        return self.started
+
+    def status(self) -> Dict:
+        """
+        Function to describe the job.
+        Return JSON serializable dictionary.
+        """
+        # Future is moved to running as soon as it is sent to a worker.
+        state:str = self.state
+        started:float = self.checkStarted()
+        if (state == JOB_QUEUED and (started is not None or (self.future is not None and
+            self.future.running()))):
+            state = JOB_RUNNING
+        status:Dict = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "state": state,
+            "created": self.created,
+            "started": started,
+            "finished": self.finished,
+        }
+        if (self.cancel_requested):
+            status["cancel_requested"] = True
+        if (self.error is not None):
+            status["error"] = self.error
+        if (self.result is not None):
+            status["result"] = {name: jsonNumber(value) for name, value in self.result.items()
+                if name != "output_path"}
+            status["output_filename"] = os.path.basename(self.result["output_path"])
+        return status
+
+class JobManager:
+    """
+    A class used for running embed and extract job in bounded local process pool. Job is kept
+    until result_ttl second after it end, then its directory is removed.
+
+    Attributes.
+    ----------
+    directory : str
+        Parent directory of every job directory.
+    max_workers : int
+        Number of worker process.
+    max_queued : int
+        Maximum number of job waiting for a worker, new job is refused above it.
+    result_ttl : float
+        Number of second finished job and its file is kept.
+    executor_factory : Callable
+        Function to create executor with max_workers, ProcessPoolExecutor by default.
+    """
+
+    def __init__(self, directory:str, max_workers:int=None, max_queued:int=16,
+        result_ttl:float=3600, executor_factory:Callable[[int], Executor]=ProcessPoolExecutor) -> None:
+        """
+        Constructor for JobManager class.
+
+        Parameter.
+        ----------
+        directory : str
+            Parent directory of every job directory.
+        max_workers : int, default none
+            Number of worker process, number of CPU if none.
+        max_queued : int, default 16
+            Maximum number of job waiting for a worker.
+        result_ttl : float, default 3600
+            Number of second finished job and its file is kept.
+        executor_factory : Callable, default ProcessPoolExecutor
+            Function to create executor with max_workers.
+        """
+        self.directory:str = directory
+        self.max_workers:int = max_workers or os.cpu_count() or 1
+        self.max_queued:int = max_queued
+        self.result_ttl:float = result_ttl
+        self.executor_factory:Callable[[int], Executor] = executor_factory
+        self._executor:Executor = None
+        self._jobs:Dict[str, Job] = {}
+        self._lock:threading.Lock = threading.Lock()
+
+    def createJob(self, kind:str) -> Job:
+        """
+        Function to reserve place for new job and make its directory, before its input is saved.
+        Return the job.
+
+        Parameter.
+        ----------
+        kind : str
+            Job kind, like "image-embed".
+        """
+        self.prune()
+        with self._lock:
+            pending:int = sum(1 for job in self._jobs.values() if job.pending)
+            if (pending >= self.max_workers + self.max_queued):
+                raise Exception("Job queue is full, try again later")
+            job_id:str = uuid.uuid4().hex
+            job:Job = Job(job_id, kind, os.path.join(self.directory, job_id))
+            self._jobs[job_id] = job
+        os.makedirs(job.directory)
+        return job
+
+    def submit(self, job:Job, function:Callable, *args) -> Job:
+        """
+        Function to run job function in worker process.
+        Return the job.
+
+        Parameter.
+        ----------
+        job : Job
+            Job from createJob.
+        function : Callable
+            Job function, must be picklable (module level).
+        args : any
+            Argument for the function.
+        """
+        with self._lock:
+            if (self._executor is None):
+                self._executor = self.executor_factory(self.max_workers)
+            job.future = self._executor.submit(runJob, function, args, job.path(STARTED_NAME))
+        job.future.add_done_callback(lambda future: self.finish(job, future))
+        return job
+
+    def finish(self, job:Job, future:Future) -> None:
+        """
+        Function to record result of ended job, called by executor.
+
+        Parameter.
+        ----------
+        job : Job
+            Ended job.
+        future : Future
+            Future of the job.
+        """
+        job.checkStarted()
+        job.finished = time.time()
+        if (future.cancelled() or job.cancel_requested):
+            job.state = JOB_CANCELLED
+            shutil.rmtree(job.directory, ignore_errors=True)
+            return
+        error:BaseException = future.exception()
+        if (error is None):
+            job.started, job.result, collected = future.result()
+            registry.merge(collected)
+            job.state = JOB_DONE
+            return
+        job.error = str(error) or error.__class__.__name__
+        job.state = JOB_FAILED
+        if (isinstance(error, BrokenProcessPool)):
+            # Worker died, new pool is made for the next job.
+            with self._lock:
+                self._executor = None
+
+    def discard(self, job:Job) -> None:
+        """
+        Function to remove job that is never submitted, like when its input can not be saved.
+
+        Parameter.
+        ----------
+        job : Job
+            Job from createJob.
+        """
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+        shutil.rmtree(job.directory, ignore_errors=True)
+
+    def get(self, job_id:str) -> Job:
+        """
+        Function to find job.
+        Return the job, or none if unknown or already removed.
+
+        Parameter.
+        ----------
+        job_id : str
+            Job id.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queuePosition(self, job:Job) -> int:
+        """
+        Function to count job submitted before the job that still wait for a worker.
+        Return number of job, 0 if the job is not waiting.
+
+        Parameter.
+        ----------
+        job : Job
+            Job to check.
+        """
+        with self._lock:
+            waiting:List[Job] = [item for item in self._jobs.values() if item.state == JOB_QUEUED and
+                item.future is not None and not(item.future.running() or item.future.done())]
+        waiting.sort(key=lambda item: item.created)
+        return waiting.index(job) + 1 if job in waiting else 0
+
+    def cancel(self, job_id:str) -> bool:
+        """
+        Function to cancel job. Waiting job never run, result of running job is discarded.
+        Return true if the job is cancelled, false if unknown or already ended.
+
+        Parameter.
+        ----------
+        job_id : str
+            Job id.
+        """
+        job:Job = self.get(job_id)
+        if (job is None or not(job.pending)):
+            return False
+        job.cancel_requested = True
+        if (job.future is not None):
+            job.future.cancel()
+        return True
+
+    def prune(self) -> None:
+        """
+        Function to remove job ended more than result_ttl second ago, with its directory.
+        """
+        limit:float = time.time() - self.result_ttl
+        with self._lock:
+            expired:List[Job] = [job for job in self._jobs.values()
+                if job.finished is not None and job.finished < limit]
+            for job in expired:
+                del self._jobs[job.job_id]
+        for job in expired:
+            shutil.rmtree(job.directory, ignore_errors=True)
+
+    def shutdown(self, wait:bool=True) -> None:
+        """
+        Function to stop worker process.
+
+        Parameter.
+        ----------
+        wait : bool, default true
+            Boolean indicating waiting running job to end.
+        """
+        with self._lock:
+            executor:Executor = self._executor
+            self._executor = None
+        if (executor is not None):
+            executor.shutdown(wait=wait)
@@ -0,0 +1,273 @@
+# Python module.
+import numpy as np
+from typing import List, Tuple
+
+# Own module.
+from helper import generate_random_access_table, KeyedPermutation
+
+class AccessOrder:
+    """
+    A class used for representing order of carrier position used for hiding message bit. Position 0
+    is reserved for randomize flag, so message bit use position 1 until length-1.
+
+    Attributes.
+    ----------
+    method : str
+        SEQUENTIAL, SHUFFLED (full random table, old stego file) or PERMUTED (lazy keyed permutation).
+    first : int
+        First carrier position used for message bit.
+    count : int
+        Number of position available for message bit.
+    """
+
+    SEQUENTIAL:str = "sequential"
+    SHUFFLED:str = "shuffled"
+    PERMUTED:str = "permuted"
+
+    def __init__(self, length:int, key:str=None, method:str=None, first:int=1) -> None:
+        """
+        Constructor for AccessOrder class.
+
+        Parameter.
+        ----------
+        length : int
+            Number of carrier item.
+        key : str, default none
+            Key for randomized method.
+        method : str, default none
+            Order method, none for SEQUENTIAL without key and PERMUTED with key.
+        first : int, default 1
+            First carrier position used for message bit, position before it is reserved. Full random
+            table always start from 1.
+        """
+        if (method is None):
+            method = self.SEQUENTIAL if key is None else self.PERMUTED
+        self.method:str = method
+        self.first:int = 1 if method == self.SHUFFLED else first
+        self.count:int = max(length - self.first, 0)
+        if (method == self.SHUFFLED):
+            self._table:np.ndarray = np.array(generate_random_access_table(key, length), dtype=np.int64)
+        elif (method == self.PERMUTED):
+            self._permutation:KeyedPermutation = KeyedPermutation(key, max(self.count, 1))
+
+    def positions(self, start:int, count:int) -> np.ndarray:
+        """
+        Function to get carrier position of message bit start until start+count, clipped to the
+        available position.
+        Return int64 array of position.
+
+        Parameter.
+        ----------
+        start : int
+            Index of first message bit.
+        count : int
+            Number of message bit.
+        """
+        end:int = min(start + count, self.count)
+        if (end <= start):
+            return np.empty(0, dtype=np.int64)
+        if (self.method == self.SHUFFLED):
+            return self._table[start:end]
+        if (self.method == self.PERMUTED):
+            return self._permutation.positions(np.arange(start, end)) + self.first
+        return np.arange(start + self.first, end + self.first, dtype=np.int64)
+
+def accessPositions(length:int, count:int, key:str=None) -> np.ndarray:
+    """
+    Function to get carrier position used for hiding message bit using full random table (old
+    randomized method) or sequential order.
+    Return int64 array of position.
+
+    Parameter.
+    ----------
+    length : int
+        Number of carrier item.
+    count : int
+        Number of position you need.
+    key : str, default none
+        Key for generating random table, none for sequential order.
+    """
+    method:str = AccessOrder.SEQUENTIAL if key is None else AccessOrder.SHUFFLED
+    return AccessOrder(length, key, method).positions(0, count)
+
+def packBits(bits:np.ndarray, lsb_bits:int) -> np.ndarray:
+    """
+    Function to group message bit into value of lsb_bits bit, most significant bit first. Last
+    group is padded with 0 if the bit can not make full group.
+    Return uint8 array of value.
+
+    Parameter.
+    ----------
+    bits : np.ndarray
+        uint8 array of bit (0 or 1).
+    lsb_bits : int
+        Number of bit in one value.
+    """
+    if (lsb_bits == 1):
+        return bits
+    padding:int = -len(bits) % lsb_bits
+    if (padding):
+        bits = np.concatenate((bits, np.zeros(padding, dtype=np.uint8)))
+    weights:np.ndarray = (1 << np.arange(lsb_bits - 1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(-1, lsb_bits) * weights).sum(axis=1, dtype=np.uint8)
+
+def unpackBits(values:np.ndarray, lsb_bits:int) -> np.ndarray:
+    """
+    Function to split value of lsb_bits bit back to message bit, most significant bit first.
+    Return uint8 array of bit, lsb_bits item for each value.
+
+    Parameter.
+    ----------
+    values : np.ndarray
+        Integer array of value, only lowest lsb_bits bit is used.
+    lsb_bits : int
+        Number of bit in one value.
+    """
+    shifts:np.ndarray = np.arange(lsb_bits - 1, -1, -1)
+    return ((values[:, None] >> shifts) & 1).astype(np.uint8).reshape(-1)
+
+def embedBits(carrier:np.ndarray, positions:np.ndarray, bits:np.ndarray, lsb_bits:int=1) -> None:
+    """
+    Function to replace lowest lsb_bits bit of carrier at every position with the bit, in one
+    masked operation.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Writable integer array (view) of the carrier.
+    positions : np.ndarray
+        Position of carrier item, one position for every lsb_bits bit.
+    bits : np.ndarray
+        uint8 array of bit (0 or 1).
+    lsb_bits : int, default 1
+        Number of bit hidden in one carrier item.
+    """
+    mask = carrier.dtype.type((1 << lsb_bits) - 1)
+    values:np.ndarray = carrier[positions]
+    carrier[positions] = (values & ~mask) | packBits(bits, lsb_bits).astype(carrier.dtype)
+
+def extractBits(carrier:np.ndarray, positions:np.ndarray, lsb_bits:int=1) -> np.ndarray:
+    """
+    Function to read lowest lsb_bits bit of carrier at every position.
+    Return uint8 array of bit in position order.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    positions : np.ndarray
+        Position of carrier item.
+    lsb_bits : int, default 1
+        Number of bit hidden in one carrier item.
+    """
+    if (lsb_bits == 1):
+        return (carrier[positions] & 1).astype(np.uint8)
+    return unpackBits(carrier[positions] & ((1 << lsb_bits) - 1), lsb_bits)
+
+class TrackedCarrier:
+    """
+    A class used for wrapping carrier to count and record change made by embedding, so quality of
+    the stego carrier can be known without reading the original again. Only changed position and
+    its old value is kept, so memory follow the message size.
+
+    Attributes.
+    ----------
+    carrier : np.ndarray
+        Wrapped carrier, array or carrier object with the same indexing.
+    squared_error : int
+        Sum of squared difference between new and old item value.
+    changed : int
+        Number of item whose value changed.
+    """
+
+    def __init__(self, carrier) -> None:
+        """
+        Constructor for TrackedCarrier class.
+
+        Parameter.
+        ----------
+        carrier : np.ndarray
+            Writable carrier.
+        """
+        self.carrier = carrier
+        self.squared_error:int = 0
+        self.changed:int = 0
+        self._positions:List[np.ndarray] = []
+        self._values:List[np.ndarray] = []
+        self._sorted:Tuple[np.ndarray, np.ndarray] = None
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Type of carrier item.
+        """
+        return self.carrier.dtype
+
+    def __len__(self) -> int:
+        """
+        Number of carrier item.
+        """
+        return len(self.carrier)
+
+    def __getitem__(self, positions) -> np.ndarray:
+        return self.carrier[positions]
+
+    def __setitem__(self, positions, values) -> None:
+        positions = np.asarray(positions, dtype=np.int64)
+        old_values:np.ndarray = np.asarray(self.carrier[positions])
+        difference:np.ndarray = np.asarray(values, dtype=np.int64) - old_values.astype(np.int64)
+        self.squared_error += int(np.dot(difference, difference))
+        changed:np.ndarray = difference != 0
+        self.changed += int(np.count_nonzero(changed))
+        self._positions.append(positions[changed])
+        self._values.append(old_values[changed])
+        self._sorted = None
+        self.carrier[positions] = values
+
+    def changes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Function to get every changed position and its value before embedding.
+        Return tuple of sorted int64 position array and old value array.
+        """
+        if (self._sorted is None):
+            positions:np.ndarray = np.concatenate(self._positions + [np.empty(0, dtype=np.int64)])
+            values:np.ndarray = np.concatenate(self._values + [np.empty(0, dtype=self.dtype)])
+            order:np.ndarray = np.argsort(positions, kind="stable")
+            self._sorted = (positions[order], values[order])
+        return self._sorted
+
+    def dropBefore(self, end:int) -> None:
+        """
+        Function to forget change before position end, when the carrier before it is already
+        compared. Carrier written while embedding keep only change that is not written yet.
+
+        Parameter.
+        ----------
+        end : int
+            First position whose change is kept.
+        """
+        positions, old_values = self.changes()
+        low:int = int(np.searchsorted(positions, end))
+        self._sorted = (positions[low:], old_values[low:])
+        self._positions = [self._sorted[0]]
+        self._values = [self._sorted[1]]
+
+    def original(self, start:int, values:np.ndarray) -> np.ndarray:
+        """
+        Function to rebuild carrier item before embedding from item after embedding.
+        Return array of original item, values itself if nothing in the range changed.
+
+        Parameter.
+        ----------
+        start : int
+            Position of the first item.
+        values : np.ndarray
+            Carrier item from start, after embedding.
+        """
+        positions, old_values = self.changes()
+        low, high = np.searchsorted(positions, [start, start + len(values)])
+        if (low == high):
+            return values
+        result:np.ndarray = values.copy()
+        result[positions[low:high] - start] = old_values[low:high]
+        return result
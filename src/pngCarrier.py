@@ -0,0 +1,454 @@
+# Python module.
+import io
+import zlib
+import struct
+import numpy as np
+from PIL import Image
+from typing import BinaryIO, Iterator, NamedTuple, Tuple
+
+# Own module.
+from fileSource import openSource, Source
+
+PNG_SIGNATURE:bytes = b"\x89PNG\r\n\x1a\n"
+CHUNK_HEADER_FORMAT:str = ">I4s"
+CHUNK_HEADER_SIZE:int = struct.calcsize(CHUNK_HEADER_FORMAT)
+IHDR_FORMAT:str = ">IIBBBBB"
+
+# Number of channel of every PNG color type.
+COLOR_CHANNELS = {
+    0: 1,
+    2: 3,
+    3: 1,
+    4: 2,
+    6: 4,
+}
+
+# Minimum number of row decoded at once.
+BLOCK_ROWS:int = 16
+
+# Rows are filtered for writing in group of about this many bytes, to bound temporary array.
+FILTER_BYTES:int = 1 << 20
+FILTER_PAETH:int = 4
+
+class PNGLayout(NamedTuple):
+    """
+    A class used for representing scanline layout of non interlaced PNG file.
+
+    Attributes.
+    ----------
+    width : int
+        Image width in pixel.
+    height : int
+        Image height in pixel.
+    row_size : int
+        Number of bytes of one filtered scanline, including filter type byte.
+    header : bytes
+        IHDR data.
+    chunks : bytes
+        Every chunk between IHDR and the first IDAT (palette, transparency, ...), as in file.
+    data_offset : int
+        Position of the first IDAT chunk in file.
+    """
+    width:int
+    height:int
+    row_size:int
+    header:bytes
+    chunks:bytes
+    data_offset:int
+
+    @property
+    def bit_depth(self) -> int:
+        """
+        Number of bit of one sample.
+        """
+        return self.header[8]
+
+    @property
+    def row_items(self) -> int:
+        """
+        Number of bytes of one unfiltered scanline.
+        """
+        return self.row_size - 1
+
+    @property
+    def bytes_per_pixel(self) -> int:
+        """
+        Number of bytes of one pixel used by scanline filter, at least 1.
+        """
+        return max(1, self.bit_depth * COLOR_CHANNELS[self.header[9]] // 8)
+
+    @property
+    def strip_decodable(self) -> bool:
+        """
+        Boolean indicating unfiltered scanline is the same as Pillow tobytes row (8 bit sample), so
+        the image can be decoded and written strip by strip.
+        """
+        return self.bit_depth == 8
+
+def readPNGLayout(png_source:Source) -> PNGLayout:
+    """
+    Function to parse PNG chunk until the first IDAT.
+    Return PNGLayout, or none if the file is not non interlaced PNG (decode it fully with Pillow).
+
+    Parameter.
+    ----------
+    png_source : Source
+        Path to PNG file, PNG content or binary file object.
+    """
+    with openSource(png_source) as png_file:
+        if (png_file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE):
+            return None
+        header:bytes = None
+        chunks:bytearray = bytearray()
+        while (True):
+            chunk_header:bytes = png_file.read(CHUNK_HEADER_SIZE)
+            if (len(chunk_header) < CHUNK_HEADER_SIZE):
+                return None
+            length, chunk_type = struct.unpack(CHUNK_HEADER_FORMAT, chunk_header)
+            if (chunk_type == b"IDAT"):
+                data_offset:int = png_file.tell() - CHUNK_HEADER_SIZE
+                break
+            data:bytes = png_file.read(length + 4)
+            if (chunk_type == b"IHDR"):
+                header = data[:length]
+            elif (header is not None):
+                chunks += chunk_header + data
+    if (header is None or len(header) != struct.calcsize(IHDR_FORMAT)):
+        return None
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(IHDR_FORMAT, header)
+    if (interlace != 0 or color_type not in COLOR_CHANNELS or width == 0 or height == 0):
+        return None
+    row_size:int = 1 + (width * bit_depth * COLOR_CHANNELS[color_type] + 7) // 8
+    return PNGLayout(width, height, row_size, header, bytes(chunks), data_offset)
+
+def makeChunk(chunk_type:bytes, data:bytes) -> bytes:
+    """
+    Function to build one PNG chunk.
+    Return chunk bytes with length and CRC.
+
+    Parameter.
+    ----------
+    chunk_type : bytes
+        Four letter chunk type.
+    data : bytes
+        Chunk data.
+    """
+    return (struct.pack(CHUNK_HEADER_FORMAT, len(data), chunk_type) + data +
+        struct.pack(">I", zlib.crc32(chunk_type + data)))
+
+def decodeScanlines(layout:PNGLayout, filtered:bytes, rows:int) -> np.ndarray:
+    """
+    Function to decode filtered scanline by Pillow, as PNG of only these rows with IDAT stored
+    without compression. Unfiltering and mode conversion is the same as decoding the whole file.
+    Return uint8 array in Pillow tobytes order.
+
+    Parameter.
+    ----------
+    layout : PNGLayout
+        Scanline layout of the file.
+    filtered : bytes
+        Filtered scanline, first row must not refer to row before it.
+    rows : int
+        Number of row in filtered.
+    """
+    header:bytes = struct.pack(">II", layout.width, rows) + layout.header[8:]
+    png:bytes = (PNG_SIGNATURE + makeChunk(b"IHDR", header) + layout.chunks +
+        makeChunk(b"IDAT", zlib.compress(filtered, 0)) + makeChunk(b"IEND", b""))
+    with Image.open(io.BytesIO(png)) as image:
+        return np.frombuffer(image.tobytes(), dtype=np.uint8)
+
+class IDATStream:
+    """
+    A class used for reading inflated scanline data of PNG file, IDAT chunk by IDAT chunk.
+
+    Attributes.
+    ----------
+    png_file : BinaryIO
+        Opened PNG file, positioned at the next IDAT chunk.
+    """
+
+    def __init__(self, png_source:Source, layout:PNGLayout) -> None:
+        """
+        Constructor for IDATStream class.
+
+        Parameter.
+        ----------
+        png_source : Source
+            Path to PNG file, PNG content or binary file object.
+        layout : PNGLayout
+            Scanline layout from readPNGLayout.
+        """
+        self.png_file:BinaryIO = openSource(png_source)
+        self.png_file.seek(layout.data_offset)
+        self._decompressor = zlib.decompressobj()
+        self._data_ended:bool = False
+
+    def nextData(self) -> bytes:
+        """
+        Function to read data of the next IDAT chunk.
+        Return chunk data, empty after the last IDAT chunk.
+        """
+        if (self._data_ended):
+            return b""
+        chunk_header:bytes = self.png_file.read(CHUNK_HEADER_SIZE)
+        if (len(chunk_header) < CHUNK_HEADER_SIZE):
+            self._data_ended = True
+            return b""
+        length, chunk_type = struct.unpack(CHUNK_HEADER_FORMAT, chunk_header)
+        if (chunk_type != b"IDAT"):
+            self._data_ended = True
+            return b""
+        data:bytes = self.png_file.read(length)
+        self.png_file.seek(4, 1)
+        return data
+
+    def readInto(self, buffer:bytearray, size:int) -> None:
+        """
+        Function to inflate data until buffer hold size bytes.
+
+        Parameter.
+        ----------
+        buffer : bytearray
+            Inflated data so far, extended in place.
+        size : int
+            Number of bytes buffer must hold.
+        """
+        while (len(buffer) < size):
+            data:bytes = self._decompressor.unconsumed_tail or self.nextData()
+            inflated:bytes = self._decompressor.decompress(data, size - len(buffer))
+            if (not(data) and not(inflated)):
+                raise Exception("Image file is truncated")
+            buffer += inflated
+
+    def close(self) -> None:
+        """
+        Function to close the file.
+        """
+        self.png_file.close()
+
+class PNGCarrier:
+    """
+    A class used for representing pixel of PNG file that is decoded only as far as needed, indexed
+    like Pillow tobytes. IDAT data is inflated scanline by scanline until the highest requested
+    position, so sequential message only decode the first rows of the image. Read only.
+
+    Attributes.
+    ----------
+    layout : PNGLayout
+        Scanline layout of the file.
+    stream : IDATStream
+        Inflated IDAT data of the file.
+    filtered : bytearray
+        Inflated filtered scanline so far.
+    rows : int
+        Number of decoded row.
+    row_items : int
+        Number of carrier item (byte) of one decoded row.
+    items : np.ndarray
+        Decoded rows in Pillow tobytes order.
+    block_rows : int
+        Minimum number of row decoded at once.
+    """
+
+    def __init__(self, png_source:Source, layout:PNGLayout, block_rows:int=BLOCK_ROWS) -> None:
+        """
+        Constructor for PNGCarrier class. Decode the first block of rows, to know row size.
+
+        Parameter.
+        ----------
+        png_source : Source
+            Path to PNG file, PNG content or binary file object.
+        layout : PNGLayout
+            Scanline layout from readPNGLayout.
+        block_rows : int, default BLOCK_ROWS
+            Minimum number of row decoded at once.
+        """
+        self.layout:PNGLayout = layout
+        self.stream:IDATStream = IDATStream(png_source, layout)
+        self.filtered:bytearray = bytearray()
+        self.rows:int = 0
+        self.row_items:int = 0
+        self.items:np.ndarray = np.empty(0, dtype=np.uint8)
+        self.block_rows:int = block_rows
+        self.decodeRows(min(layout.height, block_rows))
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Type of carrier item, always uint8.
+        """
+        return self.items.dtype
+
+    def __len__(self) -> int:
+        """
+        Number of carrier item of the whole image.
+        """
+        return self.row_items * self.layout.height
+
+    def decodeRows(self, rows:int) -> None:
+        """
+        Function to inflate and decode the first rows of the image.
+
+        Parameter.
+        ----------
+        rows : int
+            Number of row from the top of the image.
+        """
+        size:int = rows * self.layout.row_size
+        self.stream.readInto(self.filtered, size)
+        self.items = decodeScanlines(self.layout, memoryview(self.filtered)[:size], rows)
+        self.rows = rows
+        self.row_items = len(self.items) // rows
+
+    def readUntil(self, end:int) -> None:
+        """
+        Function to decode rows until items hold position end-1. Number of row is doubled every time,
+        so decoding the whole image step by step is still linear.
+
+        Parameter.
+        ----------
+        end : int
+            Number of carrier item from the beginning of the image that must be decoded.
+        """
+        if (end <= len(self.items)):
+            return
+        rows:int = max(-(-end // self.row_items), self.rows * 2, self.block_rows)
+        self.decodeRows(min(rows, self.layout.height))
+
+    def __getitem__(self, positions) -> np.ndarray:
+        positions = np.asarray(positions)
+        if (positions.size):
+            self.readUntil(int(positions.max()) + 1)
+        return self.items[positions]
+
+    def close(self) -> None:
+        """
+        Function to close the file.
+        """
+        self.stream.close()
+
+def readStrips(png_source:Source, layout:PNGLayout,
+    strip_rows:int) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Function to decode PNG with 8 bit sample strip by strip, only one strip is in memory. First
+    strip has BLOCK_ROWS row and the next one is doubled until strip_rows, so reading only the
+    beginning of the image stay cheap. First scanline of a strip may refer to the last row of the
+    strip before, so that row is put in front without filter.
+    Return iterator of first row and writable uint8 array of shape (rows, row_items).
+
+    Parameter.
+    ----------
+    png_source : Source
+        Path to PNG file, PNG content or binary file object.
+    layout : PNGLayout
+        Scanline layout from readPNGLayout, strip_decodable.
+    strip_rows : int
+        Maximum number of row of one strip.
+    """
+    stream:IDATStream = IDATStream(png_source, layout)
+    previous:bytes = b""
+    start:int = 0
+    rows:int = min(BLOCK_ROWS, strip_rows)
+    try:
+        while (start < layout.height):
+            rows = min(rows, layout.height - start)
+            filtered:bytearray = bytearray(previous)
+            stream.readInto(filtered, len(previous) + rows * layout.row_size)
+            items:np.ndarray = decodeScanlines(layout, filtered, rows + (1 if previous else 0))
+            strip:np.ndarray = items[len(items) - rows * layout.row_items:].reshape(rows, -1).copy()
+            previous = b"\x00" + strip[-1].tobytes()
+            yield (start, strip)
+            start += rows
+            rows = min(rows * 2, strip_rows)
+    finally:
+        stream.close()
+
+def filterRows(rows:np.ndarray, previous:np.ndarray, bytes_per_pixel:int) -> np.ndarray:
+    """
+    Function to filter scanline with Paeth predictor, which need no sequential loop for encoding.
+    Return uint8 array of filtered scanline, filter type byte first.
+
+    Parameter.
+    ----------
+    rows : np.ndarray
+        Unfiltered scanline, shape (rows, row_items).
+    previous : np.ndarray
+        Unfiltered scanline before the first row, zero for the first row of the image.
+    bytes_per_pixel : int
+        Number of bytes of one pixel.
+    """
+    raw:np.ndarray = rows.astype(np.int16)
+    up:np.ndarray = np.vstack((previous[None], rows[:-1])).astype(np.int16)
+    left:np.ndarray = np.zeros_like(raw)
+    left[:, bytes_per_pixel:] = raw[:, :-bytes_per_pixel]
+    up_left:np.ndarray = np.zeros_like(raw)
+    up_left[:, bytes_per_pixel:] = up[:, :-bytes_per_pixel]
+    estimate:np.ndarray = left + up - up_left
+    distance_left:np.ndarray = np.abs(estimate - left)
+    distance_up:np.ndarray = np.abs(estimate - up)
+    distance_up_left:np.ndarray = np.abs(estimate - up_left)
+    predictor:np.ndarray = np.where((distance_left <= distance_up) & (distance_left <= distance_up_left),
+        left, np.where(distance_up <= distance_up_left, up, up_left))
+    filtered:np.ndarray = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = FILTER_PAETH
+    filtered[:, 1:] = raw - predictor
+    return filtered
+
+class PNGStripWriter:
+    """
+    A class used for writing PNG with 8 bit sample strip by strip, with the same header and chunk
+    before IDAT (palette, transparency, ...) as the cover. Only one strip is in memory.
+
+    Attributes.
+    ----------
+    layout : PNGLayout
+        Scanline layout of the cover.
+    png_file : BinaryIO
+        PNG file opened for writing, or writable binary file object given by caller.
+    """
+
+    def __init__(self, png_output, layout:PNGLayout, level:int=6) -> None:
+        """
+        Constructor for PNGStripWriter class. Write header and chunk before IDAT.
+
+        Parameter.
+        ----------
+        png_output : str or BinaryIO
+            Path to output PNG file, or writable binary file object (kept open).
+        layout : PNGLayout
+            Scanline layout of the cover, strip_decodable.
+        level : int, default 6
+            zlib compression level.
+        """
+        self.layout:PNGLayout = layout
+        self._owned:bool = isinstance(png_output, str)
+        self.png_file:BinaryIO = open(png_output, "wb") if self._owned else png_output
+        self.png_file.write(PNG_SIGNATURE + makeChunk(b"IHDR", layout.header) + layout.chunks)
+        self._compressor = zlib.compressobj(level)
+        self._previous:np.ndarray = np.zeros(layout.row_items, dtype=np.uint8)
+
+    def write(self, strip:np.ndarray) -> None:
+        """
+        Function to filter, compress and write the next rows.
+
+        Parameter.
+        ----------
+        strip : np.ndarray
+            uint8 array of unfiltered scanline, shape (rows, row_items).
+        """
+        group:int = max(1, FILTER_BYTES // self.layout.row_items)
+        for start in range(0, len(strip), group):
+            rows:np.ndarray = strip[start:start + group]
+            filtered:np.ndarray = filterRows(rows, self._previous, self.layout.bytes_per_pixel)
+            self._previous = rows[-1].copy()
+            data:bytes = self._compressor.compress(filtered.tobytes())
+            if (data):
+                self.png_file.write(makeChunk(b"IDAT", data))
+
+    def close(self) -> None:
+        """
+        Function to write the rest of compressed data and close the file opened by the writer.
+        """
+        self.png_file.write(makeChunk(b"IDAT", self._compressor.flush()) + makeChunk(b"IEND", b""))
+        if (self._owned):
+            self.png_file.close()
@@ -0,0 +1,321 @@
+# Python module.
+import math
+import numpy as np
+from typing import Callable, Dict, Tuple
+
+# Number of carrier item compared at once, so memory is bounded for big carrier.
+CHUNK_ITEMS:int = 1 << 20
+
+# SSIM is counted on non-overlapping square window of this size, for each channel.
+SSIM_WINDOW:int = 8
+SSIM_K1:float = 0.01
+SSIM_K2:float = 0.03
+
+# Segmental SNR use segment of this number of sample, every segment SNR is clamped to this range.
+SEGMENT_SAMPLES:int = 1024
+SEGMENT_SNR_MIN:float = -10.0
+SEGMENT_SNR_MAX:float = 35.0
+
+def psnrFromMSE(mse:float, peak:int=255) -> float:
+    """
+    Function to convert mean squared error to psnr.
+    Return float representing the psnr, infinity for identical input.
+
+    Parameter.
+    ----------
+    mse : float
+        Mean squared error.
+    peak : int, default 255
+        Maximum value of one item.
+    """
+    if (mse == 0):
+        return math.inf
+    return 10 * math.log10(peak ** 2 / mse)
+
+class ImageMetrics:
+    """
+    A class used for counting MSE, PSNR and SSIM of stego image against cover image in one pass,
+    band of rows by band of rows.
+
+    Attributes.
+    ----------
+    peak : int
+        Maximum value of one item.
+    squared_error : float
+        Sum of squared difference so far.
+    count : int
+        Number of item compared so far.
+    ssim_sum : float
+        Sum of SSIM of every window so far.
+    ssim_count : int
+        Number of SSIM window so far.
+    """
+
+    def __init__(self, peak:int=255) -> None:
+        """
+        Constructor for ImageMetrics class.
+
+        Parameter.
+        ----------
+        peak : int, default 255
+            Maximum value of one item.
+        """
+        self.peak:int = peak
+        self.squared_error:float = 0.0
+        self.count:int = 0
+        self.ssim_sum:float = 0.0
+        self.ssim_count:int = 0
+        self._rest:tuple = None
+
+    def update(self, cover:np.ndarray, stego:np.ndarray) -> None:
+        """
+        Function to add next band of rows. Rows that can not fill full SSIM window are kept until
+        the next band.
+
+        Parameter.
+        ----------
+        cover : np.ndarray
+            Cover rows, shape (rows, width) or (rows, width, channel).
+        stego : np.ndarray
+            Stego rows, same shape as cover.
+        """
+        difference:np.ndarray = np.subtract(cover, stego, dtype=np.float64).reshape(-1)
+        self.squared_error += float(np.dot(difference, difference))
+        self.count += difference.size
+
+        if (self._rest is not None and len(self._rest[0])):
+            cover = np.concatenate((self._rest[0], cover))
+            stego = np.concatenate((self._rest[1], stego))
+        full_rows:int = len(cover) - len(cover) % SSIM_WINDOW
+        self._rest = (cover[full_rows:], stego[full_rows:])
+        if (full_rows and cover.shape[1] >= SSIM_WINDOW):
+            self.addWindows(cover[:full_rows], stego[:full_rows], SSIM_WINDOW)
+
+    def addWindows(self, cover:np.ndarray, stego:np.ndarray, window:int) -> None:
+        """
+        Function to count SSIM of every full window in the rows.
+
+        Parameter.
+        ----------
+        cover : np.ndarray
+            Cover rows, number of rows is multiple of window.
+        stego : np.ndarray
+            Stego rows, same shape as cover.
+        window : int
+            Window size.
+        """
+        rows:int = cover.shape[0]
+        channels:int = cover.shape[2] if cover.ndim == 3 else 1
+        columns:int = cover.shape[1] - cover.shape[1] % window
+        x:np.ndarray = cover[:, :columns].astype(np.float64)
+        y:np.ndarray = stego[:, :columns].astype(np.float64)
+        # Sum inside window row by matrix product (one BLAS call), then sum window rows.
+        # Sum of 8 bit square fit exactly in float64.
+        picker:np.ndarray = np.tile(np.eye(channels), (window, 1))
+        size:int = window * window
+
+        def windowMean(values:np.ndarray) -> np.ndarray:
+            sums:np.ndarray = values.reshape(-1, window * channels) @ picker
+            return sums.reshape(rows // window, window, -1).sum(axis=1) / size
+
+        mean_x:np.ndarray = windowMean(x)
+        mean_y:np.ndarray = windowMean(y)
+        variance_x:np.ndarray = windowMean(x * x) - mean_x * mean_x
+        variance_y:np.ndarray = windowMean(y * y) - mean_y * mean_y
+        covariance:np.ndarray = windowMean(x * y) - mean_x * mean_y
+        c1:float = (SSIM_K1 * self.peak) ** 2
+        c2:float = (SSIM_K2 * self.peak) ** 2
+        ssim:np.ndarray = (((2 * mean_x * mean_y + c1) * (2 * covariance + c2)) /
+            ((mean_x * mean_x + mean_y * mean_y + c1) * (variance_x + variance_y + c2)))
+        self.ssim_sum += float(ssim.sum())
+        self.ssim_count += ssim.size
+
+    def result(self) -> Dict[str, float]:
+        """
+        Function to finish counting.
+        Return dictionary of mse, psnr and ssim.
+        """
+        # Image smaller than one window is counted as one window.
+        if (self.ssim_count == 0 and self._rest is not None and len(self._rest[0])):
+            cover, stego = self._rest
+            window:int = min(cover.shape[0], cover.shape[1])
+            self.addWindows(cover[:window], stego[:window], window)
+            self._rest = None
+        mse:float = self.squared_error / self.count if self.count else 0.0
+        return {
+            "mse": mse,
+            "psnr": psnrFromMSE(mse, self.peak),
+            "ssim": self.ssim_sum / self.ssim_count if self.ssim_count else 1.0,
+        }
+
+def imageMetrics(height:int, width:int, row_items:int,
+    read_rows:Callable[[int, int], Tuple[np.ndarray, np.ndarray]]) -> Dict[str, float]:
+    """
+    Function to count MSE, PSNR and SSIM of image band of rows by band of rows, so only one band
+    of both image is in memory.
+    Return dictionary of mse, psnr and ssim.
+
+    Parameter.
+    ----------
+    height : int
+        Image height in pixel.
+    width : int
+        Image width in pixel.
+    row_items : int
+        Number of carrier item (byte) in one row.
+    read_rows : Callable
+        Function to read flat cover and stego item of row start until stop.
+    """
+    # Item of one pixel is treated as channel, packed bit row (bilevel image) as plain row.
+    shape:tuple = (-1, width, row_items // width) if row_items % width == 0 else (-1, row_items)
+    band:int = max(SSIM_WINDOW, CHUNK_ITEMS // max(row_items, 1) // SSIM_WINDOW * SSIM_WINDOW)
+    metrics:ImageMetrics = ImageMetrics()
+    for start in range(0, height, band):
+        cover, stego = read_rows(start, min(height, start + band))
+        metrics.update(cover.reshape(shape), stego.reshape(shape))
+    return metrics.result()
+
+def decodeSamples(data:bytes, sample_width:int) -> np.ndarray:
+    """
+    Function to decode WAV frame bytes to signed sample value. 8 bit WAV sample is unsigned with
+    offset 128, the other is signed little endian.
+    Return int32 or int64 array of sample, channel still interleaved.
+
+    Parameter.
+    ----------
+    data : bytes
+        Frame bytes.
+    sample_width : int
+        Number of bytes of one sample.
+    """
+    raw:np.ndarray = np.frombuffer(data, dtype=np.uint8)
+    if (sample_width == 1):
+        return raw.astype(np.int32) - 128
+    if (sample_width == 3):
+        packed:np.ndarray = raw.reshape(-1, 3).astype(np.int32)
+        value:np.ndarray = packed[:, 0] | (packed[:, 1] << 8) | (packed[:, 2] << 16)
+        return (value ^ 0x800000) - 0x800000
+    return raw.view("<i%d" % sample_width).astype(np.int64)
+
+class AudioMetrics:
+    """
+    A class used for counting MSE, PSNR (per byte, like calculatePSNR), SNR and segmental SNR of
+    stego audio against cover audio in one pass, block by block.
+
+    Attributes.
+    ----------
+    sample_width : int
+        Number of bytes of one sample.
+    peak : int
+        Maximum value of one byte.
+    squared_error : float
+        Sum of squared byte difference so far.
+    count : int
+        Number of byte compared so far.
+    signal : float
+        Sum of squared cover sample so far.
+    noise : float
+        Sum of squared sample difference so far.
+    segment_sum : float
+        Sum of SNR of every segment so far.
+    segment_count : int
+        Number of segment so far.
+    """
+
+    def __init__(self, sample_width:int, peak:int=255, segment_samples:int=SEGMENT_SAMPLES) -> None:
+        """
+        Constructor for AudioMetrics class.
+
+        Parameter.
+        ----------
+        sample_width : int
+            Number of bytes of one sample.
+        peak : int, default 255
+            Maximum value of one byte.
+        segment_samples : int, default SEGMENT_SAMPLES
+            Number of sample in one segment.
+        """
+        self.sample_width:int = sample_width
+        self.peak:int = peak
+        self.segment_samples:int = segment_samples
+        self.squared_error:float = 0.0
+        self.count:int = 0
+        self.signal:float = 0.0
+        self.noise:float = 0.0
+        self.segment_sum:float = 0.0
+        self.segment_count:int = 0
+        self._rest:tuple = (np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64))
+
+    def update(self, cover:bytes, stego:bytes) -> None:
+        """
+        Function to add next block of frame bytes. Sample that can not fill full segment is kept
+        until the next block.
+
+        Parameter.
+        ----------
+        cover : bytes
+            Cover frame bytes.
+        stego : bytes
+            Stego frame bytes, same length as cover.
+        """
+        difference:np.ndarray = np.subtract(np.frombuffer(cover, dtype=np.uint8),
+            np.frombuffer(stego, dtype=np.uint8), dtype=np.float64)
+        self.squared_error += float(np.dot(difference, difference))
+        self.count += difference.size
+
+        signal:np.ndarray = decodeSamples(cover, self.sample_width).astype(np.float64)
+        noise:np.ndarray = decodeSamples(stego, self.sample_width) - signal
+        self.signal += float(np.dot(signal, signal))
+        self.noise += float(np.dot(noise, noise))
+
+        signal = np.concatenate((self._rest[0], signal))
+        noise = np.concatenate((self._rest[1], noise))
+        full:int = len(signal) - len(signal) % self.segment_samples
+        self._rest = (signal[full:], noise[full:])
+        if (full):
+            self.addSegments(signal[:full], noise[:full], self.segment_samples)
+
+    def addSegments(self, signal:np.ndarray, noise:np.ndarray, segment_samples:int) -> None:
+        """
+        Function to count clamped SNR of every segment.
+
+        Parameter.
+        ----------
+        signal : np.ndarray
+            Cover sample, length is multiple of segment size.
+        noise : np.ndarray
+            Difference of stego and cover sample.
+        segment_samples : int
+            Number of sample in one segment.
+        """
+        signal_power:np.ndarray = np.square(signal).reshape(-1, segment_samples).sum(axis=1)
+        noise_power:np.ndarray = np.square(noise).reshape(-1, segment_samples).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            snr:np.ndarray = 10 * np.log10(signal_power / noise_power)
+        snr = np.where(noise_power == 0, SEGMENT_SNR_MAX, snr)
+        self.segment_sum += float(np.clip(snr, SEGMENT_SNR_MIN, SEGMENT_SNR_MAX).sum())
+        self.segment_count += len(snr)
+
+    def result(self) -> Dict[str, float]:
+        """
+        Function to finish counting.
+        Return dictionary of mse, psnr, snr and segmental_snr.
+        """
+        # Last short segment is counted as one segment.
+        if (len(self._rest[0])):
+            signal, noise = self._rest
+            self.addSegments(signal, noise, len(signal))
+            self._rest = (signal[:0], noise[:0])
+        mse:float = self.squared_error / self.count if self.count else 0.0
+        if (self.noise == 0):
+            snr:float = math.inf
+        elif (self.signal == 0):
+            snr = -math.inf
+        else:
+            snr = 10 * math.log10(self.signal / self.noise)
+        return {
+            "mse": mse,
+            "psnr": psnrFromMSE(mse, self.peak),
+            "snr": snr,
+            "segmental_snr": self.segment_sum / self.segment_count if self.segment_count else SEGMENT_SNR_MAX,
+        }
@@ -1,4 +1,10 @@
 import io
+import os
+import struct
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Iterator, List, Tuple
 
 def swap(s, i, j):
     temp = s[i]
@@ -7,92 +13,643 @@ def swap(s, i, j):
     return s
 
 def ksa(key):
-    s = [0 for i in range(256)]
-    for i in range(256):
-        s[i] = i
+    s = list(range(256))
     j = 0
     for i in range(256):
         j = (j+s[i]+ord(key[i%len(key)]))%256
-        s = swap(s, i, j)
+        s[i], s[j] = s[j], s[i]
     return s
 
+class KSACache:
+    """
+    A class used for representing bounded LRU cache of state after KSA, keyed by key.
+    Safe to be used from several thread.
+
+    Attributes.
+    ----------
+    max_size : int
+        Maximum number of key kept in cache.
+    hits : int
+        Number of lookup found in cache.
+    misses : int
+        Number of lookup that need to run KSA.
+    """
+
+    def __init__(self, max_size:int=256) -> None:
+        """
+        Constructor for KSACache class.
+
+        Parameter.
+        ----------
+        max_size : int, default 256
+            Maximum number of key kept in cache, 0 disable the cache.
+        """
+        self.max_size:int = max_size
+        self.hits:int = 0
+        self.misses:int = 0
+        self._states:"OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._lock:threading.Lock = threading.Lock()
+
+    def get(self, key:str) -> List[int]:
+        """
+        Function to get state after KSA for the key, run KSA if key not cached yet.
+        Cached state is immutable, so PRGA can never corrupt it.
+        Return new list of the state.
+
+        Parameter.
+        ----------
+        key : str
+            Key for encrypting or decrypting.
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if (state is not None):
+                self._states.move_to_end(key)
+                self.hits += 1
+                return list(state)
+            self.misses += 1
+
+        # Run KSA outside the lock so other thread not waiting.
+        s = ksa(key)
+        with self._lock:
+            if (self.max_size > 0):
+                self._states[key] = tuple(s)
+                self._states.move_to_end(key)
+                while (len(self._states) > self.max_size):
+                    self._states.popitem(last=False)
+        return s
+
+    def resize(self, max_size:int) -> None:
+        """
+        Function to change maximum number of key kept in cache, evicting the least recently used.
+
+        Parameter.
+        ----------
+        max_size : int
+            New maximum number of key, 0 disable the cache.
+        """
+        with self._lock:
+            self.max_size = max_size
+            while (len(self._states) > max(max_size, 0)):
+                self._states.popitem(last=False)
+
+    def clear(self) -> None:
+        """
+        Function to remove all cached state and reset the counter.
+        """
+        with self._lock:
+            self._states.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Function to get cache statistic.
+        Return dictionary of size, max_size, hits and misses.
+        """
+        with self._lock:
+            return {"size": len(self._states), "max_size": self.max_size, "hits": self.hits,
+                "misses": self.misses}
+
+# Shared cache used by every public encrypt and decrypt function, size can be set from environment.
+ksa_cache:KSACache = KSACache(int(os.environ.get("RC4_KSA_CACHE_SIZE", 256)))
+
+# Text mode ciphertext of text that is not latin-1 start with this prefix, it is never hexadecimal.
+UTF8_PREFIX:str = "UTF8:"
+
 def prga(text, s, mode="encrypt"):
-    i = 0
-    j = 0
+    # Text mode is byte mode with hex encoding. Latin-1 text is one byte per character as before,
+    # other text is UTF-8 and the ciphertext is marked with UTF8_PREFIX, so decrypt never guess.
     if(mode=="encrypt"):
-        c = ""
+        try:
+            return prga(text.encode("latin-1"), s, "encrypt-byte").hex().upper()
+        except UnicodeEncodeError:
+            return UTF8_PREFIX + prga(text.encode("utf-8"), s, "encrypt-byte").hex().upper()
+    elif(mode=="decrypt"):
+        encoding = "latin-1"
+        if (text.startswith(UTF8_PREFIX)):
+            encoding = "utf-8"
+            text = text[len(UTF8_PREFIX):]
+        try:
+            text = bytes.fromhex(text)
+        except ValueError:
+            raise Exception("Ciphertext must be hexadecimal string")
+        try:
+            return prga(text, s, "decrypt-byte").decode(encoding)
+        except UnicodeDecodeError:
+            raise Exception("Wrong key or not a UTF-8 ciphertext")
+    else: #(mode=="encrypt-byte" or mode=="decrypt-byte")
+        i = 0
+        j = 0
+        c = bytearray(len(text))
         for idx in range(len(text)):
             i = (i+1) % 256
             j = (j+s[i]) % 256
-            s = swap(s, i, j)
+            s[i], s[j] = s[j], s[i]
             t = (s[i]+s[j]) % 256
             u = s[t]
             # Modified
-            c += hex(u^ord(text[idx])^j)[2:].zfill(2).upper()
+            c[idx] = u^text[idx]^j
         return c
-    elif(mode=="encrypt-byte"):
-        c = bytearray()
-        for idx in range(len(text)):
-            i = (i+1) % 256
-            j = (j+s[i]) % 256
-            s = swap(s, i, j)
-            t = (s[i]+s[j]) % 256
-            u = s[t]
+
+class ModifiedRC4:
+    """
+    A class used for representing modified RC4 cipher state for incremental encryption.
+    Encryption and decryption are the same operation, so one object can be used for both.
+
+    Attributes.
+    ----------
+    s : List[int]
+        Current state of the permutation after KSA and every processed byte.
+    i : int
+        Current PRGA index i.
+    j : int
+        Current PRGA index j.
+    position : int
+        Number of bytes already processed since KSA.
+    is_finalized : bool
+        Boolean indicating finalize already called and object can not be used anymore.
+    """
+
+    def __init__(self, key:str) -> None:
+        """
+        Constructor for ModifiedRC4 class. Run KSA with the key and reset PRGA index.
+
+        Parameter.
+        ----------
+        key : str
+            Key for encrypting or decrypting.
+        """
+        self.s:List[int] = ksa_cache.get(key)
+        self.i:int = 0
+        self.j:int = 0
+        self.position:int = 0
+        self.is_finalized:bool = False
+        self._mask:np.ndarray = np.empty(0, dtype=np.uint8)
+
+    def keystream(self, length:int, out:np.ndarray=None) -> np.ndarray:
+        """
+        Function to generate next combined keystream mask (u xor j) of the modified RC4 and
+        advance the state. XOR-ing the mask with the data give the same result as update.
+        Return uint8 array of the mask, view of out or of the cipher own buffer that is overwritten
+        by the next call.
+
+        Parameter.
+        ----------
+        length : int
+            Number of mask bytes you want to generate.
+        out : np.ndarray, default none
+            Preallocated uint8 buffer with at least length item, reused between blocks. Buffer of
+            the cipher is used if none, it only grow when a longer mask is needed.
+        """
+        if (self.is_finalized):
+            raise Exception("Cipher already finalized")
+        if (out is None):
+            if (len(self._mask) < length):
+                self._mask = np.empty(length, dtype=np.uint8)
+            out = self._mask
+
+        # Keep state in local variable, attribute lookup in loop is slow.
+        # Write through memoryview, item assignment to numpy array is slower than to memoryview.
+        s = self.s
+        i = self.i
+        j = self.j
+        mask = memoryview(out)
+        for idx in range(length):
+            i = (i+1) & 255
+            si = s[i]
+            j = (j+si) & 255
+            sj = s[j]
+            s[i] = sj
+            s[j] = si
             # Modified
-            c.append(u^text[idx]^j)
+            mask[idx] = s[(si+sj) & 255]^j
+        self.i = i
+        self.j = j
+        self.position += length
+        mask.release()
+        return out[:length]
+
+    def updateInto(self, chunk:np.ndarray, out:np.ndarray, buffer:np.ndarray=None) -> np.ndarray:
+        """
+        Function to encrypt or decrypt next block of the stream into preallocated output array.
+        Return the output array.
+
+        Parameter.
+        ----------
+        chunk : np.ndarray
+            uint8 array of next part of the plaintext or ciphertext.
+        out : np.ndarray
+            uint8 array with same length as chunk for the result, can be the chunk itself.
+        buffer : np.ndarray, default none
+            Preallocated uint8 buffer for the keystream mask, buffer of the cipher is used if none.
+        """
+        mask:np.ndarray = self.keystream(len(chunk), buffer)
+        np.bitwise_xor(chunk, mask, out=out)
+        return out
+
+    def update(self, chunk:bytes) -> bytearray:
+        """
+        Function to encrypt or decrypt next chunk of the stream. The state is kept between calls,
+        so feeding the data in any chunk size give the same output as encryptByte2.
+        Return processed chunk.
+
+        Parameter.
+        ----------
+        chunk : bytes
+            Next part of the plaintext or ciphertext.
+        """
+        c = bytearray(len(chunk))
+        self.updateInto(np.frombuffer(chunk, dtype=np.uint8), np.frombuffer(c, dtype=np.uint8))
         return c
-    elif(mode=="decrypt"):
-        text = [text[k:k+2]for k in range(0,len(text),2)]
-        p = ""
-        for idx in range(len(text)):
-            i = (i+1) % 256
-            j = (j+s[i]) % 256
-            s = swap(s, i, j)
-            t = (s[i]+s[j]) % 256
-            u = s[t]
-            # Modified
-            p += hex(u^int(text[idx], 16)^j)[2:].zfill(2).upper()
-        p = ''.join(chr(int(p[l:l+2], 16)) for l in range(0, len(p), 2))
-        return p
-    else: #(mode=="decrypt-byte")
-        p = bytearray()
-        for idx in range(len(text)):
-            i = (i+1) % 256
-            j = (j+s[i]) % 256
-            s = swap(s, i, j)
-            t = (s[i]+s[j]) % 256
-            u = s[t]
-            # Modified
-            p.append(u^text[idx]^j)
-        return p
+
+    def finalize(self) -> bytearray:
+        """
+        Function to finish the stream. Stream cipher has no padding so nothing left to output.
+        Return empty bytearray.
+        """
+        self.is_finalized = True
+        return bytearray()
+
+    def checkpoint(self) -> Tuple[bytes, int, int]:
+        """
+        Function to take snapshot of current PRGA state.
+        Return tuple of permutation, i and j.
+        """
+        return (bytes(self.s), self.i, self.j)
+
+    def restore(self, state:Tuple[bytes, int, int], position:int) -> None:
+        """
+        Function to continue the stream from snapshot taken by checkpoint.
+
+        Parameter.
+        ----------
+        state : Tuple[bytes, int, int]
+            Permutation, i and j returned by checkpoint.
+        position : int
+            Number of bytes processed when the snapshot was taken.
+        """
+        self.s = list(state[0])
+        self.i = state[1]
+        self.j = state[2]
+        self.position = position
+
+    def skip(self, length:int) -> None:
+        """
+        Function to advance the stream without producing output.
+
+        Parameter.
+        ----------
+        length : int
+            Number of bytes you want to skip.
+        """
+        while (length > 0):
+            step:int = min(length, BLOCK_SIZE)
+            self.keystream(step)
+            length -= step
+
+def encryptStream(stream:BinaryIO, key:str, chunk_size:int=65536) -> Iterator[bytes]:
+    """
+    Function to encrypt or decrypt file-like object chunk by chunk with constant memory.
+    Return generator of processed chunk.
+
+    Parameter.
+    ----------
+    stream : BinaryIO
+        File-like object (file, socket file, upload stream) readed until empty.
+    key : str
+        Key for encrypting or decrypting.
+    chunk_size : int, default 65536
+        Number of bytes readed for each chunk.
+    """
+    cipher:ModifiedRC4 = ModifiedRC4(key)
+    while True:
+        chunk:bytes = stream.read(chunk_size)
+        if (not(chunk)):
+            break
+        yield bytes(cipher.update(chunk))
+    last:bytearray = cipher.finalize()
+    if (last):
+        yield bytes(last)
+
+# Suffix for deriving index file key, so index keystream is different from data keystream.
+INDEX_KEY_SUFFIX:str = "\x00checkpoint-index"
+
+class RC4CheckpointIndex:
+    """
+    A class used for representing modified RC4 state checkpoint taken every interval bytes.
+    Checkpoint is as secret as the keystream, so sidecar file is encrypted with key derived from
+    the cipher key.
+
+    Attributes.
+    ----------
+    interval : int
+        Number of bytes between two checkpoint.
+    checkpoints : Dict[int, Tuple[bytes, int, int]]
+        State (permutation, i, j) at position number*interval, keyed by number.
+    """
+
+    MAGIC:bytes = b"RC4I"
+    VERSION:int = 1
+
+    def __init__(self, interval:int=1 << 20) -> None:
+        """
+        Constructor for RC4CheckpointIndex class.
+
+        Parameter.
+        ----------
+        interval : int, default 1 MB
+            Number of bytes between two checkpoint.
+        """
+        if (interval <= 0):
+            raise Exception("Checkpoint interval must be positive")
+        self.interval:int = interval
+        self.checkpoints:Dict[int, Tuple[bytes, int, int]] = {}
+
+    def record(self, cipher:ModifiedRC4) -> None:
+        """
+        Function to save cipher state if the cipher is exactly at checkpoint position.
+
+        Parameter.
+        ----------
+        cipher : ModifiedRC4
+            Cipher whose state you want to save.
+        """
+        if (cipher.position % self.interval == 0):
+            self.checkpoints.setdefault(cipher.position // self.interval, cipher.checkpoint())
+
+    def update(self, cipher:ModifiedRC4, chunk:bytes) -> bytearray:
+        """
+        Function to encrypt or decrypt next chunk with the cipher while recording every
+        checkpoint passed.
+        Return processed chunk.
+
+        Parameter.
+        ----------
+        cipher : ModifiedRC4
+            Cipher used for processing the stream.
+        chunk : bytes
+            Next part of the plaintext or ciphertext.
+        """
+        c = bytearray(len(chunk))
+        pos = 0
+        while (pos < len(chunk)):
+            self.record(cipher)
+            step = min(len(chunk) - pos, self.interval - cipher.position % self.interval)
+            c[pos:pos+step] = cipher.update(chunk[pos:pos+step])
+            pos += step
+        self.record(cipher)
+        return c
+
+    def nearest(self, offset:int) -> Tuple[int, Tuple[bytes, int, int]]:
+        """
+        Function to find last checkpoint at or before offset.
+        Return tuple of checkpoint position and state, state is none if no checkpoint found.
+
+        Parameter.
+        ----------
+        offset : int
+            Byte position in the stream.
+        """
+        number = offset // self.interval
+        while (number >= 0):
+            if (number in self.checkpoints):
+                return (number * self.interval, self.checkpoints[number])
+            number -= 1
+        return (0, None)
+
+    def save(self, path:str, key:str) -> None:
+        """
+        Function to write the checkpoint to sidecar index file.
+
+        Parameter.
+        ----------
+        path : str
+            Path to index file.
+        key : str
+            Key used for encrypting the data.
+        """
+        body = bytearray(struct.pack(">QQ", self.interval, len(self.checkpoints)))
+        for number in sorted(self.checkpoints):
+            s, i, j = self.checkpoints[number]
+            body += struct.pack(">Q", number) + s + bytes([i, j])
+        with open(path, "wb") as index_file:
+            index_file.write(self.MAGIC + bytes([self.VERSION]))
+            index_file.write(encryptBlock(bytes(body), key + INDEX_KEY_SUFFIX))
+
+    @classmethod
+    def load(cls, path:str, key:str) -> "RC4CheckpointIndex":
+        """
+        Function to read checkpoint from sidecar index file.
+        Return RC4CheckpointIndex object.
+
+        Parameter.
+        ----------
+        path : str
+            Path to index file.
+        key : str
+            Key used for encrypting the data.
+        """
+        with open(path, "rb") as index_file:
+            data:bytes = index_file.read()
+        if (data[:len(cls.MAGIC)] != cls.MAGIC or data[len(cls.MAGIC)] != cls.VERSION):
+            raise Exception("Not a checkpoint index file")
+        body = decryptBlock(data[len(cls.MAGIC)+1:], key + INDEX_KEY_SUFFIX)
+
+        interval, count = struct.unpack_from(">QQ", body, 0)
+        if (interval == 0 or len(body) != 16 + count * 266):
+            raise Exception("Checkpoint index does not match the key")
+        index = cls(interval)
+        pos = 16
+        for _ in range(count):
+            number = struct.unpack_from(">Q", body, pos)[0]
+            index.checkpoints[number] = (bytes(body[pos+8:pos+264]), body[pos+264], body[pos+265])
+            pos += 266
+
+        # First checkpoint is state right after KSA, different means wrong key or broken file.
+        if (index.checkpoints.get(0, (bytes(ksa_cache.get(key)), 0, 0)) != (bytes(ksa_cache.get(key)), 0, 0)):
+            raise Exception("Checkpoint index does not match the key")
+        return index
+
+class SeekableRC4:
+    """
+    A class used for representing random access decryption of modified RC4 stream. Byte range is
+    decrypted in time proportional to range size plus at most one checkpoint interval.
+
+    Attributes.
+    ----------
+    key : str
+        Key for encrypting or decrypting.
+    index : RC4CheckpointIndex
+        Known checkpoint, missing checkpoint is computed lazily and cached here.
+    """
+
+    def __init__(self, key:str, index:RC4CheckpointIndex=None, interval:int=1 << 20) -> None:
+        """
+        Constructor for SeekableRC4 class.
+
+        Parameter.
+        ----------
+        key : str
+            Key for encrypting or decrypting.
+        index : RC4CheckpointIndex, default none
+            Checkpoint loaded from sidecar file, new empty index is used if none.
+        interval : int, default 1 MB
+            Checkpoint interval for new empty index.
+        """
+        self.key:str = key
+        self.index:RC4CheckpointIndex = index if index is not None else RC4CheckpointIndex(interval)
+
+    def cipherAt(self, offset:int) -> ModifiedRC4:
+        """
+        Function to create cipher positioned at offset.
+        Return ModifiedRC4 object.
+
+        Parameter.
+        ----------
+        offset : int
+            Byte position in the stream.
+        """
+        cipher = ModifiedRC4(self.key)
+        position, state = self.index.nearest(offset)
+        if (state is not None):
+            cipher.restore(state, position)
+
+        # Walk to the checkpoint containing offset, caching every checkpoint passed.
+        self.index.record(cipher)
+        target = offset - offset % self.index.interval
+        while (cipher.position < target):
+            cipher.skip(self.index.interval - cipher.position % self.index.interval)
+            self.index.record(cipher)
+        cipher.skip(offset - cipher.position)
+        return cipher
+
+    def decryptRange(self, data:bytes, offset:int) -> bytearray:
+        """
+        Function to decrypt part of ciphertext that start at offset of the whole stream.
+        Return decrypted bytearray.
+
+        Parameter.
+        ----------
+        data : bytes
+            Ciphertext bytes from offset.
+        offset : int
+            Byte position of the first data byte in the stream.
+        """
+        return self.cipherAt(offset).update(data)
+
+    def readRange(self, stream:BinaryIO, start:int, length:int) -> bytearray:
+        """
+        Function to read and decrypt byte range of seekable encrypted file.
+        Return decrypted bytearray.
+
+        Parameter.
+        ----------
+        stream : BinaryIO
+            Seekable file-like object of the ciphertext.
+        start : int
+            First byte position of the range.
+        length : int
+            Number of bytes in the range.
+        """
+        stream.seek(start)
+        return self.decryptRange(stream.read(length), start)
+
+def encryptStreamWithIndex(stream:BinaryIO, key:str, index:RC4CheckpointIndex,
+    chunk_size:int=65536) -> Iterator[bytes]:
+    """
+    Function like encryptStream that also record checkpoint of every interval into index.
+    Return generator of processed chunk.
+
+    Parameter.
+    ----------
+    stream : BinaryIO
+        File-like object readed until empty.
+    key : str
+        Key for encrypting or decrypting.
+    index : RC4CheckpointIndex
+        Index for saving the checkpoint.
+    chunk_size : int, default 65536
+        Number of bytes readed for each chunk.
+    """
+    cipher:ModifiedRC4 = ModifiedRC4(key)
+    while True:
+        chunk:bytes = stream.read(chunk_size)
+        if (not(chunk)):
+            break
+        yield bytes(index.update(cipher, chunk))
+    cipher.finalize()
 
 def encrypt(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     c = prga(text, s)
     return c
 
 def encryptByte(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     c = prga(text, s, "encrypt-byte")
     return io.BytesIO(c)
 
 def encryptByte2(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     c = prga(text, s, "encrypt-byte")
     return c
 
+# Default block size for block mode, big enough to make numpy call overhead negligible.
+BLOCK_SIZE:int = 1 << 16
+
+def encryptBlock(text, key, block_size=BLOCK_SIZE):
+    """
+    Function to encrypt bytes in block mode. Keystream of each block is generated first, then
+    combined with the data in one numpy XOR. Output is same as encryptByte2.
+    Return encrypted bytearray.
+
+    Parameter.
+    ----------
+    text : bytes
+        Plaintext bytes.
+    key : str
+        Key for encrypting.
+    block_size : int, default BLOCK_SIZE
+        Number of bytes processed for each block.
+    """
+    cipher = ModifiedRC4(key)
+    c = bytearray(len(text))
+    data = np.frombuffer(text, dtype=np.uint8)
+    out = np.frombuffer(c, dtype=np.uint8)
+    for start in range(0, len(text), block_size):
+        end = min(start + block_size, len(text))
+        cipher.updateInto(data[start:end], out[start:end])
+    return c
+
+def decryptBlock(text, key, block_size=BLOCK_SIZE):
+    """
+    Function to decrypt bytes in block mode. Output is same as decryptByte2.
+    Return decrypted bytearray.
+
+    Parameter.
+    ----------
+    text : bytes
+        Ciphertext bytes.
+    key : str
+        Key for decrypting.
+    block_size : int, default BLOCK_SIZE
+        Number of bytes processed for each block.
+    """
+    return encryptBlock(text, key, block_size)
+
 def decrypt(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     p = prga(text, s, "decrypt")
     return p
 
 def decryptByte(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     p = prga(text, s, "encrypt-byte")
     return io.BytesIO(p)
 
 def decryptByte2(text, key):
-    s = ksa(key)
+    s = ksa_cache.get(key)
     p = prga(text, s, "encrypt-byte")
     return p
 
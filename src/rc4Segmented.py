@@ -0,0 +1,259 @@
+# Python module.
+import os
+import struct
+import hashlib
+from typing import List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Own module.
+from rc4 import encryptBlock, decryptBlock
+
+# Container header: magic, version, segment size, segment count and plaintext length.
+MAGIC:bytes = b"RC4S"
+VERSION:int = 1
+HEADER_FORMAT:str = ">4sBQQQ"
+HEADER_SIZE:int = struct.calcsize(HEADER_FORMAT)
+
+# Default segment size, big enough so process overhead is small compared to the work.
+SEGMENT_SIZE:int = 4 << 20
+
+def segmentKey(key:str, index:int) -> str:
+    """
+    Function to derive key for specific segment. First segment use the key itself, so container with
+    one segment has exactly the same body as encryptByte2.
+    Return key for the segment.
+
+    Parameter.
+    ----------
+    key : str
+        Key from user.
+    index : int
+        Segment index, start from 0.
+    """
+    if (index == 0):
+        return key
+    digest:bytes = hashlib.sha256(key.encode("utf-8") + b"\x00segment" + struct.pack(">Q", index)).digest()
+    return digest.hex()
+
+def buildHeader(segment_size:int, segment_count:int, length:int) -> bytes:
+    """
+    Function to build container header.
+    Return header bytes.
+
+    Parameter.
+    ----------
+    segment_size : int
+        Number of plaintext bytes in each segment.
+    segment_count : int
+        Number of segment.
+    length : int
+        Total plaintext length.
+    """
+    return struct.pack(HEADER_FORMAT, MAGIC, VERSION, segment_size, segment_count, length)
+
+def parseHeader(data:bytes) -> Tuple[int, int, int]:
+    """
+    Function to read container header.
+    Return tuple of segment size, segment count and plaintext length, or none if data is not a
+    segmented container (old encryptByte2 output).
+
+    Parameter.
+    ----------
+    data : bytes
+        At least first HEADER_SIZE bytes of the container.
+    """
+    if (len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC):
+        return None
+    _, version, segment_size, segment_count, length = struct.unpack_from(HEADER_FORMAT, data, 0)
+    if (version != VERSION or segment_size == 0):
+        raise Exception("Unsupported segmented container version")
+    return (segment_size, segment_count, length)
+
+def segmentCount(length:int, segment_size:int) -> int:
+    """
+    Function to count number of segment needed for plaintext.
+    Return number of segment, at least one.
+
+    Parameter.
+    ----------
+    length : int
+        Plaintext length.
+    segment_size : int
+        Number of plaintext bytes in each segment.
+    """
+    return max(1, -(-length // segment_size))
+
+def processSegment(data:bytes, key:str, index:int) -> bytearray:
+    """
+    Function to encrypt or decrypt one segment. Run inside worker process.
+    Return processed segment.
+
+    Parameter.
+    ----------
+    data : bytes
+        Segment content.
+    key : str
+        Key from user.
+    index : int
+        Segment index.
+    """
+    return encryptBlock(data, segmentKey(key, index))
+
+def processFileSegment(input_path:str, input_offset:int, output_path:str, output_offset:int,
+    size:int, key:str, index:int) -> int:
+    """
+    Function to encrypt or decrypt one segment directly between two file, so only the segment
+    itself is in worker memory. Run inside worker process.
+    Return number of bytes written.
+
+    Parameter.
+    ----------
+    input_path : str
+        Path to input file.
+    input_offset : int
+        Position of the segment in input file.
+    output_path : str
+        Path to output file, must already exist.
+    output_offset : int
+        Position of the segment in output file.
+    size : int
+        Segment length.
+    key : str
+        Key from user.
+    index : int
+        Segment index.
+    """
+    with open(input_path, "rb") as input_file:
+        input_file.seek(input_offset)
+        data:bytes = input_file.read(size)
+    result:bytearray = processSegment(data, key, index)
+    with open(output_path, "r+b") as output_file:
+        output_file.seek(output_offset)
+        output_file.write(result)
+    return len(result)
+
+def runSegments(tasks:List[tuple], function, workers:int) -> List:
+    """
+    Function to run segment task in process pool, or inline if only one worker or one task.
+    Return list of result in task order.
+
+    Parameter.
+    ----------
+    tasks : List[tuple]
+        Argument for each function call.
+    function : Callable
+        Top level function, so it can be sent to worker process.
+    workers : int
+        Number of worker process, none for number of cpu.
+    """
+    workers = workers or os.cpu_count() or 1
+    if (workers == 1 or len(tasks) <= 1):
+        return [function(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+        return list(executor.map(function, *zip(*tasks)))
+
+def encryptSegmented(text:bytes, key:str, segment_size:int=SEGMENT_SIZE, workers:int=None) -> bytes:
+    """
+    Function to encrypt bytes into segmented container, segment is encrypted in parallel.
+    Return container bytes.
+
+    Parameter.
+    ----------
+    text : bytes
+        Plaintext bytes.
+    key : str
+        Key for encrypting.
+    segment_size : int, default SEGMENT_SIZE
+        Number of plaintext bytes in each segment.
+    workers : int, default none
+        Number of worker process, none for number of cpu.
+    """
+    count:int = segmentCount(len(text), segment_size)
+    tasks = [(text[n*segment_size:(n+1)*segment_size], key, n) for n in range(count)]
+    segments = runSegments(tasks, processSegment, workers)
+    return buildHeader(segment_size, count, len(text)) + b"".join(segments)
+
+def decryptSegmented(data:bytes, key:str, workers:int=None) -> bytes:
+    """
+    Function to decrypt segmented container. Data without container header is treated as old
+    single stream from encryptByte2.
+    Return plaintext bytes.
+
+    Parameter.
+    ----------
+    data : bytes
+        Container bytes.
+    key : str
+        Key for decrypting.
+    workers : int, default none
+        Number of worker process, none for number of cpu.
+    """
+    header = parseHeader(data)
+    if (header is None):
+        return bytes(decryptBlock(data, key))
+    segment_size, count, length = header
+    if (len(data) != HEADER_SIZE + length):
+        raise Exception("Segmented container is truncated")
+    body = data[HEADER_SIZE:]
+    tasks = [(body[n*segment_size:(n+1)*segment_size], key, n) for n in range(count)]
+    return b"".join(runSegments(tasks, processSegment, workers))
+
+def encryptSegmentedFile(input_path:str, output_path:str, key:str, segment_size:int=SEGMENT_SIZE,
+    workers:int=None) -> None:
+    """
+    Function to encrypt file into segmented container file. Every worker read its own segment and
+    write it at its offset, so memory is bounded by segment size times worker.
+
+    Parameter.
+    ----------
+    input_path : str
+        Path to plaintext file.
+    output_path : str
+        Path to container file.
+    key : str
+        Key for encrypting.
+    segment_size : int, default SEGMENT_SIZE
+        Number of plaintext bytes in each segment.
+    workers : int, default none
+        Number of worker process, none for number of cpu.
+    """
+    length:int = os.path.getsize(input_path)
+    count:int = segmentCount(length, segment_size)
+    with open(output_path, "wb") as output_file:
+        output_file.write(buildHeader(segment_size, count, length))
+        output_file.truncate(HEADER_SIZE + length)
+    tasks = [(input_path, n*segment_size, output_path, HEADER_SIZE + n*segment_size,
+        min(segment_size, length - n*segment_size), key, n) for n in range(count)]
+    runSegments(tasks, processFileSegment, workers)
+
+def decryptSegmentedFile(input_path:str, output_path:str, key:str, workers:int=None) -> None:
+    """
+    Function to decrypt segmented container file. File without container header is treated as
+    old single stream from encryptByte2.
+
+    Parameter.
+    ----------
+    input_path : str
+        Path to container file.
+    output_path : str
+        Path to plaintext file.
+    key : str
+        Key for decrypting.
+    workers : int, default none
+        Number of worker process, none for number of cpu.
+    """
+    with open(input_path, "rb") as input_file:
+        header = parseHeader(input_file.read(HEADER_SIZE))
+    if (header is None):
+        length = os.path.getsize(input_path)
+        segment_size, count, offset = max(length, 1), 1, 0
+    else:
+        segment_size, count, length = header
+        offset = HEADER_SIZE
+        if (os.path.getsize(input_path) != HEADER_SIZE + length):
+            raise Exception("Segmented container is truncated")
+    with open(output_path, "wb") as output_file:
+        output_file.truncate(length)
+    tasks = [(input_path, offset + n*segment_size, output_path, n*segment_size,
+        min(segment_size, length - n*segment_size), key, n) for n in range(count)]
+    runSegments(tasks, processFileSegment, workers)
@@ -0,0 +1,233 @@
+# Python module.
+import os
+import hmac
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from typing import Dict, List, Tuple
+
+# Default number of second result is kept after its last use.
+RESULT_TTL:float = 24 * 3600
+# Default maximum number of bytes of every stored stego file.
+RESULT_BUDGET:int = 1 << 30
+# Name of stored file in one entry directory.
+STEGO_NAME:str = "stego"
+META_NAME:str = "meta.json"
+SECRET_NAME:str = ".secret"
+
+class ResultCache:
+    """
+    A class used for keeping stego file and metrics of finished embed on disk, so retried request
+    with the same cover, message, option and key get the stored result without embedding again.
+    Entry is removed result_ttl second after its last use, and least recently used entry is removed
+    when the total size is over budget. Key is only kept as keyed hash, never in plaintext.
+
+    Attributes.
+    ----------
+    directory : str
+        Directory of stored result, one directory per entry named by its key.
+    result_ttl : float
+        Number of second entry is kept after its last use.
+    budget : int
+        Maximum number of bytes of every stored stego file.
+    hits : int
+        Number of lookup that found the result.
+    misses : int
+        Number of lookup that did not find the result.
+    evictions : int
+        Number of entry removed because it expired or the store is over budget.
+    """
+
+    def __init__(self, directory:str, result_ttl:float=RESULT_TTL, budget:int=RESULT_BUDGET) -> None:
+        """
+        Constructor for ResultCache class.
+
+        Parameter.
+        ----------
+        directory : str
+            Directory of stored result, created if not exist.
+        result_ttl : float, default RESULT_TTL
+            Number of second entry is kept after its last use.
+        budget : int, default RESULT_BUDGET
+            Maximum number of bytes of every stored stego file.
+        """
+        self.directory:str = directory
+        self.result_ttl:float = result_ttl
+        self.budget:int = budget
+        self.hits:int = 0
+        self.misses:int = 0
+        self.evictions:int = 0
+        self._lock:threading.Lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._secret:bytes = self.loadSecret()
+
+    def loadSecret(self) -> bytes:
+        """
+        Function to read random secret of the store, made on first use. Key hash from other store
+        can not be compared, and short key can not be guessed from the hash without the secret.
+        Return the secret.
+        """
+        path:str = os.path.join(self.directory, SECRET_NAME)
+        try:
+            with open(path, "rb") as secret_file:
+                return secret_file.read()
+        except FileNotFoundError:
+            pass
+        secret:bytes = os.urandom(32)
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as secret_file:
+            secret_file.write(secret)
+        try:
+            # Other process may make the secret first, its secret is used.
+            os.link(secret_file.name, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(secret_file.name)
+        with open(path, "rb") as secret_file:
+            return secret_file.read()
+
+    def key(self, carrier_type:str, cover_hash:str, message_hash:str, msg_extension:str,
+        is_random:bool, is_encrypt:bool, enc_key:str, key:str, lsb_bits:int, output_format:str) -> str:
+        """
+        Function to make entry key of embed request. Key that is not used by the option (enc_key
+        without is_encrypt, key without is_random) does not change the result and is left out.
+        Return hex keyed hash, safe as directory name.
+
+        Parameter.
+        ----------
+        carrier_type : str
+            "image" or "audio".
+        cover_hash : str
+            Content hash of the cover.
+        message_hash : str
+            Content hash of the message.
+        msg_extension : str
+            File extension of the message, it is hidden with the message.
+        is_random : bool
+            Boolean indicating lsb randomized or not.
+        is_encrypt : bool
+            Boolean indicating message encrypted or not.
+        enc_key : str
+            Key for encrypting message in RC4.
+        key : str
+            Key for randomized method.
+        lsb_bits : int
+            Number of LSB used in one carrier item.
+        output_format : str
+            Extension of the stego file.
+        """
+        request:List = [carrier_type, cover_hash, message_hash, msg_extension, bool(is_random),
+            bool(is_encrypt), enc_key if is_encrypt else None, key if is_random else None, int(lsb_bits),
+            output_format]
+        return hmac.new(self._secret, json.dumps(request).encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def path(self, entry_key:str) -> str:
+        """
+        Function to get directory of entry.
+        Return absolute path.
+
+        Parameter.
+        ----------
+        entry_key : str
+            Entry key from key.
+        """
+        return os.path.join(self.directory, os.path.basename(entry_key))
+
+    def get(self, entry_key:str) -> Tuple[str, Dict]:
+        """
+        Function to find stored result and mark it as recently used.
+        Return tuple of path to stored stego file and its metadata, or none if not found or expired.
+
+        Parameter.
+        ----------
+        entry_key : str
+            Entry key from key.
+        """
+        entry_path:str = self.path(entry_key)
+        meta_path:str = os.path.join(entry_path, META_NAME)
+        with self._lock:
+            try:
+                if (os.path.getmtime(meta_path) < time.time() - self.result_ttl):
+                    raise FileNotFoundError(meta_path)
+                with open(meta_path, "r") as meta_file:
+                    meta:Dict = json.load(meta_file)
+                os.utime(meta_path)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return (os.path.join(entry_path, STEGO_NAME), meta)
+
+    def put(self, entry_key:str, stego_path:str, meta:Dict) -> bool:
+        """
+        Function to store result, entry appear at once when it is complete.
+        Return true if stored, false if the stego file alone is bigger than the budget.
+
+        Parameter.
+        ----------
+        entry_key : str
+            Entry key from key.
+        stego_path : str
+            Path to stego file, it is copied.
+        meta : dict
+            JSON serializable metadata like quality metrics.
+        """
+        size:int = os.path.getsize(stego_path)
+        if (size > self.budget):
+            return False
+        temporary_path:str = tempfile.mkdtemp(dir=self.directory, suffix=".tmp")
+        try:
+            shutil.copyfile(stego_path, os.path.join(temporary_path, STEGO_NAME))
+            with open(os.path.join(temporary_path, META_NAME), "w") as meta_file:
+                json.dump(meta, meta_file, default=float)
+            with self._lock:
+                shutil.rmtree(self.path(entry_key), ignore_errors=True)
+                os.replace(temporary_path, self.path(entry_key))
+        except Exception:
+            shutil.rmtree(temporary_path, ignore_errors=True)
+            raise
+        self.prune()
+        return True
+
+    def prune(self) -> None:
+        """
+        Function to remove expired entry, then least recently used entry until the total size is
+        under budget.
+        """
+        limit:float = time.time() - self.result_ttl
+        with self._lock:
+            entries:List[Tuple[float, int, str]] = []
+            for name in os.listdir(self.directory):
+                entry_path:str = os.path.join(self.directory, name)
+                if (name.endswith(".tmp") or not(os.path.isdir(entry_path))):
+                    continue
+                try:
+                    used:float = os.path.getmtime(os.path.join(entry_path, META_NAME))
+                    size:int = os.path.getsize(os.path.join(entry_path, STEGO_NAME))
+                except OSError:
+                    used, size = 0, 0
+                entries.append((used, size, entry_path))
+            entries.sort()
+            total:int = sum(size for _, size, _ in entries)
+            for used, size, entry_path in entries:
+                if (used >= limit and total <= self.budget):
+                    break
+                shutil.rmtree(entry_path, ignore_errors=True)
+                total -= size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Function to describe store usage.
+        Return dictionary of budget, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "budget": self.budget,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,456 @@
+# Python module.
+import os
+import time
+import bisect
+import functools
+import inspect
+import threading
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+# Histogram bucket upper bound of stage and operation time, in second.
+TIME_BUCKETS:Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Histogram bucket upper bound of peak traced memory, in bytes.
+MEMORY_BUCKETS:Tuple[float, ...] = tuple(float(1 << shift) for shift in range(20, 33, 2))
+# Size label by upper bound of carrier bytes.
+SIZE_BUCKETS:Tuple[Tuple[float, str], ...] = (
+    (1 << 20, "0-1MB"),
+    (16 << 20, "1-16MB"),
+    (128 << 20, "16-128MB"),
+    (float("inf"), "128MB+"),
+)
+# Label name of every operation sample, in output order.
+LABELS:Tuple[str, ...] = ("carrier", "operation", "size", "mode")
+
+def sizeBucket(size:int) -> str:
+    """
+    Function to get size label of carrier, so label has few value.
+    Return label from SIZE_BUCKETS.
+
+    Parameter.
+    ----------
+    size : int
+        Number of carrier bytes.
+    """
+    for bound, label in SIZE_BUCKETS:
+        if (size < bound):
+            return label
+    return SIZE_BUCKETS[-1][1]
+
+def isTracingMemory() -> bool:
+    """
+    Function to check peak memory is traced.
+    Return true if tracemalloc is running.
+    """
+    return tracemalloc.is_tracing()
+
+def setTraceMemory(enabled:bool) -> None:
+    """
+    Function to start or stop tracing memory with tracemalloc. Tracing make every allocation slower,
+    so it is off by default. Peak is for the whole process, it is exact when one operation run at
+    once.
+
+    Parameter.
+    ----------
+    enabled : bool
+        Boolean indicating peak memory of every operation is traced.
+    """
+    if (enabled and not(tracemalloc.is_tracing())):
+        tracemalloc.start()
+    elif (not(enabled) and tracemalloc.is_tracing()):
+        tracemalloc.stop()
+
+class Histogram:
+    """
+    A class used for representing cumulative histogram like Prometheus histogram.
+
+    Attributes.
+    ----------
+    bounds : Tuple[float, ...]
+        Upper bound of every bucket, +Inf bucket is implicit.
+    counts : List[int]
+        Number of observation of every bucket, not cumulative, last item is +Inf bucket.
+    total : float
+        Sum of every observation.
+    count : int
+        Number of observation.
+    """
+
+    def __init__(self, bounds:Tuple[float, ...]) -> None:
+        """
+        Constructor for Histogram class.
+
+        Parameter.
+        ----------
+        bounds : Tuple[float, ...]
+            Sorted upper bound of every bucket.
+        """
+        self.bounds:Tuple[float, ...] = bounds
+        self.counts:List[int] = [0] * (len(bounds) + 1)
+        self.total:float = 0.0
+        self.count:int = 0
+
+    def observe(self, value:float) -> None:
+        """
+        Function to add one observation.
+
+        Parameter.
+        ----------
+        value : float
+            Observed value.
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other:"Histogram") -> None:
+        """
+        Function to add every observation of other histogram with the same bounds.
+
+        Parameter.
+        ----------
+        other : Histogram
+            Histogram to add.
+        """
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+class MetricsRegistry:
+    """
+    A class used for collecting stage time, operation time, processed bytes and peak memory of
+    every operation, by carrier type, size label, operation and mode. Safe to be used from several
+    thread.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor for MetricsRegistry class.
+        """
+        self._lock:threading.Lock = threading.Lock()
+        self._stages:Dict[Tuple[str, ...], Histogram] = {}
+        self._operations:Dict[Tuple[str, ...], Histogram] = {}
+        self._memory:Dict[Tuple[str, ...], Histogram] = {}
+        self._bytes:Dict[Tuple[str, ...], int] = {}
+
+    def record(self, labels:Tuple[str, str, str, str], stages:List[Tuple[str, float]],
+        seconds:float, byte_counts:Dict[str, int], peak_memory:int=None) -> None:
+        """
+        Function to add one finished operation.
+
+        Parameter.
+        ----------
+        labels : Tuple[str, str, str, str]
+            Carrier, operation, size label and mode.
+        stages : List[Tuple[str, float]]
+            Name and time of every stage, same stage can appear several time.
+        seconds : float
+            Time of the whole operation.
+        byte_counts : Dict[str, int]
+            Number of processed bytes by kind, like "cover" and "message".
+        peak_memory : int, default none
+            Peak traced memory, none if memory is not traced.
+        """
+        with self._lock:
+            for stage, stage_seconds in stages:
+                key:Tuple[str, ...] = labels + (stage,)
+                if (key not in self._stages):
+                    self._stages[key] = Histogram(TIME_BUCKETS)
+                self._stages[key].observe(stage_seconds)
+            if (labels not in self._operations):
+                self._operations[labels] = Histogram(TIME_BUCKETS)
+            self._operations[labels].observe(seconds)
+            for kind, count in byte_counts.items():
+                key:Tuple[str, ...] = labels + (kind,)
+                self._bytes[key] = self._bytes.get(key, 0) + count
+            if (peak_memory is not None):
+                if (labels not in self._memory):
+                    self._memory[labels] = Histogram(MEMORY_BUCKETS)
+                self._memory[labels].observe(peak_memory)
+
+    def clear(self) -> None:
+        """
+        Function to remove every collected value.
+        """
+        self.drain()
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """
+        Function to take every collected value out of the registry, like in worker process after
+        a job so the parent process can merge it.
+        Return picklable dictionary of stages, operations, memory and bytes by label value.
+        """
+        with self._lock:
+            collected:Dict[str, Dict[Tuple[str, ...], object]] = {"stages": self._stages,
+                "operations": self._operations, "memory": self._memory, "bytes": self._bytes}
+            self._stages = {}
+            self._operations = {}
+            self._memory = {}
+            self._bytes = {}
+        return collected
+
+    def merge(self, collected:Dict[str, Dict[Tuple[str, ...], object]]) -> None:
+        """
+        Function to add value taken out of other registry with drain.
+
+        Parameter.
+        ----------
+        collected : Dict[str, Dict[Tuple[str, ...], object]]
+            Value from drain.
+        """
+        with self._lock:
+            for name, histograms in (("stages", self._stages), ("operations", self._operations),
+                ("memory", self._memory)):
+                for key, histogram in collected[name].items():
+                    if (key not in histograms):
+                        histograms[key] = Histogram(histogram.bounds)
+                    histograms[key].merge(histogram)
+            for key, count in collected["bytes"].items():
+                self._bytes[key] = self._bytes.get(key, 0) + count
+
+    def render(self) -> str:
+        """
+        Function to write every collected value in Prometheus text format.
+        Return the text.
+        """
+        lines:List[str] = []
+        with self._lock:
+            renderHistogram(lines, "stegano_stage_seconds", "Time of one stage of an operation.",
+                self._stages, LABELS + ("stage",))
+            renderHistogram(lines, "stegano_operation_seconds", "Time of a whole operation.",
+                self._operations, LABELS)
+            renderHistogram(lines, "stegano_peak_traced_memory_bytes",
+                "Peak traced memory of an operation, only when memory tracing is on.", self._memory,
+                LABELS)
+            renderCounter(lines, "stegano_processed_bytes_total", "Number of processed bytes.",
+                self._bytes, LABELS + ("kind",))
+        return "\n".join(lines) + "\n"
+
+def labelText(names:Tuple[str, ...], values:Tuple) -> str:
+    """
+    Function to write Prometheus label set.
+    Return label set in braces, empty if there is no label.
+
+    Parameter.
+    ----------
+    names : Tuple[str, ...]
+        Label name.
+    values : Tuple
+        Label value, same order as names.
+    """
+    if (not(names)):
+        return ""
+    pairs:List[str] = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append('{}="{}"'.format(name, value))
+    return "{" + ",".join(pairs) + "}"
+
+def renderHistogram(lines:List[str], name:str, description:str, histograms:Dict[Tuple, Histogram],
+    names:Tuple[str, ...]) -> None:
+    """
+    Function to write histogram family in Prometheus text format.
+
+    Parameter.
+    ----------
+    lines : List[str]
+        Output line, new line is appended.
+    name : str
+        Metric name.
+    description : str
+        Metric help text.
+    histograms : Dict[Tuple, Histogram]
+        Histogram by label value.
+    names : Tuple[str, ...]
+        Label name.
+    """
+    lines.append("# HELP {} {}".format(name, description))
+    lines.append("# TYPE {} histogram".format(name))
+    for values, histogram in sorted(histograms.items()):
+        cumulative:int = 0
+        for bound, count in zip(histogram.bounds + (float("inf"),), histogram.counts):
+            cumulative += count
+            bound_text:str = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append("{}_bucket{} {}".format(name, labelText(names + ("le",), values +
+                (bound_text,)), cumulative))
+        lines.append("{}_sum{} {!r}".format(name, labelText(names, values), histogram.total))
+        lines.append("{}_count{} {}".format(name, labelText(names, values), histogram.count))
+
+def renderCounter(lines:List[str], name:str, description:str, counters:Dict[Tuple, float],
+    names:Tuple[str, ...], kind:str="counter") -> None:
+    """
+    Function to write counter or gauge family in Prometheus text format.
+
+    Parameter.
+    ----------
+    lines : List[str]
+        Output line, new line is appended.
+    name : str
+        Metric name.
+    description : str
+        Metric help text.
+    counters : Dict[Tuple, float]
+        Value by label value.
+    names : Tuple[str, ...]
+        Label name.
+    kind : str, default "counter"
+        Metric type, "counter" or "gauge".
+    """
+    lines.append("# HELP {} {}".format(name, description))
+    lines.append("# TYPE {} {}".format(name, kind))
+    for values, value in sorted(counters.items()):
+        lines.append("{}{} {}".format(name, labelText(names, values), value))
+
+# Shared registry used by every stegano class and timed function.
+registry:MetricsRegistry = MetricsRegistry()
+setTraceMemory(os.environ.get("STEGANO_TRACE_MEMORY", "") not in ("", "0"))
+
+class StageTimer:
+    """
+    A class used for timing stage of one operation, like decode, plan, lsb and encode of an embed.
+    Stage end with lap, and start at the previous lap or mark, so sequential code need no change
+    of structure. Stage is kept in the timer and sent to the registry when the operation finish, so
+    label known only at the end (mode of extract) can be used.
+
+    Attributes.
+    ----------
+    stages : List[Tuple[str, float]]
+        Name and time of every finished stage since start, same stage can appear several time.
+    started : float
+        Time the operation start, from time.perf_counter.
+    """
+
+    def __init__(self) -> None:
+        """
+        Constructor for StageTimer class, the operation start now.
+        """
+        self.stages:List[Tuple[str, float]] = []
+        self.start()
+
+    def start(self) -> None:
+        """
+        Function to start next operation, stage of the previous one is dropped.
+        """
+        self.stages = []
+        self.started:float = time.perf_counter()
+        self._last:float = self.started
+        if (tracemalloc.is_tracing()):
+            tracemalloc.reset_peak()
+
+    def mark(self) -> None:
+        """
+        Function to start next stage now, time since the last lap is not part of any stage.
+        """
+        self._last = time.perf_counter()
+
+    def lap(self, name:str) -> None:
+        """
+        Function to end stage now, it started at the last lap or mark.
+
+        Parameter.
+        ----------
+        name : str
+            Stage name.
+        """
+        now:float = time.perf_counter()
+        self.stages.append((name, now - self._last))
+        self._last = now
+
+    def finish(self, carrier:str, operation:str, size:int, mode:str, byte_counts:Dict[str, int]) -> None:
+        """
+        Function to send stage of the finished operation to the registry, then start next operation.
+
+        Parameter.
+        ----------
+        carrier : str
+            Carrier type, like "png", "bmp" or "wav".
+        operation : str
+            Operation name, like "embed" or "extract".
+        size : int
+            Number of carrier bytes, turned into size label.
+        mode : str
+            Mode, like "sequential" or "random+rc4".
+        byte_counts : Dict[str, int]
+            Number of processed bytes by kind.
+        """
+        peak_memory:int = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        registry.record((carrier, operation, sizeBucket(size), mode), self.stages,
+            time.perf_counter() - self.started, byte_counts, peak_memory)
+        self.start()
+
+_depth:threading.local = threading.local()
+
+def timed(carrier:str, operation:str) -> Callable[[Callable], Callable]:
+    """
+    Function to make decorator recording time and input size of every call, as operation with one
+    stage of the same name. Call made inside other timed call is part of the outer one and is not
+    recorded. Generator is timed only while it is running, not while its user process the output.
+    Return the decorator.
+
+    Parameter.
+    ----------
+    carrier : str
+        Carrier label, like "rc4".
+    operation : str
+        Operation label, like function name.
+    """
+    def decorator(function:Callable) -> Callable:
+        def recordCall(seconds:float, size:int, peak_memory:int) -> None:
+            registry.record((carrier, operation, sizeBucket(size), "-"), [(operation, seconds)],
+                seconds, {"input": size}, peak_memory)
+
+        def enter() -> bool:
+            depth:int = getattr(_depth, "value", 0)
+            _depth.value = depth + 1
+            if (depth == 0 and tracemalloc.is_tracing()):
+                tracemalloc.reset_peak()
+            return depth == 0
+
+        def leave() -> int:
+            _depth.value -= 1
+            return tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+
+        if (inspect.isgeneratorfunction(function)):
+            @functools.wraps(function)
+            def generatorWrapper(*args, **kwargs):
+                generator = function(*args, **kwargs)
+                seconds:float = 0.0
+                size:int = 0
+                peak_memory:int = None
+                try:
+                    while (True):
+                        outer:bool = enter()
+                        start:float = time.perf_counter()
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            break
+                        finally:
+                            seconds += time.perf_counter() - start
+                            memory:int = leave()
+                            if (outer and memory is not None):
+                                peak_memory = max(peak_memory or 0, memory)
+                        size += len(item)
+                        yield item
+                finally:
+                    # User stop reading early, the rest is never produced.
+                    generator.close()
+                if (outer):
+                    recordCall(seconds, size, peak_memory)
+            return generatorWrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            outer:bool = enter()
+            start:float = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                seconds:float = time.perf_counter() - start
+                peak_memory:int = leave()
+            if (outer):
+                recordCall(seconds, len(args[0]) if args and hasattr(args[0], "__len__") else 0,
+                    peak_memory)
+            return result
+        return wrapper
+    return decorator
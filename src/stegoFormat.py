@@ -0,0 +1,357 @@
+# Python module.
+import math
+import zlib
+import struct
+import numpy as np
+from typing import List, Tuple
+
+# Own module.
+from bitCodec import bytesToBits, bitsToBytes, concatenateBits
+from lsbKernel import AccessOrder, embedBits, extractBits
+from stageMetrics import StageTimer
+
+# Layout of message bit in carrier.
+# Position 0 always hold randomize flag. Message bit use the other position in AccessOrder.
+#
+# Old layout (no header, sequential or full random table):
+#     encrypt flag bit, file extension, "<<?", message, "?>>"
+# Header layout (sequential, or randomized with lazy keyed permutation):
+#     MAGIC, version, flags, extension length, message length, header CRC32, file extension,
+#     message, CRC32 of file extension and message
+#     Flags bit 1-2 hold number of LSB per carrier item minus 1. Header is always hidden in 1 LSB,
+#     file extension, message and CRC32 use that number of LSB in the position after the header.
+#     Randomized file also put MAGIC and version in sequential position right after position 0, and
+#     permute only the position after it. So wrong key is rejected by header CRC without trying
+#     the old full random table.
+MAGIC:bytes = b"STG"
+VERSION:int = 1
+FLAG_ENCRYPT:int = 0x01
+FLAG_LSB_SHIFT:int = 1
+FLAG_LSB_MASK:int = 0x06
+MIN_LSB_BITS:int = 1
+MAX_LSB_BITS:int = 4
+HEADER_FORMAT:str = ">3sBBBQ"
+CRC_SIZE:int = 4
+HEADER_SIZE:int = struct.calcsize(HEADER_FORMAT) + CRC_SIZE
+MARKER_SIZE:int = len(MAGIC) + 1
+START_FLAG:bytes = b"<<?"
+END_FLAG:bytes = b"?>>"
+
+# Old layout has no checksum, so the file extension must show up this early or the key is wrong.
+MAX_SENTINEL_EXTENSION:int = 16
+# Smallest carrier that can hold old layout: randomize flag, encrypt flag, start and end flag.
+MIN_SENTINEL_ITEMS:int = 2 + (len(START_FLAG) + len(END_FLAG)) * 8
+
+# Number of bit read at first, doubled every time the message is not complete yet.
+READ_CHUNK_BITS:int = 256
+# Maximum number of carrier item read or written at once, so streamed carrier only hold a window.
+ACCESS_CHUNK_ITEMS:int = 1 << 16
+
+def checkLSBBits(lsb_bits:int) -> None:
+    """
+    Function to validate number of LSB per carrier item.
+
+    Parameter.
+    ----------
+    lsb_bits : int
+        Number of LSB per carrier item.
+    """
+    if (lsb_bits not in range(MIN_LSB_BITS, MAX_LSB_BITS + 1)):
+        raise Exception("Number of LSB must be between %d and %d" % (MIN_LSB_BITS, MAX_LSB_BITS))
+
+def messageCapacity(carrier_length:int, extension:str, lsb_bits:int=1) -> int:
+    """
+    Function to count maximum message size that can be hidden in carrier.
+    Return number of bytes.
+
+    Parameter.
+    ----------
+    carrier_length : int
+        Number of carrier item.
+    extension : str
+        File extension of the message.
+    lsb_bits : int, default 1
+        Number of LSB used in one carrier item for the message.
+    """
+    # Keep space for randomize flag, marker and header (1 bit per item), extension and checksum.
+    body_items:int = carrier_length - 1 - (MARKER_SIZE + HEADER_SIZE) * 8
+    return body_items * lsb_bits // 8 - len(extension) - CRC_SIZE
+
+def estimatePSNR(carrier_length:int, extension:str, message_length:int, lsb_bits:int) -> float:
+    """
+    Function to estimate psnr of 8 bit carrier after hiding message with lsb_bits LSB. Hidden bit is
+    assumed random (encrypted or compressed message), so every touched item change by expected
+    squared error (4^k - 1) / 6.
+    Return float representing the psnr, infinity if nothing is touched.
+
+    Parameter.
+    ----------
+    carrier_length : int
+        Number of carrier item.
+    extension : str
+        File extension of the message.
+    message_length : int
+        Message size in bytes.
+    lsb_bits : int
+        Number of LSB used in one carrier item for the message.
+    """
+    header_items:int = 1 + (MARKER_SIZE + HEADER_SIZE) * 8
+    body_items:int = -(-(len(extension) + message_length + CRC_SIZE) * 8 // lsb_bits)
+    squared_error:float = header_items * 0.5 + body_items * ((4 ** lsb_bits) - 1) / 6
+    mse:float = squared_error / carrier_length
+    if (mse == 0):
+        return math.inf
+    return 10 * math.log10(255 ** 2 / mse)
+
+def frameMessage(extension:str, message:bytes, is_random:bool, is_encrypt:bool,
+    lsb_bits:int=1) -> np.ndarray:
+    """
+    Function to put flag and header around the message and turn it to bit.
+    Return uint8 array of bit, first bit is for position 0.
+
+    Parameter.
+    ----------
+    extension : str
+        File extension of the message.
+    message : bytes
+        Message, already encrypted if is_encrypt.
+    is_random : bool
+        Boolean indicating lsb randomized or not.
+    is_encrypt : bool
+        Boolean indicating message encrypted or not.
+    lsb_bits : int, default 1
+        Number of LSB used in one carrier item for file extension and message.
+    """
+    checkLSBBits(lsb_bits)
+    extension_bytes:bytes = extension.encode("latin-1")
+    if (len(extension_bytes) > 255):
+        raise Exception("Message file extension is too long")
+    flags:int = (FLAG_ENCRYPT if is_encrypt else 0) | ((lsb_bits - 1) << FLAG_LSB_SHIFT)
+    header:bytes = struct.pack(HEADER_FORMAT, MAGIC, VERSION, flags, len(extension_bytes), len(message))
+    header += struct.pack(">I", zlib.crc32(header))
+    body:bytes = extension_bytes + bytes(message)
+    body += struct.pack(">I", zlib.crc32(body))
+    return concatenateBits(1 if is_random else 0, bytesToBits(header + body))
+
+def planMessage(length:int, bits:np.ndarray, key:str=None,
+    lsb_bits:int=1) -> List[Tuple[np.ndarray, np.ndarray, int]]:
+    """
+    Function to map framed message bit to carrier position, without touching the carrier.
+    Return list of segment, tuple of position, bit and number of LSB per position.
+
+    Parameter.
+    ----------
+    length : int
+        Number of carrier item.
+    bits : np.ndarray
+        Bit from frameMessage.
+    key : str, default none
+        Key for randomized method, none for sequential.
+    lsb_bits : int, default 1
+        Number of LSB used in one carrier item for the body, same as in frameMessage.
+    """
+    segments:List[Tuple[np.ndarray, np.ndarray, int]] = []
+    order:AccessOrder = AccessOrder(length)
+    if (key is not None):
+        marker:np.ndarray = bytesToBits(MAGIC + bytes([VERSION]))
+        segments.append((order.positions(0, len(marker)), marker, 1))
+        order = AccessOrder(length, key, first=1 + len(marker))
+
+    # Randomize flag and header in 1 LSB, so header can be read before knowing lsb_bits.
+    header_bits:int = HEADER_SIZE * 8
+    segments.append((np.concatenate(([0], order.positions(0, header_bits))), bits[:1 + header_bits], 1))
+    body:np.ndarray = bits[1 + header_bits:]
+    body_items:int = -(-len(body) // lsb_bits)
+    segments.append((order.positions(header_bits, body_items), body, lsb_bits))
+    return segments
+
+def embedMessage(carrier:np.ndarray, bits:np.ndarray, key:str=None, lsb_bits:int=1,
+    timer:StageTimer=None) -> None:
+    """
+    Function to hide framed message bit in carrier.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Writable integer array (view) of the carrier.
+    bits : np.ndarray
+        Bit from frameMessage.
+    key : str, default none
+        Key for randomized method, none for sequential.
+    lsb_bits : int, default 1
+        Number of LSB used in one carrier item for the body, same as in frameMessage.
+    timer : StageTimer, default none
+        Timer of the operation, mapping position end "plan" stage and changing LSB end "lsb" stage.
+    """
+    segments:List[Tuple[np.ndarray, np.ndarray, int]] = planMessage(len(carrier), bits, key, lsb_bits)
+    if (timer is not None):
+        timer.lap("plan")
+    for positions, segment_bits, segment_lsb_bits in segments:
+        for start in range(0, len(positions), ACCESS_CHUNK_ITEMS):
+            embedBits(carrier, positions[start:start + ACCESS_CHUNK_ITEMS],
+                segment_bits[start * segment_lsb_bits:(start + ACCESS_CHUNK_ITEMS) * segment_lsb_bits],
+                segment_lsb_bits)
+    if (timer is not None):
+        timer.lap("lsb")
+
+def readBytes(carrier:np.ndarray, order:AccessOrder, start:int, count:int, lsb_bits:int=1) -> bytes:
+    """
+    Function to read bytes hidden in carrier, chunk by chunk in access order.
+    Return bytes, shorter than count if carrier end first.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    order : AccessOrder
+        Order of message bit.
+    start : int
+        Index of first carrier item in access order.
+    count : int
+        Number of bytes.
+    lsb_bits : int, default 1
+        Number of LSB used in one carrier item.
+    """
+    items:int = -(-count * 8 // lsb_bits)
+    data:bytearray = bytearray()
+    for offset in range(0, items, ACCESS_CHUNK_ITEMS):
+        positions:np.ndarray = order.positions(start + offset, min(ACCESS_CHUNK_ITEMS, items - offset))
+        data += bitsToBytes(extractBits(carrier, positions, lsb_bits))
+    return bytes(data[:count])
+
+def readSentinelBody(carrier:np.ndarray, order:AccessOrder, start:int) -> Tuple[str, bytes]:
+    """
+    Function to read file extension and message framed by start and end flag. Carrier is read chunk
+    by chunk and stop as soon as end flag found.
+    Return tuple of file extension and message.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    order : AccessOrder
+        Order of message bit.
+    start : int
+        Index of first body bit in access order.
+    """
+    data:bytearray = bytearray()
+    position:int = start
+    chunk:int = READ_CHUNK_BITS
+    start_flag_index:int = -1
+    end_flag_index:int = -1
+    while (end_flag_index < 0):
+        bits:np.ndarray = extractBits(carrier, order.positions(position, chunk))
+        if (len(bits) < 8):
+            raise Exception("No message found in this stego file")
+        position += len(bits)
+        data += bitsToBytes(bits)
+        chunk = min(chunk * 2, ACCESS_CHUNK_ITEMS)
+
+        # File extension end right before start flag, message end right before end flag.
+        if (start_flag_index < 0):
+            start_flag_index = data.find(START_FLAG, 1)
+            if (start_flag_index < 0 and len(data) > MAX_SENTINEL_EXTENSION + len(START_FLAG)):
+                raise Exception("Wrong key or not a stego file")
+        if (start_flag_index >= 0):
+            end_flag_index = data.find(END_FLAG, start_flag_index + len(START_FLAG) + 1)
+
+    extension:str = data[:start_flag_index].decode("latin-1")
+    return (extension, bytes(data[start_flag_index + len(START_FLAG):end_flag_index]))
+
+def readHeaderMessage(carrier:np.ndarray, order:AccessOrder) -> Tuple[bool, str, bytes]:
+    """
+    Function to read message of file with header.
+    Return tuple of encrypted flag, file extension and message, or none if there is no valid header.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    order : AccessOrder
+        Order of message bit.
+    """
+    header:bytes = readBytes(carrier, order, 0, HEADER_SIZE)
+    if (len(header) < HEADER_SIZE):
+        return None
+    magic, version, flags, extension_length, message_length = struct.unpack(HEADER_FORMAT,
+        header[:-CRC_SIZE])
+    if (magic != MAGIC or version != VERSION):
+        return None
+    # Check header before reading the message, wrong key is rejected here.
+    header_checksum:int = struct.unpack(">I", header[-CRC_SIZE:])[0]
+    if (header_checksum != zlib.crc32(header[:-CRC_SIZE])):
+        return None
+    is_encrypted:bool = (flags & FLAG_ENCRYPT) != 0
+    lsb_bits:int = ((flags & FLAG_LSB_MASK) >> FLAG_LSB_SHIFT) + 1
+    body_length:int = extension_length + message_length + CRC_SIZE
+    if (body_length * 8 > (order.count - HEADER_SIZE * 8) * lsb_bits):
+        raise Exception("Wrong key or not a stego file")
+
+    # Read only the header and message bit, then stop.
+    body:bytes = readBytes(carrier, order, HEADER_SIZE * 8, body_length, lsb_bits)
+    checksum:int = struct.unpack(">I", body[-CRC_SIZE:])[0]
+    body = body[:-CRC_SIZE]
+    if (checksum != zlib.crc32(body)):
+        raise Exception("Message in this stego file is corrupted")
+    return (is_encrypted, body[:extension_length].decode("latin-1"), body[extension_length:])
+
+def extractHeaderMessage(carrier:np.ndarray, key:str=None) -> Tuple[bool, str, bytes]:
+    """
+    Function to read hidden message from carrier written in header layout only.
+    Return tuple of encrypted flag, file extension and message, or none if there is no header.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    key : str, default none
+        Key for randomized method, none for sequential.
+    """
+    marker:bytes = readBytes(carrier, AccessOrder(len(carrier)), 0, MARKER_SIZE)
+    if (marker != MAGIC + bytes([VERSION])):
+        return None
+    if (key is None):
+        return readHeaderMessage(carrier, AccessOrder(len(carrier)))
+
+    # Randomized file has marker in sequential position, header must be valid.
+    order:AccessOrder = AccessOrder(len(carrier), key, first=1 + MARKER_SIZE * 8)
+    result = readHeaderMessage(carrier, order)
+    if (result is None):
+        raise Exception("Wrong key or not a stego file")
+    return result
+
+def extractMessage(carrier:np.ndarray, key:str=None, legacy_random:bool=False) -> Tuple[bool, str, bytes]:
+    """
+    Function to read hidden message from carrier, in header layout or old layout. Header and
+    sequential old layout only read the bit of the message. Randomized old layout need the full
+    random table, building it shuffle every carrier position in Python (O(n), around 8 second for
+    1920x1080 RGBA image) before the first bit can be read, so it is only tried if legacy_random.
+    Return tuple of encrypted flag, file extension and message.
+
+    Parameter.
+    ----------
+    carrier : np.ndarray
+        Integer array (view) of the carrier.
+    key : str, default none
+        Key for randomized method, none for sequential.
+    legacy_random : bool, default false
+        Boolean indicating randomized file without header is read with the full random table.
+    """
+    result = extractHeaderMessage(carrier, key)
+    if (result is not None):
+        return result
+    if (len(carrier) < MIN_SENTINEL_ITEMS):
+        raise Exception("No message found in this stego file")
+
+    # Old file has no header, randomized one use full random table.
+    order:AccessOrder = AccessOrder(len(carrier))
+    if (key is not None):
+        if (not(legacy_random)):
+            raise Exception("Wrong key or not a stego file, use legacy random mode for randomized stego "
+                "file made by older version")
+        order = AccessOrder(len(carrier), key, AccessOrder.SHUFFLED)
+
+    # Old layout, first bit is encrypt flag.
+    is_encrypted = extractBits(carrier, order.positions(0, 1))[0] == 1
+    extension, message = readSentinelBody(carrier, order, 1)
+    return (is_encrypted, extension, message)
@@ -0,0 +1,165 @@
+# Python module.
+import numpy as np
+from typing import Callable, Iterator, List, Tuple
+
+# Own module.
+from lsbKernel import packBits
+
+# Default number of decoded bytes of one strip. Image bigger than this is handled strip by strip,
+# ordinary image is decoded at once because randomized read of strip need one pass for every read.
+STRIP_BUDGET:int = 256 << 20
+
+Strips = Iterator[Tuple[int, np.ndarray]]
+
+def stripRows(row_items:int, strip_budget:int=STRIP_BUDGET) -> int:
+    """
+    Function to count number of row of one strip.
+    Return number of row, at least 1.
+
+    Parameter.
+    ----------
+    row_items : int
+        Number of carrier item (byte) of one row.
+    strip_budget : int, default STRIP_BUDGET
+        Maximum number of bytes of one strip.
+    """
+    return max(1, strip_budget // max(row_items, 1))
+
+class StripCarrier:
+    """
+    A class used for representing carrier of image read strip by strip, only one strip is in
+    memory. Requested position is sorted and every strip is visited once in order, so sequential
+    message stop at the strip of its last bit, and scattered message need one pass for every read.
+    Read only.
+
+    Attributes.
+    ----------
+    open_strips : Callable
+        Function to start reading strip from the first row, return iterator of first row and uint8
+        array of shape (rows, row_items).
+    length : int
+        Number of carrier item of the whole image.
+    row_items : int
+        Number of carrier item (byte) of one row.
+    """
+
+    def __init__(self, open_strips:Callable[[], Strips], length:int, row_items:int) -> None:
+        """
+        Constructor for StripCarrier class.
+
+        Parameter.
+        ----------
+        open_strips : Callable
+            Function to start reading strip from the first row.
+        length : int
+            Number of carrier item of the whole image.
+        row_items : int
+            Number of carrier item (byte) of one row.
+        """
+        self.open_strips:Callable[[], Strips] = open_strips
+        self.length:int = length
+        self.row_items:int = row_items
+        self._strips:Strips = None
+        self._start:int = 0
+        self._strip:np.ndarray = np.empty(0, dtype=np.uint8)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Type of carrier item, always uint8.
+        """
+        return self._strip.dtype
+
+    def __len__(self) -> int:
+        """
+        Number of carrier item.
+        """
+        return self.length
+
+    def nextStrip(self) -> None:
+        """
+        Function to read the next strip, from the first one after restart.
+        """
+        if (self._strips is None):
+            self._strips = self.open_strips()
+        try:
+            first_row, strip = next(self._strips)
+        except StopIteration:
+            raise IndexError("Carrier position is out of range")
+        self._start = first_row * self.row_items
+        self._strip = strip.reshape(-1)
+
+    def __getitem__(self, positions) -> np.ndarray:
+        positions = np.asarray(positions, dtype=np.int64)
+        flat:np.ndarray = positions.reshape(-1)
+        order:np.ndarray = np.argsort(flat, kind="stable")
+        sorted_positions:np.ndarray = flat[order]
+        values:np.ndarray = np.empty(len(flat), dtype=np.uint8)
+        if (len(flat) and sorted_positions[0] < self._start):
+            self.close()
+        if (self._strips is None and len(flat)):
+            self.nextStrip()
+
+        # Gather position of current strip, then go to the next one.
+        done:int = 0
+        while (done < len(flat)):
+            end:int = int(np.searchsorted(sorted_positions, self._start + len(self._strip)))
+            values[order[done:end]] = self._strip[sorted_positions[done:end] - self._start]
+            done = end
+            if (done < len(flat)):
+                self.nextStrip()
+        return values.reshape(positions.shape)
+
+    def close(self) -> None:
+        """
+        Function to stop reading, the next read start again from the first strip.
+        """
+        if (self._strips is not None):
+            self._strips.close()
+        self._strips = None
+        self._start = 0
+        self._strip = self._strip[:0]
+
+def embedStrips(segments:List[Tuple[np.ndarray, np.ndarray, int]], strips:Strips,
+    write_strip:Callable[[np.ndarray], None],
+    observer:Callable[[int, np.ndarray, np.ndarray], None]=None) -> int:
+    """
+    Function to hide planned message bit strip by strip. Every global position is mapped to its
+    strip and offset, every strip is read, changed and written once in order.
+    Return sum of squared difference between stego and cover item.
+
+    Parameter.
+    ----------
+    segments : List[Tuple[np.ndarray, np.ndarray, int]]
+        Position, bit and number of LSB from planMessage.
+    strips : Iterator
+        Strip of the cover, first row and writable uint8 array of shape (rows, row_items).
+    write_strip : Callable
+        Function to write the stego strip.
+    observer : Callable, default none
+        Function called with first row, cover strip and stego strip.
+    """
+    # Flatten the plan to one value and mask per position, sorted by position.
+    positions:np.ndarray = np.concatenate([segment[0] for segment in segments])
+    values:np.ndarray = np.concatenate([packBits(bits, lsb_bits) for _, bits, lsb_bits in segments])
+    masks:np.ndarray = np.concatenate([np.full(len(segment_positions), (1 << lsb_bits) - 1,
+        dtype=np.uint8) for segment_positions, _, lsb_bits in segments])
+    order:np.ndarray = np.argsort(positions, kind="stable")
+    positions, values, masks = positions[order], values[order], masks[order]
+
+    squared_error:int = 0
+    for first_row, strip in strips:
+        flat:np.ndarray = strip.reshape(-1)
+        start:int = first_row * strip.shape[1]
+        low, high = np.searchsorted(positions, [start, start + len(flat)])
+        offsets:np.ndarray = positions[low:high] - start
+        cover_values:np.ndarray = flat[offsets]
+        stego_values:np.ndarray = (cover_values & ~masks[low:high]) | values[low:high]
+        difference:np.ndarray = stego_values.astype(np.int64) - cover_values
+        squared_error += int(np.dot(difference, difference))
+        cover:np.ndarray = strip.copy() if observer is not None and high > low else strip
+        flat[offsets] = stego_values
+        write_strip(strip)
+        if (observer is not None):
+            observer(first_row, cover, strip)
+    return squared_error
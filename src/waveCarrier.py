@@ -0,0 +1,224 @@
+# Python module.
+import wave
+import numpy as np
+from typing import Callable
+
+# Number of frame read or written at once.
+BLOCK_FRAMES:int = 1 << 16
+
+def sampleView(data:bytearray, sample_width:int) -> np.ndarray:
+    """
+    Function to view frame bytes as array of sample LSB item without copying. WAV sample is little
+    endian, so packed 24 bit sample is viewed by its low byte.
+    Return writable array if data is writable.
+
+    Parameter.
+    ----------
+    data : bytearray
+        Frame bytes.
+    sample_width : int
+        Number of bytes of one item, 1 for byte item.
+    """
+    view:np.ndarray = np.frombuffer(data, dtype=np.uint8)
+    if (sample_width in (2, 4)):
+        return view[:len(view) - len(view) % sample_width].view("<i%d" % sample_width)
+    return view[::sample_width]
+
+class WaveCarrier:
+    """
+    A class used for representing frame of WAV file that is read only as far as needed. Sliding
+    carrier keep a window of about one block: position must be accessed in increasing order, block
+    before the lowest accessed position is written to the writer (if any) and dropped. So memory of
+    sequential embed and extract does not grow with how far the message reach. Carrier that is not
+    sliding (randomized message) keep every frame read so far, until the highest requested position.
+
+    Carrier item is either every frame byte (older stego file) or every sample, viewed without copy
+    by sample width (uint8, int16, low byte of packed 24 bit, int32). With sample item, LSB is the
+    true sample LSB and high byte is never touched.
+
+    Attributes.
+    ----------
+    reader : wave.Wave_read
+        Opened WAV file.
+    frame_size : int
+        Number of bytes of one frame.
+    sample_width : int
+        Number of bytes of one sample.
+    length : int
+        Number of frame bytes in the whole file.
+    sample_items : bool
+        Boolean indicating carrier item is sample or byte, can be switched anytime.
+    sliding : bool
+        Boolean indicating block before accessed position is dropped, can be switched off before
+        the first block is dropped.
+    buffer : bytearray
+        Frame bytes of the window, including change from embedding.
+    offset : int
+        Byte offset of the window in the file, always a multiple of block size.
+    block_frames : int
+        Number of frame read, written and dropped at once.
+    writer : wave.Wave_write
+        WAV file that get every dropped block, none if the carrier is only read.
+    observer : Callable
+        Function called with byte offset and bytes of every written block, none if not used.
+    """
+
+    def __init__(self, reader:wave.Wave_read, block_frames:int=BLOCK_FRAMES,
+        sample_items:bool=False, sliding:bool=True, writer:wave.Wave_write=None,
+        observer:Callable[[int, bytes], None]=None) -> None:
+        """
+        Constructor for WaveCarrier class.
+
+        Parameter.
+        ----------
+        reader : wave.Wave_read
+            WAV file opened for reading, not read yet.
+        block_frames : int, default BLOCK_FRAMES
+            Number of frame read, written and dropped at once.
+        sample_items : bool, default false
+            Boolean indicating carrier item is sample instead of byte.
+        sliding : bool, default true
+            Boolean indicating position is accessed in increasing order and block before it is
+            dropped, false for randomized access.
+        writer : wave.Wave_write, default none
+            WAV file opened for writing, with parameter already set.
+        observer : Callable, default none
+            Function called with byte offset and bytes of every written block.
+        """
+        self.reader:wave.Wave_read = reader
+        self.sample_width:int = reader.getsampwidth()
+        self.frame_size:int = self.sample_width * reader.getnchannels()
+        self.length:int = reader.getnframes() * self.frame_size
+        self.buffer:bytearray = bytearray()
+        self.offset:int = 0
+        self.block_frames:int = block_frames
+        self.sample_items:bool = sample_items
+        self.sliding:bool = sliding
+        self.writer:wave.Wave_write = writer
+        self.observer:Callable[[int, bytes], None] = observer
+
+    @property
+    def item_size(self) -> int:
+        """
+        Number of bytes of one carrier item.
+        """
+        return self.sample_width if self.sample_items else 1
+
+    @property
+    def block_size(self) -> int:
+        """
+        Number of bytes of one block.
+        """
+        return self.block_frames * self.frame_size
+
+    @property
+    def dtype(self) -> np.dtype:
+        """
+        Type of carrier item.
+        """
+        if (self.item_size in (2, 4)):
+            return np.dtype("<i%d" % self.item_size)
+        return np.dtype(np.uint8)
+
+    def __len__(self) -> int:
+        """
+        Number of carrier item.
+        """
+        return self.length // self.item_size
+
+    def itemView(self) -> np.ndarray:
+        """
+        Function to view window as array of carrier item without copying.
+        Return array of carrier item from offset.
+        """
+        return sampleView(self.buffer, self.item_size)
+
+    def readUntil(self, end:int) -> None:
+        """
+        Function to read frame until window hold position end-1. Read size is doubled with window
+        size, so reading the whole file step by step is still linear.
+
+        Parameter.
+        ----------
+        end : int
+            Number of bytes from beginning of the file that must be read.
+        """
+        end = min(end, self.length)
+        while (self.offset + len(self.buffer) < end):
+            frames:int = max(-(-(end - self.offset - len(self.buffer)) // self.frame_size),
+                self.block_frames, len(self.buffer) // self.frame_size)
+            data:bytes = self.reader.readframes(frames)
+            if (not(data)):
+                raise Exception("Audio file is truncated")
+            self.buffer += data
+
+    def writeBlocks(self, size:int) -> None:
+        """
+        Function to write the first size bytes of the window block by block, then drop them.
+
+        Parameter.
+        ----------
+        size : int
+            Number of bytes from the window start.
+        """
+        if (self.writer is not None):
+            for start in range(0, size, self.block_size):
+                data:bytes = bytes(self.buffer[start:min(start + self.block_size, size)])
+                self.writer.writeframes(data)
+                if (self.observer is not None):
+                    self.observer(self.offset + start, data)
+        del self.buffer[:size]
+        self.offset += size
+
+    def slideTo(self, start:int) -> None:
+        """
+        Function to drop every full block before byte start, if the carrier is sliding.
+
+        Parameter.
+        ----------
+        start : int
+            Lowest byte offset that is still accessed.
+        """
+        if (not(self.sliding)):
+            return
+        size:int = min((start - self.offset) // self.block_size * self.block_size, len(self.buffer))
+        if (size > 0):
+            self.writeBlocks(size)
+
+    def windowPositions(self, positions) -> np.ndarray:
+        """
+        Function to read frame for the positions and move them into the window.
+        Return positions relative to the window.
+
+        Parameter.
+        ----------
+        positions : array_like
+            Carrier item position from beginning of the file.
+        """
+        positions = np.asarray(positions)
+        if (positions.size):
+            self.slideTo(int(positions.min()) * self.item_size)
+            if (int(positions.min()) * self.item_size < self.offset):
+                raise Exception("Audio frame is already dropped, position must be accessed in order")
+            self.readUntil((int(positions.max()) + 1) * self.item_size)
+        return positions - self.offset // self.item_size
+
+    def __getitem__(self, positions) -> np.ndarray:
+        positions = self.windowPositions(positions)
+        return self.itemView()[positions]
+
+    def __setitem__(self, positions, values) -> None:
+        positions = self.windowPositions(positions)
+        self.itemView()[positions] = values
+
+    def flush(self) -> None:
+        """
+        Function to write the window and the rest of the file to the writer block by block.
+        """
+        self.writeBlocks(len(self.buffer))
+        while (True):
+            data:bytes = self.reader.readframes(self.block_frames)
+            if (not(data)):
+                break
+            self.buffer += data
+            self.writeBlocks(len(data))
@@ -0,0 +1,6 @@
+# Python module.
+import os
+import sys
+
+# Module in src import each other by plain name, like when app.py is run from src.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,30 @@
+# Python module.
+import os
+import numpy as np
+import pytest
+
+# Own module.
+from bitCodec import bytesToBits, bitsToBytes, concatenateBits
+
+@pytest.mark.parametrize("size", [0, 1, 7, 8, 255, 4096])
+def test_round_trip(size):
+    data = os.urandom(size)
+    bits = bytesToBits(data)
+    assert bits.dtype == np.uint8
+    assert len(bits) == size * 8
+    assert bitsToBytes(bits) == data
+
+def test_most_significant_bit_first():
+    data = b"\x01\x80\xa5"
+    expected = "".join(format(byte, "08b") for byte in data)
+    assert "".join(map(str, bytesToBits(data))) == expected
+
+def test_partial_byte_is_dropped():
+    bits = bytesToBits(b"\xff\x0f")
+    assert bitsToBytes(bits[:13]) == b"\xff"
+    assert bitsToBytes(bits[:7]) == b""
+
+def test_concatenate_bit_and_array():
+    bits = concatenateBits(1, bytesToBits(b"\x00"), np.array([1, 0], dtype=np.uint8), 0)
+    assert bits.dtype == np.uint8
+    assert bits.tolist() == [1] + [0] * 8 + [1, 0, 0]
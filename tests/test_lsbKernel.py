@@ -0,0 +1,58 @@
+# Python module.
+import numpy as np
+import pytest
+
+# Own module.
+from helper import generate_random_access_table
+from lsbKernel import AccessOrder, embedBits, extractBits, packBits, unpackBits
+
+@pytest.mark.parametrize("lsb_bits", [1, 2, 3, 4])
+def test_pack_unpack_round_trip(lsb_bits):
+    rng = np.random.default_rng(lsb_bits)
+    bits = rng.integers(0, 2, 1000, dtype=np.uint8)
+    values = packBits(bits, lsb_bits)
+    assert len(values) == -(-len(bits) // lsb_bits)
+    assert values.max() < (1 << lsb_bits)
+    assert np.array_equal(unpackBits(values, lsb_bits)[:len(bits)], bits)
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.int16])
+@pytest.mark.parametrize("lsb_bits", [1, 2, 3, 4])
+def test_embed_extract_round_trip(lsb_bits, dtype):
+    rng = np.random.default_rng(lsb_bits)
+    info = np.iinfo(dtype)
+    carrier = rng.integers(info.min, info.max, 5000, dtype=dtype, endpoint=True)
+    original = carrier.copy()
+    positions = rng.permutation(len(carrier))[:1200].astype(np.int64)
+    bits = rng.integers(0, 2, len(positions) * lsb_bits, dtype=np.uint8)
+
+    embedBits(carrier, positions, bits, lsb_bits)
+    assert np.array_equal(extractBits(carrier, positions, lsb_bits), bits)
+
+    # Only the lowest lsb_bits bit of the given position change.
+    mask = dtype((1 << lsb_bits) - 1)
+    assert np.array_equal(carrier & ~mask, original & ~mask)
+    untouched = np.setdiff1d(np.arange(len(carrier)), positions)
+    assert np.array_equal(carrier[untouched], original[untouched])
+
+def test_embed_pads_last_group():
+    carrier = np.zeros(2, dtype=np.uint8)
+    embedBits(carrier, np.array([0, 1]), np.array([1, 1, 1, 1, 1], dtype=np.uint8), 3)
+    assert carrier.tolist() == [0b111, 0b110]
+
+def test_sequential_order():
+    order = AccessOrder(10)
+    assert order.count == 9
+    assert order.positions(0, 20).tolist() == list(range(1, 10))
+    assert len(order.positions(9, 1)) == 0
+
+def test_permuted_order_is_keyed_permutation():
+    order = AccessOrder(1000, "key", first=5)
+    positions = order.positions(0, order.count)
+    assert sorted(positions.tolist()) == list(range(5, 1000))
+    assert np.array_equal(positions[100:200], order.positions(100, 100))
+    assert np.array_equal(positions, AccessOrder(1000, "key", first=5).positions(0, order.count))
+    assert not(np.array_equal(positions, AccessOrder(1000, "other", first=5).positions(0, order.count)))
+
+def test_shuffled_order_matches_old_random_table():
+    order = AccessOrder(500, "key", AccessOrder.SHUFFLED)
+    assert order.positions(0, order.count).tolist() == generate_random_access_table("key", 500)
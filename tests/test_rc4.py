@@ -0,0 +1,144 @@
+# Python module.
+import io
+import os
+import pytest
+
+# Own module.
+from rc4 import (decrypt, decryptBlock, decryptByte2, encrypt, encryptBlock, encryptByte2,
+    encryptStream, ModifiedRC4, RC4CheckpointIndex, SeekableRC4, UTF8_PREFIX)
+from rc4Segmented import decryptSegmented, encryptSegmented, HEADER_SIZE, segmentKey
+
+def referenceKSA(key):
+    s = list(range(256))
+    j = 0
+    for i in range(256):
+        j = (j+s[i]+ord(key[i%len(key)]))%256
+        s[i], s[j] = s[j], s[i]
+    return s
+
+def referenceEncryptByte(text, key):
+    # Byte loop of the first modified RC4 version, c = u xor p xor j.
+    s = referenceKSA(key)
+    i = 0
+    j = 0
+    c = bytearray()
+    for byte in text:
+        i = (i+1) % 256
+        j = (j+s[i]) % 256
+        s[i], s[j] = s[j], s[i]
+        c.append(s[(s[i]+s[j]) % 256]^byte^j)
+    return c
+
+def referenceEncrypt(text, key):
+    # Text mode of the first version, two uppercase hex digit per character.
+    return "".join(hex(byte)[2:].zfill(2).upper()
+        for byte in referenceEncryptByte([ord(c) for c in text], key))
+
+# Ciphertext written by the first version.
+HEX_VECTORS = [
+    ("Hello wörld", "kunci", "2A91CDC3E3A62F08A31F21"),
+    ("The quick brown fox", "Key", "8C4046B51AB802FA12586D0DCF88F581A89DE5"),
+]
+BYTE_VECTOR = (bytes(range(32)), "secret",
+    "3DA17AB6B8EDBE5368E383523857D71CFA6B71594096AF67079C30660DF3ABE3")
+
+@pytest.mark.parametrize("text, key, ciphertext", HEX_VECTORS)
+def test_hex_ciphertext_compatibility(text, key, ciphertext):
+    assert encrypt(text, key) == ciphertext
+    assert decrypt(ciphertext, key) == text
+    assert decrypt(ciphertext.lower(), key) == text
+
+def test_byte_ciphertext_compatibility():
+    text, key, ciphertext = BYTE_VECTOR
+    assert bytes(encryptByte2(text, key)).hex().upper() == ciphertext
+    assert bytes(decryptByte2(bytes.fromhex(ciphertext), key)) == text
+
+@pytest.mark.parametrize("key", ["k", "kunci", "a much longer key \x7f\xff"])
+def test_byte_mode_matches_reference(key):
+    data = os.urandom(5000)
+    assert encryptByte2(data, key) == referenceEncryptByte(data, key)
+
+def test_text_mode_matches_reference():
+    text = "".join(chr(byte) for byte in os.urandom(1000))
+    assert encrypt(text, "kunci") == referenceEncrypt(text, "kunci")
+
+@pytest.mark.parametrize("text", ["Ä°", "ï»¿abc", "İ", "﻿abc", "héllo", "日本語", ""])
+def test_text_round_trip(text):
+    assert decrypt(encrypt(text, "k"), "k") == text
+
+def test_latin1_text_is_plain_hex():
+    assert encrypt("Ä°", "k") == referenceEncrypt("Ä°", "k")
+
+def test_utf8_text_is_marked():
+    # Same bytes as latin-1 "Ä°", only the prefix tell them apart.
+    assert encrypt("İ", "k") == UTF8_PREFIX + encrypt("Ä°", "k")
+
+def test_ciphertext_must_be_hex():
+    with pytest.raises(Exception):
+        decrypt("not hex", "k")
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 256, 4096, 100000])
+def test_chunked_matches_reference(chunk_size):
+    data = os.urandom(20000)
+    cipher = ModifiedRC4("kunci")
+    result = bytearray()
+    for start in range(0, len(data), chunk_size):
+        result += cipher.update(data[start:start + chunk_size])
+    result += cipher.finalize()
+    assert result == referenceEncryptByte(data, "kunci")
+    assert cipher.position == len(data)
+
+def test_update_after_finalize_fails():
+    cipher = ModifiedRC4("kunci")
+    cipher.finalize()
+    with pytest.raises(Exception):
+        cipher.update(b"data")
+
+def test_stream_matches_reference():
+    data = os.urandom(10000)
+    result = b"".join(encryptStream(io.BytesIO(data), "kunci", chunk_size=999))
+    assert result == referenceEncryptByte(data, "kunci")
+
+@pytest.mark.parametrize("block_size", [1, 13, 4096, 1 << 16])
+def test_block_matches_reference(block_size):
+    data = os.urandom(30000)
+    ciphertext = encryptBlock(data, "kunci", block_size)
+    assert ciphertext == referenceEncryptByte(data, "kunci")
+    assert decryptBlock(bytes(ciphertext), "kunci", block_size) == data
+
+@pytest.mark.parametrize("offset, length", [(0, 100), (999, 2), (1000, 1000), (4321, 5000),
+    (9999, 1)])
+def test_seek_matches_reference(offset, length):
+    data = os.urandom(10000)
+    ciphertext = bytes(referenceEncryptByte(data, "kunci"))
+    seekable = SeekableRC4("kunci", interval=1000)
+    assert seekable.decryptRange(ciphertext[offset:offset + length], offset) == \
+        data[offset:offset + length]
+    assert seekable.readRange(io.BytesIO(ciphertext), offset, length) == data[offset:offset + length]
+
+def test_seek_with_saved_index(tmp_path):
+    data = os.urandom(5000)
+    cipher = ModifiedRC4("kunci")
+    index = RC4CheckpointIndex(512)
+    ciphertext = bytes(index.update(cipher, data))
+    assert ciphertext == referenceEncryptByte(data, "kunci")
+    index.save(str(tmp_path / "index"), "kunci")
+
+    seekable = SeekableRC4("kunci", RC4CheckpointIndex.load(str(tmp_path / "index"), "kunci"))
+    assert seekable.decryptRange(ciphertext[3000:4000], 3000) == data[3000:4000]
+    with pytest.raises(Exception):
+        RC4CheckpointIndex.load(str(tmp_path / "index"), "wrong")
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_segmented_matches_reference(workers):
+    data = os.urandom(10000)
+    container = encryptSegmented(data, "kunci", segment_size=4096, workers=workers)
+    body = container[HEADER_SIZE:]
+    for number, start in enumerate(range(0, len(data), 4096)):
+        assert body[start:start + 4096] == \
+            referenceEncryptByte(data[start:start + 4096], segmentKey("kunci", number))
+    assert decryptSegmented(container, "kunci", workers=workers) == data
+
+def test_segmented_reads_single_stream():
+    data = os.urandom(3000)
+    assert decryptSegmented(bytes(referenceEncryptByte(data, "kunci")), "kunci") == data
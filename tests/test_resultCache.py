@@ -0,0 +1,81 @@
+# Python module.
+import os
+import time
+import pytest
+
+# Own module.
+from resultCache import ResultCache
+
+def requestKey(cache:ResultCache, message_hash:str="m" * 64, **options) -> str:
+    request = dict(carrier_type="image", cover_hash="c" * 64, message_hash=message_hash,
+        msg_extension="txt", is_random=True, is_encrypt=False, enc_key=None, key="secret", lsb_bits=1,
+        output_format=".png")
+    request.update(options)
+    return cache.key(**request)
+
+def stegoFile(directory, name:str, size:int) -> str:
+    path = os.path.join(str(directory), name)
+    with open(path, "wb") as stego_file:
+        stego_file.write(os.urandom(size))
+    return path
+
+def age(cache:ResultCache, entry_key:str, seconds:float) -> None:
+    # Move last use of the entry to the past.
+    used = time.time() - seconds
+    os.utime(os.path.join(cache.path(entry_key), "meta.json"), (used, used))
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "results"), result_ttl=3600, budget=1000)
+
+def test_hit_return_stored_file_and_meta(cache, tmp_path):
+    entry_key = requestKey(cache)
+    assert cache.get(entry_key) is None
+    path = stegoFile(tmp_path, "stego.png", 100)
+    assert cache.put(entry_key, path, {"metrics": {"psnr": 70.5}})
+    stored_path, meta = cache.get(entry_key)
+    with open(stored_path, "rb") as stored_file, open(path, "rb") as stego_file:
+        assert stored_file.read() == stego_file.read()
+    assert meta == {"metrics": {"psnr": 70.5}}
+    assert cache.stats() == {"budget": 1000, "hits": 1, "misses": 1, "evictions": 0}
+
+def test_key_use_only_option_that_change_result(cache, tmp_path):
+    entry_key = requestKey(cache)
+    assert requestKey(cache, enc_key="unused") == entry_key
+    assert requestKey(cache, key="other") != entry_key
+    assert requestKey(cache, lsb_bits=2) != entry_key
+    assert requestKey(cache, message_hash="n" * 64) != entry_key
+    assert requestKey(cache, is_random=False) == requestKey(cache, is_random=False, key="other")
+    assert "secret" not in entry_key
+
+    # Key is kept with the store secret, other store give other key.
+    assert requestKey(ResultCache(cache.directory)) == entry_key
+    assert requestKey(ResultCache(str(tmp_path / "other"))) != entry_key
+
+def test_expired_entry_is_not_returned(cache, tmp_path):
+    entry_key = requestKey(cache)
+    cache.put(entry_key, stegoFile(tmp_path, "stego.png", 100), {})
+    age(cache, entry_key, 7200)
+    assert cache.get(entry_key) is None
+    cache.prune()
+    assert not(os.path.exists(cache.path(entry_key)))
+    assert cache.stats()["evictions"] == 1
+
+def test_least_recently_used_is_evicted_over_budget(cache, tmp_path):
+    keys = [requestKey(cache, message_hash=str(n) * 64) for n in range(2)]
+    for n, entry_key in enumerate(keys):
+        cache.put(entry_key, stegoFile(tmp_path, "stego%d.png" % n, 400), {})
+        age(cache, entry_key, 100 - n * 10)
+    # Use the oldest one, the second one become least recently used.
+    assert cache.get(keys[0]) is not None
+    new_key = requestKey(cache, message_hash="x" * 64)
+    cache.put(new_key, stegoFile(tmp_path, "new.png", 400), {})
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(new_key) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_file_bigger_than_budget_is_not_stored(cache, tmp_path):
+    entry_key = requestKey(cache)
+    assert not(cache.put(entry_key, stegoFile(tmp_path, "stego.png", 2000), {}))
+    assert cache.get(entry_key) is None
@@ -0,0 +1,99 @@
+# Python module.
+import os
+import numpy as np
+import pytest
+
+# Own module.
+from bitCodec import bytesToBits
+from helper import generate_random_access_table
+from lsbKernel import AccessOrder
+from stegoFormat import (embedMessage, extractHeaderMessage, extractMessage, frameMessage, messageCapacity,
+    readBytes, END_FLAG, HEADER_SIZE, MAGIC, START_FLAG, VERSION)
+
+def makeCarrier(length:int=20000) -> np.ndarray:
+    return np.random.default_rng(length).integers(0, 256, length, dtype=np.uint8)
+
+def embedCarrier(message:bytes, key:str=None, is_encrypt:bool=False, lsb_bits:int=1,
+    extension:str="txt") -> np.ndarray:
+    carrier = makeCarrier()
+    bits = frameMessage(extension, message, key is not None, is_encrypt, lsb_bits)
+    embedMessage(carrier, bits, key, lsb_bits)
+    return carrier
+
+def sentinelCarrier(message:bytes, key:str=None, is_encrypt:bool=False,
+    extension:str="txt") -> np.ndarray:
+    # Old layout written like the baseline embed: randomize flag at position 0, then encrypt flag,
+    # file extension, start flag, message and end flag in sequential or full random table order.
+    carrier = makeCarrier()
+    bits = np.concatenate(([1 if key else 0, 1 if is_encrypt else 0],
+        bytesToBits(extension.encode("latin-1") + START_FLAG + message + END_FLAG)))
+    table = list(range(1, len(carrier))) if key is None else generate_random_access_table(key, len(carrier))
+    positions = np.array([0] + table[:len(bits) - 1])
+    carrier[positions] = (carrier[positions] & 0xFE) | bits
+    return carrier
+
+@pytest.mark.parametrize("key", [None, "secret"])
+@pytest.mark.parametrize("lsb_bits", [1, 2, 3, 4])
+def test_round_trip(key, lsb_bits):
+    message = os.urandom(1500)
+    carrier = embedCarrier(message, key, lsb_bits=lsb_bits, extension="bin")
+    assert extractMessage(carrier, key) == (False, "bin", message)
+
+def test_encrypt_flag_and_empty_message():
+    carrier = embedCarrier(b"", is_encrypt=True)
+    assert extractMessage(carrier) == (True, "txt", b"")
+
+def test_header_layout():
+    message = b"hello"
+    carrier = embedCarrier(message, lsb_bits=3)
+    header = readBytes(carrier, AccessOrder(len(carrier)), 0, HEADER_SIZE)
+    assert header[:len(MAGIC) + 1] == MAGIC + bytes([VERSION])
+    assert carrier[0] & 1 == 0
+    # Randomized file keep the marker in sequential position, position 0 hold the randomize flag.
+    carrier = embedCarrier(message, "secret")
+    assert readBytes(carrier, AccessOrder(len(carrier)), 0, len(MAGIC) + 1) == MAGIC + bytes([VERSION])
+    assert carrier[0] & 1 == 1
+
+def test_message_at_capacity():
+    carrier = makeCarrier()
+    message = os.urandom(messageCapacity(len(carrier), "bin", 2))
+    embedMessage(carrier, frameMessage("bin", message, False, False, 2), None, 2)
+    assert extractMessage(carrier) == (False, "bin", message)
+
+def test_corrupted_header_is_rejected():
+    carrier = embedCarrier(b"hello")
+    # Flip one bit of the message length field, header CRC no longer match.
+    carrier[1 + 8 * 8] ^= 1
+    assert extractHeaderMessage(carrier) is None
+    with pytest.raises(Exception):
+        extractMessage(carrier)
+
+def test_corrupted_body_is_rejected():
+    carrier = embedCarrier(b"hello world")
+    carrier[1 + HEADER_SIZE * 8 + 40] ^= 1
+    with pytest.raises(Exception, match="corrupted"):
+        extractMessage(carrier)
+
+def test_wrong_key_is_rejected():
+    carrier = embedCarrier(b"hello", "secret")
+    with pytest.raises(Exception, match="Wrong key"):
+        extractMessage(carrier, "other")
+
+def test_not_stego_is_rejected():
+    with pytest.raises(Exception):
+        extractMessage(makeCarrier())
+    with pytest.raises(Exception, match="Wrong key"):
+        extractMessage(makeCarrier(), "secret")
+
+def test_sequential_sentinel_file():
+    carrier = sentinelCarrier(b"old message", is_encrypt=True)
+    assert extractHeaderMessage(carrier) is None
+    assert extractMessage(carrier) == (True, "txt", b"old message")
+
+def test_randomized_sentinel_file_need_legacy_random():
+    carrier = sentinelCarrier(b"old message", "secret", extension="pdf")
+    with pytest.raises(Exception, match="legacy random"):
+        extractMessage(carrier, "secret")
+    assert extractMessage(carrier, "secret", legacy_random=True) == (False, "pdf", b"old message")
+    with pytest.raises(Exception, match="Wrong key"):
+        extractMessage(carrier, "other", legacy_random=True)